@@ -0,0 +1,45 @@
+"""Measures how long importing pilmoji takes, and what the emoji tables cost once they are first used.
+
+    python benchmarks/bench_import.py [--repeat 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Each step runs in a fresh interpreter, so that nothing is imported or built yet
+STEPS = {
+    'python': 'pass',
+    'import PIL.Image': 'import PIL.Image',
+    'import pilmoji': 'import pilmoji',
+    'import + first parse': 'import pilmoji; pilmoji.to_nodes("hi 👋")',
+    'import + EMOJI_REGEX': 'import pilmoji; pilmoji.EMOJI_REGEX',
+}
+
+TIMER = '''
+import time
+started = time.perf_counter()
+{}
+print(time.perf_counter() - started)
+'''
+
+
+def run(code):
+    environment = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run([sys.executable, '-c', TIMER.format(code)], capture_output=True, check=True, env=environment)
+    return float(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    for name, code in STEPS.items():
+        best = min(run(code) for _ in range(args.repeat))
+        print(f'{name:>22}: {best * 1000:7.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Compares joining the text runs of each line (merge_text=True) with drawing every text run separately.
+
+    python benchmarks/bench_merge_text.py [--lines 20] [--emojis 18] [--repeat 20]
+"""
+
+import argparse
+import random
+
+from PIL import Image, ImageDraw
+
+from _common import MemorySource, best_of, load_font
+
+from pilmoji import Engine
+from pilmoji.helpers import _emoji_tables
+
+
+class CountingDraw(ImageDraw.ImageDraw):
+    calls = 0
+
+    def text(self, *args, **kwargs):
+        CountingDraw.calls += 1
+        return super().text(*args, **kwargs)
+
+
+def make_text(lines, emojis, seed=0):
+    rng = random.Random(seed)
+    table = sorted(set(_emoji_tables()[0].values()))
+    words = ['hello', 'there', 'nice', 'wave', 'AV', 'To', 'ok']
+
+    return '\n'.join(
+        ' '.join(f'{rng.choice(words)} {rng.choice(table)}' for _ in range(emojis))
+        for _ in range(lines)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=20)
+    parser.add_argument('--emojis', type=int, default=18, help='emojis per line')
+    parser.add_argument('--size', type=int, default=22, help='font size')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    font = load_font(args.size)
+    text = make_text(args.lines, args.emojis)
+
+    with Engine(source=MemorySource(), font=font) as engine:
+        width, height = engine.getsize(text)
+        image = Image.new('RGB', (width + 20, height + 20), 'white')
+        draw = CountingDraw(image)
+
+        # Warm the emoji cache, so that only laying out and drawing is timed
+        engine.text(image, (10, 10), text, 'black', draw=draw)
+
+        for merge_text in (False, True):
+            CountingDraw.calls = 0
+            engine.text(image, (10, 10), text, 'black', draw=draw, merge_text=merge_text)
+            calls = CountingDraw.calls
+
+            best = best_of(args.repeat, engine.text, image, (10, 10), text, 'black', draw=draw, merge_text=merge_text)
+            print(f'merge_text={merge_text!s:>5}: {calls:5} draw calls  {best * 1000:7.2f}ms per render')
+
+
+if __name__ == '__main__':
+    main()
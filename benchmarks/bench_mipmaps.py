@@ -0,0 +1,48 @@
+"""Compares resizing an emoji from its full resolution image with resizing it from its mipmaps.
+
+    python benchmarks/bench_mipmaps.py [--source-size 160] [--repeat 200]
+"""
+
+import argparse
+
+from io import BytesIO
+
+from PIL import Image
+
+from _common import MemorySource, best_of
+
+from pilmoji.composite import _open_mipmaps, _resize_emoji, _resize_mipmaps
+
+FILTERS = {
+    'LANCZOS': Image.Resampling.LANCZOS,
+    'BILINEAR': Image.Resampling.BILINEAR,
+    'BOX': Image.Resampling.BOX,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source-size', type=int, default=160, help='the size of the decoded emoji, in pixels')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 32, 64], help='the sizes to resize to')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    stream = MemorySource(args.source_size).get_emoji('👋')
+    data = stream.getvalue()
+
+    levels = _open_mipmaps(stream)
+    full = levels[0]
+
+    decode = best_of(args.repeat, lambda: Image.open(BytesIO(data)).convert('RGBA'))
+    build = best_of(args.repeat, lambda: _open_mipmaps(BytesIO(data)))
+    print(f'decode {decode * 1e6:.0f}us, decode and build {len(levels)} levels {build * 1e6:.0f}us')
+
+    for size in args.sizes:
+        for name, resample in FILTERS.items():
+            direct = best_of(args.repeat, _resize_emoji, full, size, resample)
+            mipmap = best_of(args.repeat, _resize_mipmaps, levels, size, resample)
+            print(f'{size:4}px {name:>8}: full {direct * 1e6:7.0f}us  mipmap {mipmap * 1e6:7.0f}us  ({direct / mipmap:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Compares pasting emojis one at a time with Image.paste with pasting them in one batch (batch_emojis=True).
+
+    python benchmarks/bench_paste.py [--lines 20] [--emojis 18] [--repeat 20]
+"""
+
+import argparse
+import random
+
+from PIL import Image
+
+from _common import MemorySource, best_of, load_font
+from bench_merge_text import make_text
+
+from pilmoji import Engine
+from pilmoji.composite import paste_many
+
+
+def paste_serially(image, placements):
+    for asset, xy in placements:
+        image.paste(asset, xy, asset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=20)
+    parser.add_argument('--emojis', type=int, default=18, help='emojis per line')
+    parser.add_argument('--size', type=int, default=22, help='font size')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    assets = [
+        Image.new('RGBA', (args.size, args.size), (rng.randrange(256), 0, 0, rng.randrange(256)))
+        for _ in range(64)
+    ]
+
+    for count in (100, 1000, 5000):
+        image = Image.new('RGB', (1000, 1000), 'white')
+        placements = [(rng.choice(assets), (rng.randrange(1000), rng.randrange(1000))) for _ in range(count)]
+
+        serial = best_of(args.repeat, paste_serially, image, placements)
+        batched = best_of(args.repeat, paste_many, image, placements)
+        print(
+            f'{count:5} pastes: Image.paste {serial * 1e6 / count:5.2f}us  '
+            f'paste_many {batched * 1e6 / count:5.2f}us per emoji  ({serial / batched:.2f}x)'
+        )
+
+    font = load_font(args.size)
+    text = make_text(args.lines, args.emojis)
+
+    with Engine(source=MemorySource(), font=font) as engine:
+        width, height = engine.getsize(text)
+        image = Image.new('RGB', (width + 20, height + 20), 'white')
+
+        # Warm the emoji cache, so that only laying out and drawing is timed
+        engine.text(image, (10, 10), text, 'black')
+
+        for batch_emojis in (False, True):
+            best = best_of(args.repeat, engine.text, image, (10, 10), text, 'black', batch_emojis=batch_emojis)
+            print(f'text(batch_emojis={batch_emojis!s:>5}): {best * 1000:7.2f}ms per render')
+
+
+if __name__ == '__main__':
+    main()
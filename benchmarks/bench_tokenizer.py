@@ -0,0 +1,73 @@
+"""Compares the trie tokenizer with splitting lines with EMOJI_REGEX, as pilmoji did before.
+
+    python benchmarks/bench_tokenizer.py [--lines 5000] [--repeat 5]
+"""
+
+import argparse
+import random
+
+from _common import best_of
+
+from pilmoji.helpers import EMOJI_REGEX, Node, NodeType, _emoji_tables, to_nodes
+
+
+def regex_to_nodes(text):
+    lines = []
+
+    for line in text.splitlines():
+        nodes = []
+
+        for i, chunk in enumerate(EMOJI_REGEX.split(line)):
+            if not chunk:
+                continue
+
+            if not i % 2:
+                nodes.append(Node(NodeType.text, chunk))
+            elif len(chunk) > 18:
+                nodes.append(Node(NodeType.discord_emoji, chunk.split(':')[-1][:-1]))
+            else:
+                nodes.append(Node(NodeType.emoji, chunk))
+
+        lines.append(nodes)
+
+    return lines
+
+
+def chat_log(lines, emoji_ratio, seed=0):
+    rng = random.Random(seed)
+    emojis = sorted(set(_emoji_tables()[0].values()))
+    words = ['hello', 'there', 'how', 'are', 'you', 'doing', 'today', 'lol', 'nice', 'see', 'ya', 'ok']
+
+    def token():
+        if rng.random() >= emoji_ratio:
+            return rng.choice(words)
+
+        if rng.random() < 0.1:
+            return f'<:emote:{rng.randrange(10 ** 17, 10 ** 18)}>'
+
+        return rng.choice(emojis)
+
+    return '\n'.join(' '.join(token() for _ in range(rng.randrange(3, 20))) for _ in range(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Build the tables and the regex up front, so that only tokenizing is timed
+    _emoji_tables()
+    EMOJI_REGEX.pattern
+
+    for name, emoji_ratio in (('mixed', 0.3), ('plain', 0.0)):
+        text = chat_log(args.lines, emoji_ratio)
+        assert to_nodes(text) == regex_to_nodes(text)
+
+        regex = best_of(args.repeat, regex_to_nodes, text)
+        trie = best_of(args.repeat, to_nodes, text)
+        print(f'{name:>5}: regex {regex * 1000:8.1f}ms  trie {trie * 1000:8.1f}ms  ({regex / trie:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
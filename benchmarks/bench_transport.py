@@ -0,0 +1,71 @@
+"""Compares sequential GET requests through urlopen and pilmoji's transports, against a local server.
+
+    python benchmarks/bench_transport.py [--requests 500] [--body 2048]
+"""
+
+import argparse
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.request import urlopen
+
+from pilmoji.transport import PooledTransport, RequestsTransport, _has_requests
+
+
+def serve(body):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and bodies are written separately, which Nagle's algorithm would delay on kept alive connections
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def urlopen_get(url):
+    with urlopen(url) as response:
+        return response.status, response.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--body', type=int, default=2048, help='the size of each response body, in bytes')
+    args = parser.parse_args()
+
+    server = serve(b'x' * args.body)
+    url = f'http://127.0.0.1:{server.server_port}/emoji.png'
+
+    clients = {'urlopen': urlopen_get, 'PooledTransport': PooledTransport().request}
+
+    if _has_requests:
+        clients['RequestsTransport'] = RequestsTransport().request
+
+    for name, get in clients.items():
+        get(url)
+        started = time.perf_counter()
+
+        for _ in range(args.requests):
+            status, _ = get(url)
+            assert status == 200
+
+        elapsed = time.perf_counter() - started
+        print(f'{name:>17}: {elapsed / args.requests * 1e6:7.0f}us per request')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,33 @@
-from . import helpers, source
+import importlib
+
+from . import cache, composite, engine, helpers, source, transport
+from .cache import *
 from .core import Pilmoji
+from .engine import Engine
 from .helpers import *
 
+
+# These modules are slow to import, i.e. batch imports multiprocessing, so they are only imported once used
+_LAZY_MODULES = {
+    'atlas': ('EmojiAtlas',),
+    'batch': ('TextDraw', 'RenderJob', 'render_batch'),
+}
+
+
+def __getattr__(name: str):
+    # EMOJI_REGEX is compiled on first use, see pilmoji.helpers
+    if name == 'EMOJI_REGEX':
+        return helpers.EMOJI_REGEX
+
+    for module, names in _LAZY_MODULES.items():
+        if name == module:
+            return importlib.import_module(f'.{module}', __name__)
+
+        if name in names:
+            return getattr(importlib.import_module(f'.{module}', __name__), name)
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
 __version__ = '2.0.4'
 __author__ = 'jay3332'
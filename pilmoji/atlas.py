@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+from typing import Dict, Hashable, Iterable, Optional, Tuple, TYPE_CHECKING, Union
+
+from .composite import _open_emoji
+from .source import SourceUnavailable
+
+if TYPE_CHECKING:
+    from .source import AsyncBaseSource, BaseSource
+
+    BoxT = Tuple[int, int, int, int]
+
+__all__ = (
+    'EmojiAtlas',
+)
+
+
+def _normalize(emoji: str, /) -> str:
+    # Sources do not agree on whether variation selectors are part of an emoji
+    return emoji.replace('\ufe0f', '')
+
+
+class EmojiAtlas:
+    """A sprite atlas holding many emojis, all resized to the same width.
+
+    Renderers given an atlas crop emojis out of it instead of fetching,
+    decoding and resizing them individually. See :meth:`build` to create one.
+    An atlas is only used by renderers with the source it was built from.
+
+    Parameters
+    ----------
+    image: :class:`PIL.Image.Image`
+        The RGBA image holding every emoji.
+    index: Dict[str, Tuple[int, int, int, int]]
+        A mapping of each emoji to the box of its image in the atlas.
+    size: int
+        The width every emoji was resized to, in pixels.
+    resample: int
+        The resampling filter every emoji was resized with.
+    source_key: Hashable
+        The :attr:`~.BaseSource.cache_key` of the source the emojis were fetched from.
+    """
+
+    __slots__ = ('image', 'size', 'resample', 'source_key', '_index')
+
+    def __init__(
+        self,
+        image: Image.Image,
+        index: Dict[str, BoxT],
+        size: int,
+        resample: int = Image.Resampling.LANCZOS,
+        *,
+        source_key: Hashable
+    ) -> None:
+        self.image: Image.Image = image
+        self.size: int = size
+        self.resample: int = resample
+        self.source_key: Hashable = source_key
+
+        self._index: Dict[str, BoxT] = {_normalize(emoji): tuple(box) for emoji, box in index.items()}
+
+    @classmethod
+    def build(
+        cls,
+        source: BaseSource,
+        size: int,
+        *,
+        emojis: Optional[Iterable[str]] = None,
+        resample: int = Image.Resampling.LANCZOS,
+        max_workers: int = 8
+    ) -> EmojiAtlas:
+        """Fetches emojis from the given source and packs them into an atlas.
+
+        Emojis which the source cannot provide are left out, as are emojis
+        for which it raises :class:`~.SourceUnavailable`.
+
+        Parameters
+        ----------
+        source: :class:`~.BaseSource`
+            The source to fetch emojis from.
+        size: int
+            The width to resize every emoji to, in pixels.
+            This should be the width emojis are rendered at, i.e. the font size.
+        emojis: Optional[Iterable[str]]
+            The emojis to include. Defaults to every emoji the source can enumerate,
+            see :meth:`.BaseSource.iter_emojis`.
+        resample: int
+            The resampling filter to resize emojis with.
+            Defaults to :attr:`PIL.Image.Resampling.LANCZOS`, like :class:`~.Pilmoji`.
+        max_workers: int
+            The maximum amount of emojis to fetch at once. Defaults to `8`.
+
+        Returns
+        -------
+        :class:`~.EmojiAtlas`
+        """
+        if emojis is None:
+            emojis = source.iter_emojis()
+
+        emojis = list(dict.fromkeys(emojis))
+
+        def load(emoji: str) -> Optional[Image.Image]:
+            try:
+                stream = source.get_emoji(emoji)
+            except SourceUnavailable:
+                return None
+
+            if stream:
+                with stream:
+                    return _open_emoji(stream, size, resample)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            loaded = [(emoji, asset) for emoji, asset in zip(emojis, executor.map(load, emojis)) if asset]
+
+        cell_height = max((asset.height for _, asset in loaded), default=0)
+        columns = max(1, math.ceil(math.sqrt(len(loaded))))
+        rows = math.ceil(len(loaded) / columns)
+
+        image = Image.new('RGBA', (columns * size, rows * cell_height))
+        index = {}
+
+        for i, (emoji, asset) in enumerate(loaded):
+            x, y = i % columns * size, i // columns * cell_height
+            image.paste(asset, (x, y))
+            index[emoji] = x, y, x + asset.width, y + asset.height
+            asset.close()
+
+        return cls(image, index, size, resample, source_key=source.cache_key)
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        """Saves this atlas as a PNG image, with its index embedded.
+
+        Parameters
+        ----------
+        path: Union[str, :class:`os.PathLike`]
+            The path to save the atlas to.
+        """
+        from PIL import PngImagePlugin
+
+        info = PngImagePlugin.PngInfo()
+        info.add_text('pilmoji-atlas', json.dumps({
+            'size': self.size,
+            'resample': int(self.resample),
+            'index': self._index,
+        }), zip=True)
+
+        self.image.save(path, 'PNG', pnginfo=info)
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike], source: Union[BaseSource, AsyncBaseSource]) -> EmojiAtlas:
+        """Loads an atlas which was saved with :meth:`save`.
+
+        Parameters
+        ----------
+        path: Union[str, :class:`os.PathLike`]
+            The path to load the atlas from.
+        source: Union[:class:`~.BaseSource`, :class:`~.AsyncBaseSource`]
+            The source the atlas was built from. Sources cannot be saved along with
+            the atlas, so this is needed for renderers to know which source it belongs to.
+
+        Returns
+        -------
+        :class:`~.EmojiAtlas`
+
+        Raises
+        ------
+        ValueError
+            The image is not an emoji atlas.
+        """
+        with Image.open(path) as image:
+            try:
+                data = json.loads(image.text['pilmoji-atlas'])
+            except (AttributeError, KeyError):
+                raise ValueError(f'{os.fspath(path)!r} is not an emoji atlas.') from None
+
+            return cls(
+                image.convert('RGBA'), data['index'], data['size'], data['resample'], source_key=source.cache_key,
+            )
+
+    def get(self, emoji: str, /) -> Optional[Image.Image]:
+        """Crops the image of the given emoji out of this atlas.
+
+        Parameters
+        ----------
+        emoji: str
+            The emoji to retrieve.
+
+        Returns
+        -------
+        Optional[:class:`PIL.Image.Image`]
+            The RGBA image of the emoji, or ``None`` if it is not in this atlas.
+        """
+        if (box := self._index.get(_normalize(emoji))) is not None:
+            return self.image.crop(box)
+
+    def __contains__(self, emoji: str) -> bool:
+        return _normalize(emoji) in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f'<EmojiAtlas size={self.size} emojis={len(self)} source_key={self.source_key!r}>'
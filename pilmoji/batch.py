@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import os
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PIL import Image, ImageFont
+
+from typing import Any, Deque, Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, TYPE_CHECKING, Tuple, Type, Union
+
+from .engine import Engine
+from .source import BaseSource, DiskCachedSource, Twemoji
+
+if TYPE_CHECKING:
+    FontT = Union[ImageFont.ImageFont, ImageFont.FreeTypeFont, ImageFont.TransposedFont]
+    ColorT = Union[int, Tuple[int, int, int], Tuple[int, int, int, int], str]
+
+__all__ = (
+    'TextDraw',
+    'RenderJob',
+    'render_batch',
+)
+
+
+class TextDraw(NamedTuple):
+    """Represents a single :meth:`.Engine.text` call of a :class:`~.RenderJob`.
+
+    Attributes
+    ----------
+    xy: Tuple[int, int]
+        The position to render the text at.
+    text: str
+        The text to render.
+    fill
+        The fill color of the text.
+    font: Union[:class:`PIL.ImageFont.FreeTypeFont`, Tuple[str, float]]
+        The font to render the text with. A ``(path, size)`` tuple is loaded
+        once per worker with :meth:`.Engine.get_font`, instead of once per job.
+    options: Optional[Dict[str, Any]]
+        Any other keyword arguments to pass to :meth:`.Engine.text`.
+    """
+
+    xy: Tuple[int, int]
+    text: str
+    fill: ColorT = None
+    font: Union[FontT, Tuple[str, float], None] = None
+    options: Optional[Dict[str, Any]] = None
+
+
+class RenderJob(NamedTuple):
+    """Represents an image to render with :func:`~.render_batch`.
+
+    Attributes
+    ----------
+    image: Union[:class:`PIL.Image.Image`, Tuple[int, int]]
+        The base image to render onto, or the size of a new image to create.
+    draws: Sequence[:class:`~.TextDraw`]
+        The text to render onto the image, in order.
+    mode: str
+        The mode of the new image to create, if a size was given. Defaults to ``'RGBA'``.
+    color
+        The background color of the new image to create, if a size was given.
+        Defaults to transparent.
+    """
+
+    image: Union[Image.Image, Tuple[int, int]]
+    draws: Sequence[TextDraw]
+    mode: str = 'RGBA'
+    color: ColorT = 0
+
+
+# The engine of the current worker process, which lives as long as the process
+_worker_engine: Optional[Engine] = None
+
+
+def _init_worker(
+    source: Union[BaseSource, Type[BaseSource]],
+    cache_dir: Optional[str],
+    options: Dict[str, Any],
+    /
+) -> None:
+    global _worker_engine
+
+    if isinstance(source, type):
+        source = source()
+
+    if cache_dir is not None:
+        source = DiskCachedSource(source, cache_dir)
+
+    _worker_engine = Engine(source=source, **options)
+
+
+def _render_job(job: RenderJob, /) -> Image.Image:
+    engine = _worker_engine
+
+    if isinstance(job.image, Image.Image):
+        image = job.image
+    else:
+        image = Image.new(job.mode, job.image, job.color)
+
+    for draw in job.draws:
+        font = draw.font
+
+        if isinstance(font, tuple):
+            font = engine.get_font(*font)
+
+        engine.text(image, draw.xy, draw.text, draw.fill, font, **(draw.options or {}))
+
+    return image
+
+
+def render_batch(
+    jobs: Iterable[RenderJob],
+    *,
+    source: Union[BaseSource, Type[BaseSource]] = Twemoji,
+    cache_dir: Optional[Union[str, os.PathLike]] = None,
+    max_workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    **options: Any
+) -> Iterator[Image.Image]:
+    """Renders many images over a pool of processes, using every core.
+
+    Each worker process keeps one :class:`~.Engine` for all the jobs it renders,
+    so each emoji is decoded at most once per worker. Jobs are consumed lazily,
+    and the finished images are yielded in the order of the jobs.
+
+    Parameters
+    ----------
+    jobs: Iterable[:class:`~.RenderJob`]
+        The images to render.
+    source: Union[:class:`~.BaseSource`, Type[:class:`~.BaseSource`]]
+        The emoji image source of the workers. This must be picklable, i.e. a source class.
+        Defaults to :class:`~.TwitterEmojiSource`.
+    cache_dir: Optional[Union[str, :class:`os.PathLike`]]
+        A directory in which the workers share fetched emojis through a :class:`~.DiskCachedSource`,
+        so that each emoji is fetched once instead of once per worker. It may be kept between batches.
+        Defaults to ``None``, which means workers do not share emojis.
+    max_workers: Optional[int]
+        The amount of worker processes. Defaults to the amount of processors.
+    max_pending: Optional[int]
+        The maximum amount of jobs which are submitted but not yet yielded.
+        This bounds the amount of memory held by jobs and finished images.
+        Defaults to four times the amount of workers.
+    **options
+        The options of the engines of the workers, i.e. `emoji_scale_factor`.
+        See :class:`~.Engine`. These must be picklable.
+
+    Yields
+    ------
+    :class:`PIL.Image.Image`
+        The rendered image of each job, in order.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_pending is None:
+        max_pending = max_workers * 4
+
+    if cache_dir is not None:
+        cache_dir = os.fspath(cache_dir)
+
+    pending: Deque[Future[Image.Image]] = deque()
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(source, cache_dir, options),
+    ) as executor:
+        try:
+            for job in jobs:
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+
+                pending.append(executor.submit(_render_job, job))
+
+            while pending:
+                yield pending.popleft().result()
+
+        finally:
+            # Only reached early if the consumer stopped iterating or a job failed
+            for future in pending:
+                future.cancel()
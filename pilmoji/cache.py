@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import sys
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from io import BytesIO
+from threading import Event, Lock, RLock
+
+from PIL import Image
+
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, TypeVar
+
+__all__ = (
+    'CacheStats',
+    'BaseCache',
+    'LRUCache',
+    'LFUCache',
+    'SingleFlight',
+)
+
+T = TypeVar('T')
+
+
+class CacheStats(NamedTuple):
+    """Represents a snapshot of the statistics of a cache.
+
+    Attributes
+    ----------
+    hits: int
+        The amount of lookups that found an entry.
+    misses: int
+        The amount of lookups that did not find an entry.
+    evictions: int
+        The amount of entries that were evicted to stay within the cache's limits.
+    entries: int
+        The amount of entries currently stored.
+    size: int
+        The estimated amount of bytes currently stored.
+    max_size: Optional[int]
+        The maximum amount of bytes this cache may store, or ``None`` if unbounded.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_size: Optional[int]
+
+    @property
+    def hit_rate(self) -> float:
+        """float: The ratio of lookups that found an entry."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def sizeof(value: Any, /) -> int:
+    """Estimates the amount of memory the given cached value occupies, in bytes.
+
+    Parameters
+    ----------
+    value
+        The value to estimate the size of.
+
+    Returns
+    -------
+    int
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+
+    if isinstance(value, BytesIO):
+        return value.getbuffer().nbytes
+
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+
+    if isinstance(value, (tuple, list)):
+        return sum(map(sizeof, value))
+
+    return sys.getsizeof(value)
+
+
+class BaseCache(ABC):
+    """The base class for an emoji cache.
+
+    Caches are keyed by hashable keys and may be shared between
+    multiple :class:`~.Pilmoji` instances and threads.
+    Implementations must be thread-safe.
+    """
+
+    @abstractmethod
+    def get(self, key: Hashable, default: Any = None, /) -> Any:
+        """Retrieves the value stored under the given key.
+
+        Parameters
+        ----------
+        key
+            The key to look up.
+        default
+            The value to return if the key is not stored.
+            Defaults to ``None``.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any, /) -> None:
+        """Stores a value under the given key, possibly evicting other entries.
+
+        Parameters
+        ----------
+        key
+            The key to store the value under.
+        value
+            The value to store.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: Hashable, /) -> None:
+        """Removes the given key from this cache, if it is stored."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Removes all entries from this cache."""
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def stats(self) -> CacheStats:
+        """:class:`~.CacheStats`: The current statistics of this cache."""
+        raise NotImplementedError
+
+    def __contains__(self, key: Hashable) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} stats={self.stats}>'
+
+
+class LRUCache(BaseCache):
+    """An in-memory cache which evicts the least recently used entries first.
+
+    Parameters
+    ----------
+    max_size: Optional[int]
+        The maximum amount of bytes to store, estimated per entry.
+        Defaults to ``None``, which means unbounded.
+    max_entries: Optional[int]
+        The maximum amount of entries to store.
+        Defaults to ``None``, which means unbounded.
+    sizeof: Callable[[Any], int]
+        The function used to estimate the size of an entry, in bytes.
+    """
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        *,
+        max_entries: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sizeof
+    ) -> None:
+        self.max_size: Optional[int] = max_size
+        self.max_entries: Optional[int] = max_entries
+
+        self._sizeof: Callable[[Any], int] = sizeof
+        self._lock: RLock = RLock()
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+
+        self._size: int = 0
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def _touch(self, key: Hashable, /) -> None:
+        self._entries.move_to_end(key)
+
+    def _victim(self) -> Hashable:
+        return next(iter(self._entries))
+
+    def _remove(self, key: Hashable, /) -> None:
+        del self._entries[key]
+        self._size -= self._sizes.pop(key)
+
+    def get(self, key: Hashable, default: Any = None, /) -> Any:
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return default
+
+            self._hits += 1
+            self._touch(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, /) -> None:
+        size = self._sizeof(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            if self.max_size is not None and size > self.max_size:
+                return
+
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._size += size
+            self._touch(key)
+
+            while self._entries and (
+                (self.max_size is not None and self._size > self.max_size)
+                or (self.max_entries is not None and len(self._entries) > self.max_entries)
+            ):
+                self._remove(self._victim())
+                self._evictions += 1
+
+    def delete(self, key: Hashable, /) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._size = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                size=self._size,
+                max_size=self.max_size,
+            )
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LFUCache(LRUCache):
+    """An in-memory cache which evicts the least frequently used entries first.
+
+    Entries that are used equally often are evicted least recently used first.
+    This takes the same parameters as :class:`~.LRUCache`.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+
+        self._frequencies: Dict[Hashable, int] = {}
+        self._buckets: Dict[int, OrderedDict[Hashable, None]] = {}
+        self._min_frequency: int = 0
+
+    def _touch(self, key: Hashable, /) -> None:
+        frequency = self._frequencies.get(key, 0)
+
+        if frequency:
+            bucket = self._buckets[frequency]
+            del bucket[key]
+
+            if not bucket:
+                del self._buckets[frequency]
+
+                if self._min_frequency == frequency:
+                    self._min_frequency += 1
+
+        else:
+            self._min_frequency = 1
+
+        self._frequencies[key] = frequency + 1
+        self._buckets.setdefault(frequency + 1, OrderedDict())[key] = None
+
+    def _victim(self) -> Hashable:
+        return next(iter(self._buckets[self._min_frequency]))
+
+    def _remove(self, key: Hashable, /) -> None:
+        super()._remove(key)
+
+        frequency = self._frequencies.pop(key)
+        bucket = self._buckets[frequency]
+        del bucket[key]
+
+        if not bucket:
+            del self._buckets[frequency]
+
+            if self._min_frequency == frequency:
+                self._min_frequency = min(self._buckets, default=0)
+
+    def clear(self) -> None:
+        with self._lock:
+            super().clear()
+            self._frequencies.clear()
+            self._buckets.clear()
+            self._min_frequency = 0
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.event: Event = Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single call.
+
+    While a call for a key is in flight, other threads calling :meth:`do` with the
+    same key wait for it to finish and share its result instead of making their own.
+    This keeps threads which miss a shared cache at once from all fetching the same emoji.
+    """
+
+    def __init__(self) -> None:
+        self._lock: Lock = Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[..., T], /, *args: Any) -> T:
+        """Calls the function with the given arguments, unless a call for the given key is in flight,
+        in which case its result is waited for instead.
+
+        Parameters
+        ----------
+        key
+            The key identifying the call.
+        func
+            The function to call.
+        *args
+            The arguments to call the function with.
+
+        Returns
+        -------
+        The result of the call. If the call raised, the exception is raised in every waiting thread.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = func(*args)
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.event.set()
+
+        return call.result
+
+    def __len__(self) -> int:
+        return len(self._calls)
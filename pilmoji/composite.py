@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import math
+
+from PIL import Image
+
+from typing import BinaryIO, Sequence, Tuple
+
+__all__ = (
+    'paste_many',
+)
+
+PlacementT = Tuple[Image.Image, Tuple[int, int]]
+
+
+# The smallest mipmap level which is kept, in pixels
+MIPMAP_MIN_SIZE: int = 16
+
+
+def _resize_emoji(asset: Image.Image, width: int, /, resample: int = Image.Resampling.LANCZOS) -> Image.Image:
+    # Resizes an emoji image to the given width, keeping its aspect ratio
+    size = width, math.ceil(asset.height / asset.width * width)
+    return asset.resize(size, resample)
+
+
+def _open_emoji(stream: BinaryIO, width: int, /, resample: int = Image.Resampling.LANCZOS) -> Image.Image:
+    # Decodes an emoji image and resizes it to the given width
+    with Image.open(stream) as original, original.convert('RGBA') as asset:
+        return _resize_emoji(asset, width, resample)
+
+
+def _open_mipmaps(stream: BinaryIO, /) -> Tuple[Image.Image, ...]:
+    # Decodes an emoji image into a pyramid of levels, each half the size of the last
+    with Image.open(stream) as original:
+        levels = [original.convert('RGBA')]
+
+    while levels[-1].width // 2 >= MIPMAP_MIN_SIZE and levels[-1].height >= 2:
+        levels.append(levels[-1].reduce(2))
+
+    return tuple(levels)
+
+
+def _resize_mipmaps(levels: Sequence[Image.Image], width: int, /, resample: int = Image.Resampling.LANCZOS) -> Image.Image:
+    # Resamples from the smallest level which is still at least as large as the target,
+    # which is much cheaper than resampling from the full resolution image
+    for level in reversed(levels):
+        if level.width >= width:
+            break
+    else:
+        level = levels[0]
+
+    return _resize_emoji(level, width, resample)
+
+
+def _composite_layer(image: Image.Image, layer: Image.Image, xy: Tuple[int, int], /) -> None:
+    # Composites an RGBA layer onto an RGB or RGBA image. The layer is clipped to the image first,
+    # since Image.alpha_composite does not accept positions outside of the image
+    x, y = xy
+    box = max(0, -x), max(0, -y), min(layer.width, image.width - x), min(layer.height, image.height - y)
+
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return
+
+    destination = x + box[0], y + box[1]
+
+    if image.mode == 'RGBA':
+        image.alpha_composite(layer, destination, box)
+        return
+
+    part = layer.crop(box)
+    image.paste(part, destination, part)
+
+
+def paste_many(image: Image.Image, placements: Sequence[PlacementT], /) -> None:
+    """Pastes many RGBA images onto the given image, using their alpha channels as masks.
+
+    This is equivalent to calling ``image.paste(asset, xy, asset)`` for each placement, in order,
+    but the image is only prepared once, instead of once per placement.
+
+    .. note::
+        This pastes through :attr:`PIL.Image.Image.im`, the internal image of Pillow, which
+        :meth:`PIL.Image.Image.paste` uses as well. Images of modes other than RGB and RGBA,
+        and placements of images which are not RGBA, are pasted with :meth:`PIL.Image.Image.paste`.
+
+    Parameters
+    ----------
+    image: :class:`PIL.Image.Image`
+        The image to paste onto.
+    placements: Sequence[Tuple[:class:`PIL.Image.Image`, Tuple[int, int]]]
+        The RGBA images to paste, and the positions to paste them at.
+    """
+    if image.mode not in ('RGB', 'RGBA'):
+        # Other modes need the assets to be converted, which Image.paste takes care of
+        for asset, xy in placements:
+            image.paste(asset, xy, asset)
+        return
+
+    image._ensure_mutable()
+    core = image.im
+
+    for asset, (x, y) in placements:
+        if asset.mode != 'RGBA':
+            image.paste(asset, (x, y), asset)
+            continue
+
+        asset.load()
+        # Pillow's core clips the box to the image, like Image.paste does
+        core.paste(asset.im, (x, y, x + asset.width, y + asset.height), asset.im)
@@ -1,24 +1,26 @@
 from __future__ import annotations
 
-import math
-
-import PIL
 from PIL import Image, ImageDraw, ImageFont
 
-from typing import Dict, Optional, SupportsInt, TYPE_CHECKING, Tuple, Type, TypeVar, Union
+from typing import Any, Iterable, Optional, TYPE_CHECKING, Tuple, Type, TypeVar, Union
 
-from .helpers import NodeType, getsize, to_nodes
-from .source import BaseSource, HTTPBasedSource, Twemoji, _has_requests
+from .engine import Engine
+from .helpers import Layout, ParsedText
+from .source import AsyncBaseSource
 
 if TYPE_CHECKING:
-    from io import BytesIO
+    from .atlas import EmojiAtlas
+    from .cache import BaseCache
+    from .source import BaseSource
 
     FontT = Union[ImageFont.ImageFont, ImageFont.FreeTypeFont, ImageFont.TransposedFont]
-    ColorT = Union[int, Tuple[int, int, int], Tuple[int, int, int, int], str]
 
 
 P = TypeVar('P', bound='Pilmoji')
 
+# The default of engine options, so that options which were given can be told apart from ones which were not
+_MISSING: Any = object()
+
 __all__ = (
     'Pilmoji',
 )
@@ -27,6 +29,8 @@ __all__ = (
 class Pilmoji:
     """The main emoji rendering interface.
 
+    This renders onto a single image, through an :class:`~.Engine`.
+
     .. note::
         This should be used in a context manager.
 
@@ -37,9 +41,10 @@ class Pilmoji:
     source: Union[:class:`~.BaseSource`, Type[:class:`~.BaseSource`]]
         The emoji image source to use.
         This defaults to :class:`~.TwitterEmojiSource`.
-    cache: bool
+    cache: Union[bool, :class:`~.BaseCache`]
         Whether or not to cache emojis given from source.
         Enabling this is recommended and by default.
+        A :class:`~.BaseCache` can be given instead to share a cache between renderers.
     draw: :class:`PIL.ImageDraw.ImageDraw`
         The drawing instance to use. If left unfilled,
         a new drawing instance will be created.
@@ -50,46 +55,89 @@ class Pilmoji:
     emoji_position_offset: Tuple[int, int]
         A 2-tuple representing the x and y offset for emojis when rendering,
         respectively. Defaults to `(0, 0)`
+    measure_cache: Optional[:class:`~.BaseCache`]
+        A cache to memoize parsed lines and measured text widths in. Defaults to `None`
+    atlases: Iterable[:class:`~.EmojiAtlas`]
+        Emoji atlases of the source to crop emojis from.
+    resample: int
+        The default resampling filter to resize emojis with.
+        Defaults to :attr:`PIL.Image.Resampling.LANCZOS`
+    discord_emoji_format: Optional[str]
+        The image format to request Discord emojis in, i.e. ``'webp'``. Defaults to `None`
+    missing_ttl: Optional[float]
+        How many seconds to remember that the source could not provide an emoji for. Defaults to `600`.
+    font
+        The default font to render text with. Defaults to Pillow's default font.
+    fast_measure: bool
+        Whether to measure text with a table of character advances by default. Defaults to `False`
+    layer_cache: Union[bool, :class:`~.BaseCache`]
+        Whether to cache fully rendered text. Defaults to `False`
+    engine: Optional[:class:`~.Engine`]
+        The engine to render with, which may be shared by many renderers.
+        It is not closed along with this renderer.
+
+        If left unfilled, a new engine is created from the options above and closed along
+        with this renderer. See :class:`~.Engine` for the details of each option.
+        The options cannot be given along with an engine.
     """
 
     def __init__(
         self,
         image: Image.Image,
         *,
-        source: Union[BaseSource, Type[BaseSource]] = Twemoji,
-        cache: bool = True,
+        source: Union[BaseSource, AsyncBaseSource, Type[BaseSource], Type[AsyncBaseSource]] = _MISSING,
+        cache: Union[bool, BaseCache] = _MISSING,
         draw: Optional[ImageDraw.ImageDraw] = None,
-        render_discord_emoji: bool = True,
-        emoji_scale_factor: float = 1.0,
-        emoji_position_offset: Tuple[int, int] = (0, 0)
+        render_discord_emoji: bool = _MISSING,
+        emoji_scale_factor: float = _MISSING,
+        emoji_position_offset: Tuple[int, int] = _MISSING,
+        measure_cache: Optional[BaseCache] = _MISSING,
+        atlases: Iterable[EmojiAtlas] = _MISSING,
+        resample: int = _MISSING,
+        discord_emoji_format: Optional[str] = _MISSING,
+        missing_ttl: Optional[float] = _MISSING,
+        font: FontT = _MISSING,
+        fast_measure: bool = _MISSING,
+        layer_cache: Union[bool, BaseCache] = _MISSING,
+        engine: Optional[Engine] = None
     ) -> None:
+        options = {
+            'source': source,
+            'cache': cache,
+            'render_discord_emoji': render_discord_emoji,
+            'emoji_scale_factor': emoji_scale_factor,
+            'emoji_position_offset': emoji_position_offset,
+            'measure_cache': measure_cache,
+            'atlases': atlases,
+            'resample': resample,
+            'discord_emoji_format': discord_emoji_format,
+            'missing_ttl': missing_ttl,
+            'font': font,
+            'fast_measure': fast_measure,
+            'layer_cache': layer_cache,
+        }
+
+        options = {name: value for name, value in options.items() if value is not _MISSING}
+
+        if engine is not None and options:
+            raise TypeError(f'Engine options cannot be given along with an engine, got {", ".join(options)}.')
+
         self.image: Image.Image = image
         self.draw: ImageDraw.ImageDraw = draw
 
-        if isinstance(source, type):
-            if not issubclass(source, BaseSource):
-                raise TypeError(f'source must inherit from BaseSource, not {source}.')
-
-            source = source()
-
-        elif not isinstance(source, BaseSource):
-            raise TypeError(f'source must inherit from BaseSource, not {source.__class__}.')
+        self._owns_engine: bool = engine is None
+        self.engine: Engine = Engine(**options) if engine is None else engine
 
-        self.source: BaseSource = source
-
-        self._cache: bool = cache
         self._closed: bool = False
         self._new_draw: bool = False
 
-        self._render_discord_emoji: bool = render_discord_emoji
-        self._default_emoji_scale_factor: float = emoji_scale_factor
-        self._default_emoji_position_offset: Tuple[int, int] = emoji_position_offset
-
-        self._emoji_cache: Dict[str, BytesIO] = {}
-        self._discord_emoji_cache: Dict[int, BytesIO] = {}
-
         self._create_draw()
 
+    @property
+    def source(self) -> Union[BaseSource, AsyncBaseSource]:
+        """Union[:class:`~.BaseSource`, :class:`~.AsyncBaseSource`]: The emoji image source of the engine."""
+        return self.engine.source
+
     def open(self) -> None:
         """Re-opens this renderer if it has been closed.
         This should rarely be called.
@@ -102,10 +150,6 @@ class Pilmoji:
         if not self._closed:
             raise ValueError('Renderer is already open.')
 
-        if _has_requests and isinstance(self.source, HTTPBasedSource):
-            from requests import Session
-            self.source._requests_session = Session()
-
         self._create_draw()
         self._closed = False
 
@@ -127,18 +171,8 @@ class Pilmoji:
             del self.draw
             self.draw = None
 
-        if _has_requests and isinstance(self.source, HTTPBasedSource):
-            self.source._requests_session.close()
-
-        if self._cache:
-            for stream in self._emoji_cache.values():
-                stream.close()
-
-            for stream in self._discord_emoji_cache.values():
-                stream.close()
-
-            self._emoji_cache = {}
-            self._discord_emoji_cache = {}
+        if self._owns_engine:
+            self.engine.close()
 
         self._closed = True
 
@@ -147,184 +181,76 @@ class Pilmoji:
             self._new_draw = True
             self.draw = ImageDraw.Draw(self.image)
 
-    def _get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
-        if self._cache and emoji in self._emoji_cache:
-            entry = self._emoji_cache[emoji]
-            entry.seek(0)
-            return entry
-
-        if stream := self.source.get_emoji(emoji):
-            if self._cache:
-                self._emoji_cache[emoji] = stream
-
-            stream.seek(0)
-            return stream
+    def prefetch(self, text: Union[str, Iterable[str]], /, *args: Any, **kwargs: Any) -> None:
+        """Concurrently fetches all emojis in the given text(s) into the cache.
 
-    def _get_discord_emoji(self, id: SupportsInt, /) -> Optional[BytesIO]:
-        id = int(id)
+        See :meth:`.Engine.prefetch` for the parameters.
+        """
+        self.engine.prefetch(text, *args, **kwargs)
 
-        if self._cache and id in self._discord_emoji_cache:
-            entry = self._discord_emoji_cache[id]
-            entry.seek(0)
-            return entry
+    def layout(self, text: Union[str, ParsedText], font: FontT = None, **kwargs: Any) -> Layout:
+        """Parses and measures the text into a :class:`~.Layout`.
+        This method supports multiline text.
 
-        if stream := self.source.get_discord_emoji(id):
-            if self._cache:
-                self._discord_emoji_cache[id] = stream
+        See :meth:`.Engine.layout` for the parameters.
 
-            stream.seek(0)
-            return stream
+        Returns
+        -------
+        :class:`~.Layout`
+        """
+        return self.engine.layout(text, font, **kwargs)
 
-    def getsize(
-        self,
-        text: str,
-        font: FontT = None,
-        *,
-        spacing: int = 4,
-        emoji_scale_factor: float = None
-    ) -> Tuple[int, int]:
+    def getsize(self, text: Union[str, ParsedText], font: FontT = None, **kwargs: Any) -> Tuple[int, int]:
         """Return the width and height of the text when rendered.
         This method supports multiline text.
 
-        Parameters
-        ----------
-        text: str
-            The text to use.
-        font
-            The font of the text.
-        spacing: int
-            The spacing between lines, in pixels.
-            Defaults to `4`.
-        emoji_scalee_factor: float
-            The rescaling factor for emojis.
-            Defaults to the factor given in the class constructor, or `1`.
+        See :meth:`.Engine.getsize` for the parameters.
         """
-        if emoji_scale_factor is None:
-            emoji_scale_factor = self._default_emoji_scale_factor
+        return self.engine.getsize(text, font, **kwargs)
 
-        return getsize(text, font, spacing=spacing, emoji_scale_factor=emoji_scale_factor)
+    def wrap(self, text: str, width: float, font: FontT = None, **kwargs: Any) -> str:
+        """Wraps the text so that no line is wider than the given width.
 
-    def text(
-        self,
-        xy: Tuple[int, int],
-        text: str,
-        fill: ColorT = None,
-        font: FontT = None,
-        anchor: str = None,
-        spacing: int = 4,
-        node_spacing: int = 0,
-        align: str = "left",
-        direction: str = None,
-        features: str = None,
-        language: str = None,
-        stroke_width: int = 0,
-        stroke_fill: ColorT = None,
-        embedded_color: bool = False,
-        *args,
-        emoji_scale_factor: float = None,
-        emoji_position_offset: Tuple[int, int] = None,
-        **kwargs
-    ) -> None:
+        See :meth:`.Engine.wrap` for the parameters.
+
+        Returns
+        -------
+        str
+        """
+        return self.engine.wrap(text, width, font, **kwargs)
+
+    def fit(self, text: str, size: Tuple[int, int], font: FontT = None, **kwargs: Any) -> Layout:
+        """Lays out the text at the largest font size at which it fits into the given box,
+        wrapping it to the width of the box. The layout can be drawn with :meth:`text`.
+
+        See :meth:`.Engine.fit` for the parameters.
+
+        Returns
+        -------
+        :class:`~.Layout`
+        """
+        return self.engine.fit(text, size, font, **kwargs)
+
+    def text(self, xy: Tuple[int, int], text: Union[str, ParsedText, Layout], *args: Any, **kwargs: Any) -> None:
         """Draws the string at the given position, with emoji rendering support.
         This method supports multiline text.
 
-        .. note::
-            Some parameters have not been implemented yet.
-
         .. note::
             The signature of this function is a superset of the signature of Pillow's `ImageDraw.text`.
 
-        .. note::
-            Not all parameters are listed here.
-
-        Parameters
-        ----------
-        xy: Tuple[int, int]
-            The position to render the text at.
-        text: str
-            The text to render.
-        fill
-            The fill color of the text.
-        font
-            The font to render the text with.
-        spacing: int
-            How many pixels there should be between lines. Defaults to `4`
-        node_spacing: int
-            How many pixels there should be between nodes (text/unicode_emojis/custom_emojis). Defaults to `0`
-        emoji_scale_factor: float
-            The rescaling factor for emojis. This can be used for fine adjustments.
-            Defaults to the factor given in the class constructor, or `1`.
-        emoji_position_offset: Tuple[int, int]
-            The emoji position offset for emojis. This can be used for fine adjustments.
-            Defaults to the offset given in the class constructor, or `(0, 0)`.
+        See :meth:`.Engine.text` for the parameters.
         """
+        self.engine.text(self.image, xy, text, *args, draw=self.draw, **kwargs)
+
+    async def text_async(self, xy: Tuple[int, int], text: Union[str, ParsedText, Layout], *args: Any, **kwargs: Any) -> None:
+        """|coro|
 
-        if emoji_scale_factor is None:
-            emoji_scale_factor = self._default_emoji_scale_factor
-
-        if emoji_position_offset is None:
-            emoji_position_offset = self._default_emoji_position_offset
-
-        if font is None:
-            font = ImageFont.load_default()
-
-        args = (
-            fill,
-            font,
-            anchor,
-            spacing,
-            align,
-            direction,
-            features,
-            language,
-            stroke_width,
-            stroke_fill,
-            embedded_color,
-            *args
-        )
-
-        x, y = xy
-        original_x = x
-        nodes = to_nodes(text)
-
-        for line in nodes:
-            x = original_x
-
-            for node in line:
-                content = node.content
-
-                if tuple(int(part) for part in PIL.__version__.split(".")) >= (9, 2, 0):
-                    width = int(font.getlength(content))
-                else:
-                    width, _ = font.getsize(content)
-
-                if node.type is NodeType.text:
-                    self.draw.text((x, y), content, *args, **kwargs)
-                    x += node_spacing + width
-                    continue
-
-                stream = None
-                if node.type is NodeType.emoji:
-                    stream = self._get_emoji(content)
-
-                elif self._render_discord_emoji and node.type is NodeType.discord_emoji:
-                    stream = self._get_discord_emoji(content)
-
-                if not stream:
-                    self.draw.text((x, y), content, *args, **kwargs)
-                    x += node_spacing + width
-                    continue
-
-                with Image.open(stream).convert('RGBA') as asset:
-                    width = int(emoji_scale_factor * font.size)
-                    size = width, math.ceil(asset.height / asset.width * width)
-                    asset = asset.resize(size, Image.Resampling.LANCZOS)
-
-                    ox, oy = emoji_position_offset
-                    self.image.paste(asset, (x + ox, y + oy), asset)
-
-                x += node_spacing + width
-            y += spacing + font.size
+        Draws the string at the given position, with emoji rendering support,
+        without blocking the event loop.
+
+        See :meth:`.Engine.text_async` for the parameters.
+        """
+        await self.engine.text_async(self.image, xy, text, *args, draw=self.draw, **kwargs)
 
     def __enter__(self: P) -> P:
         return self
@@ -332,5 +258,14 @@ class Pilmoji:
     def __exit__(self, *_) -> None:
         self.close()
 
+    async def __aenter__(self: P) -> P:
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        self.close()
+
+        if self._owns_engine and isinstance(self.source, AsyncBaseSource):
+            await self.source.close()
+
     def __repr__(self) -> str:
-        return f'<Pilmoji source={self.source} cache={self._cache}>'
+        return f'<Pilmoji engine={self.engine!r}>'
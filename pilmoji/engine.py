@@ -0,0 +1,1360 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import os
+import time
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextvars import ContextVar
+from functools import lru_cache
+from threading import Lock
+from io import BytesIO
+from weakref import WeakKeyDictionary
+
+from PIL import Image, ImageDraw, ImageFont
+
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, TYPE_CHECKING, Tuple, Type, TypeVar, Union
+
+from .cache import BaseCache, CacheStats, LRUCache, SingleFlight
+from .composite import _composite_layer, _open_mipmaps, _resize_mipmaps, paste_many
+from .helpers import (
+    Layout, Node, NodeType, ParsedText, _default_font, _font_key, _measure,
+    fit, getsize, iter_layouts, layout, to_nodes, wrap
+)
+from .source import (
+    AsyncBaseSource, BaseSource, SourceUnavailable, Twemoji, discord_emoji_size
+)
+
+if TYPE_CHECKING:
+    from .atlas import EmojiAtlas
+
+    FontT = Union[ImageFont.ImageFont, ImageFont.FreeTypeFont, ImageFont.TransposedFont]
+    ColorT = Union[int, Tuple[int, int, int], Tuple[int, int, int, int], str]
+    EmojiKeyT = Union[Tuple[str, str], Tuple[str, int, int, Optional[str]]]
+
+
+E = TypeVar('E', bound='Engine')
+
+# Emojis which were fetched ahead of time by text_async, for the render running in the current context
+_fetched_emojis: ContextVar[Optional[Dict[EmojiKeyT, Optional[bytes]]]] = ContextVar('_fetched_emojis', default=None)
+
+# Renderers sharing a cache also share in-flight fetches, so that each emoji is only fetched once
+_flights: WeakKeyDictionary[BaseCache, SingleFlight] = WeakKeyDictionary()
+_flights_lock: Lock = Lock()
+
+__all__ = (
+    'Engine',
+)
+
+# The byte budget of the layer cache created by ``layer_cache=True``
+DEFAULT_LAYER_CACHE_SIZE: int = 32 * 1024 * 1024
+
+# Images of these modes can have rendered text pasted onto them
+_LAYER_MODES: Tuple[str, ...] = ('RGB', 'RGBA')
+
+
+@lru_cache(maxsize=256)
+def _ink(color: ColorT, mode: str, /) -> Optional[Tuple[int, ...]]:
+    # The pixel ImageDraw draws for the color onto an image of the mode. Packed integers
+    # are different colors for different modes, i.e. 255 is opaque red on RGB images
+    # and transparent red on RGBA images, so they are resolved the way ImageDraw does
+    if color is None:
+        return None
+
+    pixel = Image.new(mode, (1, 1))
+    ImageDraw.Draw(pixel).point((0, 0), color)
+    return pixel.getpixel((0, 0))
+
+
+def _is_plain_draw(draw: ImageDraw.ImageDraw, image: Image.Image, /) -> bool:
+    # Whether the drawing instance draws text onto the image as a new one would
+    plain = ImageDraw.Draw(image)
+    return (draw.mode, draw.ink, draw.fontmode) == (plain.mode, plain.ink, plain.fontmode)
+
+
+def _single_flight(cache: Optional[BaseCache], /) -> SingleFlight:
+    if cache is None:
+        return SingleFlight()
+
+    with _flights_lock:
+        if (flight := _flights.get(cache)) is None:
+            flight = _flights[cache] = SingleFlight()
+
+        return flight
+
+
+class Engine:
+    """A long-lived emoji renderer, which owns the emoji source, caches and fonts
+    and can render onto any image.
+
+    Unlike :class:`~.Pilmoji`, an engine is not tied to a single image, so one engine
+    can serve every render of a batch job or worker process. It is thread-safe.
+
+    .. note::
+        This should be used in a context manager, or be closed with :meth:`close`.
+
+    Parameters
+    ----------
+    source: Union[:class:`~.BaseSource`, Type[:class:`~.BaseSource`]]
+        The emoji image source to use.
+        This defaults to :class:`~.TwitterEmojiSource`.
+
+        An :class:`~.AsyncBaseSource` may also be given, in which case
+        only :meth:`text_async` can be used to render text.
+    cache: Union[bool, :class:`~.BaseCache`]
+        Whether or not to cache emojis given from source.
+        This caches both the raw image bytes and the decoded, resized
+        images that are ready to be pasted.
+        Enabling this is recommended and by default.
+
+        A :class:`~.BaseCache` can be given instead to share a cache
+        between multiple renderers, i.e. a bounded :class:`~.LRUCache`.
+        Shared caches are not cleared when this engine is closed.
+    render_discord_emoji: bool
+        Whether or not to render Discord emoji. Defaults to `True`
+    emoji_scale_factor: float
+        The default rescaling factor for emojis. Defaults to `1`
+    emoji_position_offset: Tuple[int, int]
+        A 2-tuple representing the x and y offset for emojis when rendering,
+        respectively. Defaults to `(0, 0)`
+    measure_cache: Optional[:class:`~.BaseCache`]
+        A cache to memoize parsed lines and measured text widths in,
+        i.e. an :class:`~.LRUCache` bounded by `max_entries`.
+        This speeds up rendering and measuring the same strings repeatedly,
+        and may be shared between renderers. Defaults to `None`
+    atlases: Iterable[:class:`~.EmojiAtlas`]
+        Emoji atlases of the source to crop emojis from, instead of fetching, decoding and
+        resizing them individually. Each atlas is used for emojis rendered at its size.
+        Emojis missing from the atlases are fetched from the source as usual.
+        Every atlas must have been built from this source, see :attr:`.EmojiAtlas.source_key`.
+    resample: int
+        The default resampling filter to resize emojis with. Faster filters such as
+        :attr:`PIL.Image.Resampling.BILINEAR` or :attr:`PIL.Image.Resampling.BOX` trade quality
+        for speed. Defaults to :attr:`PIL.Image.Resampling.LANCZOS`
+    discord_emoji_format: Optional[str]
+        The image format to request Discord emojis in, i.e. ``'webp'``, if the source
+        supports it. Discord emojis are always requested at the smallest size variant
+        that is at least as large as they are rendered. Defaults to `None`, which lets
+        the source decide.
+    missing_ttl: Optional[float]
+        How many seconds to remember that the source could not provide an emoji for,
+        i.e. a deleted Discord emoji, before requesting it again. ``None`` remembers
+        them for as long as the cache does. Defaults to `600`.
+
+        Emojis are not remembered as missing if the source was unavailable,
+        see :class:`~.SourceUnavailable`. This has no effect if caching is disabled.
+    font
+        The default font to render text with, when none is given.
+        Defaults to Pillow's default font.
+    fast_measure: bool
+        Whether to measure text with a table of character advances cached per font by default,
+        which is much faster than measuring with the font. See :func:`~.layout`. Defaults to `False`
+    layer_cache: Union[bool, :class:`~.BaseCache`]
+        Whether to cache fully rendered text, so that rendering the same text with the same font,
+        colors and options again is a single alpha composite, no matter the image it is rendered onto.
+        This suits names, badges and captions rendered onto many images. Only text rendered onto
+        RGB and RGBA images with the default anchor is cached.
+
+        Cached text is rendered onto a transparent layer, which is then composited. On RGB images,
+        this gives the same result as drawing the text directly. On RGBA images, emojis are alpha
+        composited rather than pasted through their alpha, so the antialiased edges of emojis are
+        more opaque than when drawn directly, by up to 64 of 255 in alpha for pixels of an emoji
+        which are half transparent, and differ in color wherever the image is translucent.
+        Text drawn with translucent colors onto RGBA images is not cached, and neither is text
+        drawn with a `draw` whose state was changed, i.e. its `fontmode`.
+
+        ``True`` creates an :class:`~.LRUCache` of up to 32 MiB, which is cleared when this engine
+        is closed. A :class:`~.BaseCache` can be given instead, i.e. an :class:`~.LRUCache` with
+        a different `max_size`, which may be shared. Defaults to `False`
+    """
+
+    def __init__(
+        self,
+        *,
+        source: Union[BaseSource, AsyncBaseSource, Type[BaseSource], Type[AsyncBaseSource]] = Twemoji,
+        cache: Union[bool, BaseCache] = True,
+        render_discord_emoji: bool = True,
+        emoji_scale_factor: float = 1.0,
+        emoji_position_offset: Tuple[int, int] = (0, 0),
+        measure_cache: Optional[BaseCache] = None,
+        atlases: Iterable[EmojiAtlas] = (),
+        resample: int = Image.Resampling.LANCZOS,
+        discord_emoji_format: Optional[str] = None,
+        missing_ttl: Optional[float] = 600.0,
+        font: FontT = None,
+        fast_measure: bool = False,
+        layer_cache: Union[bool, BaseCache] = False
+    ) -> None:
+        if isinstance(source, type):
+            if not issubclass(source, (BaseSource, AsyncBaseSource)):
+                raise TypeError(f'source must inherit from BaseSource, not {source}.')
+
+            source = source()
+
+        elif not isinstance(source, (BaseSource, AsyncBaseSource)):
+            raise TypeError(f'source must inherit from BaseSource, not {source.__class__}.')
+
+        self.source: Union[BaseSource, AsyncBaseSource] = source
+
+        if cache is True:
+            cache = LRUCache()
+            self._owns_cache: bool = True
+        else:
+            self._owns_cache: bool = False
+
+        if cache is not False and not isinstance(cache, BaseCache):
+            raise TypeError(f'cache must be a bool or inherit from BaseCache, not {cache.__class__}.')
+
+        self._cache: Optional[BaseCache] = None if cache is False else cache
+        self._flight: SingleFlight = _single_flight(self._cache)
+
+        self._render_discord_emoji: bool = render_discord_emoji
+        self._default_emoji_scale_factor: float = emoji_scale_factor
+        self._default_emoji_position_offset: Tuple[int, int] = emoji_position_offset
+        self._measure_cache: Optional[BaseCache] = measure_cache
+        self._atlases: Dict[Tuple[Hashable, int], EmojiAtlas] = {}
+
+        for atlas in atlases:
+            if atlas.source_key != source.cache_key:
+                raise ValueError(f'{atlas!r} was not built from {source!r}.')
+
+            self._atlases[atlas.source_key, atlas.size] = atlas
+        self._default_resample: int = resample
+        self._discord_emoji_format: Optional[str] = discord_emoji_format
+        self._missing_ttl: Optional[float] = missing_ttl
+        self._default_font: FontT = font
+        self._fast_measure: bool = fast_measure
+
+        self._owns_layer_cache: bool = layer_cache is True
+
+        if layer_cache is True:
+            layer_cache = LRUCache(DEFAULT_LAYER_CACHE_SIZE)
+
+        if layer_cache is not False and not isinstance(layer_cache, BaseCache):
+            raise TypeError(f'layer_cache must be a bool or inherit from BaseCache, not {layer_cache.__class__}.')
+
+        self._layer_cache: Optional[BaseCache] = None if layer_cache is False else layer_cache
+
+        self._fonts_lock: Lock = Lock()
+        self._fonts: Dict[Tuple[Any, ...], ImageFont.FreeTypeFont] = {}
+
+        self._stats_lock: Lock = Lock()
+        self._image_hits: int = 0
+        self._image_misses: int = 0
+
+    @property
+    def image_stats(self) -> CacheStats:
+        """:class:`~.CacheStats`: The statistics of the lookups of decoded and resized emoji images.
+
+        :attr:`~.CacheStats.hits` and :attr:`~.CacheStats.misses` count the images which were found
+        in the cache and the ones which had to be decoded and resized by this engine. The other
+        attributes are those of the whole cache, since it is shared with the raw emoji bytes.
+        """
+        if self._cache is None:
+            base = CacheStats(0, 0, 0, 0, 0, None)
+        else:
+            base = self._cache.stats
+
+        with self._stats_lock:
+            return base._replace(hits=self._image_hits, misses=self._image_misses)
+
+    def close(self) -> None:
+        """Closes the source and clears the cache, unless it is shared.
+
+        Any source with a `close` method is closed, i.e. the idle connections of an :class:`~.HTTPBasedSource`
+        or the archive of an :class:`~.ArchiveSource`. Asynchronous sources are closed by :meth:`close_async`.
+
+        The engine can still be used afterwards, starting out with an empty cache,
+        unless its source cannot be used once closed, like an :class:`~.ArchiveSource`.
+        """
+        if not isinstance(self.source, AsyncBaseSource) and callable(close := getattr(self.source, 'close', None)):
+            close()
+
+        if self._owns_cache:
+            self._cache.clear()
+
+        if self._owns_layer_cache:
+            self._layer_cache.clear()
+
+        with self._fonts_lock:
+            self._fonts.clear()
+
+    async def close_async(self) -> None:
+        """|coro|
+
+        Closes this engine, along with its source if it is asynchronous.
+        """
+        self.close()
+
+        if isinstance(self.source, AsyncBaseSource):
+            await self.source.close()
+
+    def get_font(
+        self,
+        path: Union[str, bytes, os.PathLike],
+        size: float,
+        /,
+        *,
+        index: int = 0,
+        **kwargs: Any
+    ) -> ImageFont.FreeTypeFont:
+        """Loads a TrueType or OpenType font, reusing it if it was already loaded by this engine.
+
+        Loading a font parses its file, so this saves doing so for every render.
+        Fonts loaded with the same arguments also share measurements
+        in the `measure_cache`.
+
+        Parameters
+        ----------
+        path: Union[str, bytes, :class:`os.PathLike`]
+            The path of the font file.
+        size: float
+            The size of the font, in pixels.
+        index: int
+            Which font face to load from the file. Defaults to `0`.
+        **kwargs
+            Passed to :func:`PIL.ImageFont.truetype`.
+
+        Returns
+        -------
+        :class:`PIL.ImageFont.FreeTypeFont`
+        """
+        key = os.fspath(path), size, index, *sorted(kwargs.items())
+
+        with self._fonts_lock:
+            if (font := self._fonts.get(key)) is not None:
+                return font
+
+        font = ImageFont.truetype(path, size, index, **kwargs)
+
+        with self._fonts_lock:
+            return self._fonts.setdefault(key, font)
+
+    def _get_cached(self, key: Tuple[Any, ...], /) -> Any:
+        if self._cache is None:
+            return None
+
+        return self._cache.get((self.source.cache_key, *key))
+
+    def _set_cached(self, key: Tuple[Any, ...], value: Any, /) -> None:
+        if self._cache is not None:
+            self._cache.set((self.source.cache_key, *key), value)
+
+    def _is_missing(self, key: EmojiKeyT, /) -> bool:
+        if (until := self._get_cached(('missing', *key))) is None:
+            return False
+
+        if until > time.monotonic():
+            return True
+
+        self._cache.delete((self.source.cache_key, 'missing', *key))
+        return False
+
+    def _set_missing(self, key: EmojiKeyT, /) -> None:
+        # Negative entries hold the monotonic time they expire at
+        ttl = self._missing_ttl
+        self._set_cached(('missing', *key), float('inf') if ttl is None else time.monotonic() + ttl)
+
+    def _emoji_key(self, node_type: NodeType, content: str, width: int, /) -> EmojiKeyT:
+        if node_type is NodeType.emoji:
+            return 'emoji', content
+
+        return 'discord_emoji', int(content), discord_emoji_size(width), self._discord_emoji_format
+
+    def _fetch(self, key: EmojiKeyT, /) -> Optional[BytesIO]:
+        if isinstance(self.source, AsyncBaseSource):
+            raise TypeError('Asynchronous sources can only be used with text_async.')
+
+        if key[0] == 'emoji':
+            return self.source.get_emoji(key[1])
+
+        _, id, size, format = key
+        return self.source.get_discord_emoji_variant(id, size=size, format=format)
+
+    async def _fetch_async(self, key: EmojiKeyT, /, executor: Optional[Executor] = None) -> Optional[bytes]:
+        if not isinstance(self.source, AsyncBaseSource):
+            loop = asyncio.get_running_loop()
+            flight_key = self.source.cache_key, *key
+            return await loop.run_in_executor(executor, self._flight.do, flight_key, self._load, key)
+
+        try:
+            if key[0] == 'emoji':
+                stream = await self.source.get_emoji(key[1])
+            else:
+                _, id, size, format = key
+                stream = await self.source.get_discord_emoji_variant(id, size=size, format=format)
+
+        except SourceUnavailable:
+            return None
+
+        if stream:
+            data = stream.getvalue()
+            self._set_cached(key, data)
+            return data
+
+        self._set_missing(key)
+
+    def _get_stream(self, key: EmojiKeyT, /) -> Optional[BytesIO]:
+        fetched = _fetched_emojis.get()
+
+        if fetched is not None and key in fetched:
+            data = fetched[key]
+            return data and BytesIO(data)
+
+        if data := self._get_cached(key):
+            return BytesIO(data)
+
+        if self._is_missing(key):
+            return None
+
+        if fetched is not None and isinstance(self.source, AsyncBaseSource):
+            # The emoji was cached when text_async looked for emojis to fetch, but has since been evicted
+            # or has expired. Asynchronous sources cannot be used from here, so it is drawn as text instead
+            return None
+
+        data = self._flight.do((self.source.cache_key, *key), self._load, key)
+        return data and BytesIO(data)
+
+    def _load(self, key: EmojiKeyT, /) -> Optional[bytes]:
+        # Only one thread loads each key at a time, see _get_stream.
+        # Another thread may have just finished loading it, so the cache is checked again
+        if data := self._get_cached(key):
+            return data
+
+        if self._is_missing(key):
+            return None
+
+        try:
+            stream = self._fetch(key)
+        except SourceUnavailable:
+            # The emoji may exist, so it is not remembered as missing
+            return None
+
+        if stream:
+            data = stream.getvalue()
+            self._set_cached(key, data)
+            return data
+
+        self._set_missing(key)
+
+    def _get_mipmaps(self, key: EmojiKeyT, /) -> Optional[Tuple[Image.Image, ...]]:
+        if (levels := self._get_cached(('mipmaps', *key))) is not None:
+            return levels
+
+        return self._flight.do((self.source.cache_key, 'mipmaps', *key), self._decode_mipmaps, key)
+
+    def _decode_mipmaps(self, key: EmojiKeyT, /) -> Optional[Tuple[Image.Image, ...]]:
+        if (levels := self._get_cached(('mipmaps', *key))) is not None:
+            return levels
+
+        if not (stream := self._get_stream(key)):
+            return None
+
+        levels = _open_mipmaps(stream)
+        self._set_cached(('mipmaps', *key), levels)
+
+        return levels
+
+    def _get_emoji_image(
+        self,
+        node_type: NodeType,
+        content: str,
+        width: int,
+        /,
+        resample: Optional[int] = None
+    ) -> Optional[Image.Image]:
+        if resample is None:
+            resample = self._default_resample
+
+        key = self._emoji_key(node_type, content, width)
+        cache_key = 'image', *key, width, resample
+
+        if (asset := self._get_cached(cache_key)) is not None:
+            with self._stats_lock:
+                self._image_hits += 1
+
+            return asset
+
+        with self._stats_lock:
+            self._image_misses += 1
+
+        atlas = self._atlases.get((self.source.cache_key, width))
+
+        if atlas is not None and atlas.resample == resample and node_type is NodeType.emoji:
+            asset = atlas.get(content)
+        else:
+            asset = None
+
+        if asset is None:
+            if (levels := self._get_mipmaps(key)) is None:
+                return None
+
+            asset = _resize_mipmaps(levels, width, resample)
+
+        self._set_cached(cache_key, asset)
+
+        return asset
+
+    def _missing_emojis(
+        self,
+        nodes: Iterable[List[Node]],
+        width: int,
+        /,
+        resample: Optional[int] = None
+    ) -> Set[EmojiKeyT]:
+        # Emojis are not missing if any stage of them is cached, down to the image resized for this render
+        if resample is None:
+            resample = self._default_resample
+
+        fetched = _fetched_emojis.get() or {}
+        source_key = self.source.cache_key
+        atlas = self._atlases.get((source_key, width))
+        keys = set()
+
+        for line in nodes:
+            for node in line:
+                if node.type is NodeType.text:
+                    continue
+
+                if node.type is NodeType.discord_emoji and not self._render_discord_emoji:
+                    continue
+
+                if (
+                    atlas is not None
+                    and atlas.resample == resample
+                    and node.type is NodeType.emoji
+                    and node.content in atlas
+                ):
+                    continue
+
+                key = self._emoji_key(node.type, node.content, width)
+
+                if key in keys or key in fetched:
+                    continue
+
+                if self._cache is not None and (
+                    (source_key, 'image', *key, width, resample) in self._cache
+                    or (source_key, 'mipmaps', *key) in self._cache
+                    or (source_key, *key) in self._cache
+                    or self._is_missing(key)
+                ):
+                    continue
+
+                keys.add(key)
+
+        return keys
+
+    def _prefetch_nodes(
+        self,
+        nodes: Iterable[List[Node]],
+        width: int,
+        /,
+        max_workers: int = 8,
+        resample: Optional[int] = None
+    ) -> None:
+        if self._cache is None:
+            return
+
+        keys = self._missing_emojis(nodes, width, resample)
+
+        if len(keys) < 2:
+            # Fetching a single emoji concurrently has no benefit
+            return
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as executor:
+            # Consume the results so that exceptions are propagated
+            for _ in executor.map(self._get_stream, keys):
+                pass
+
+    def prefetch(
+        self,
+        text: Union[str, Iterable[str]],
+        /,
+        font: FontT = None,
+        *,
+        emoji_scale_factor: float = None,
+        max_workers: int = 8
+    ) -> None:
+        """Concurrently fetches all emojis in the given text(s) into the cache.
+
+        :meth:`text` does this automatically, but this can be used to warm up
+        the cache for multiple texts at once before rendering them.
+
+        .. note::
+            This does nothing if caching is disabled.
+
+        Parameters
+        ----------
+        text: Union[str, Iterable[str]]
+            The text, or texts, to fetch emojis from.
+        font
+            The font the text will be rendered with.
+            Discord emojis are fetched at the size they will be rendered at.
+        emoji_scale_factor: float
+            The rescaling factor for emojis.
+            Defaults to the factor given in the class constructor, or `1`.
+        max_workers: int
+            The maximum amount of emojis to fetch at once. Defaults to `8`.
+        """
+        if isinstance(text, (str, ParsedText)):
+            text = text,
+
+        if font is None:
+            font = self._default_font or _default_font()
+
+        if emoji_scale_factor is None:
+            emoji_scale_factor = self._default_emoji_scale_factor
+
+        nodes = (line for item in text for line in (item if isinstance(item, ParsedText) else to_nodes(item)))
+        self._prefetch_nodes(nodes, int(emoji_scale_factor * font.size), max_workers=max_workers)
+
+    def layout(
+        self,
+        text: Union[str, ParsedText],
+        font: FontT = None,
+        *,
+        spacing: int = 4,
+        node_spacing: int = 0,
+        emoji_scale_factor: float = None,
+        merge_text: bool = False,
+        fast_measure: Optional[bool] = None
+    ) -> Layout:
+        """Parses and measures the text into a :class:`~.Layout`.
+        This method supports multiline text.
+
+        The layout can be measured with :attr:`.Layout.size` and then be drawn
+        with :meth:`text`, without parsing or measuring the text twice.
+
+        Parameters
+        ----------
+        text: Union[str, :class:`~.ParsedText`]
+            The text to lay out, or text which was already parsed with :func:`~.to_spans`.
+        font
+            The font of the text.
+            Defaults to the font given in the class constructor.
+        spacing: int
+            The spacing between lines, in pixels.
+            Defaults to `4`.
+        node_spacing: int
+            The spacing between nodes, in pixels.
+            Defaults to `0`.
+        emoji_scale_factor: float
+            The rescaling factor for emojis.
+            Defaults to the factor given in the class constructor, or `1`.
+        merge_text: bool
+            Whether to join the text runs of each line, with the space of each
+            emoji between them reserved by spaces. See :func:`~.layout`.
+            Defaults to `False`.
+        fast_measure: Optional[bool]
+            Whether to measure text with a table of character advances cached per font,
+            which is much faster. See :func:`~.layout`.
+            Defaults to the setting given in the class constructor, or `False`.
+
+        Returns
+        -------
+        :class:`~.Layout`
+        """
+        if emoji_scale_factor is None:
+            emoji_scale_factor = self._default_emoji_scale_factor
+
+        if fast_measure is None:
+            fast_measure = self._fast_measure
+
+        return layout(
+            text,
+            self._default_font if font is None else font,
+            spacing=spacing,
+            node_spacing=node_spacing,
+            emoji_scale_factor=emoji_scale_factor,
+            cache=self._measure_cache,
+            merge_text=merge_text,
+            fast_measure=fast_measure,
+            render_discord_emoji=self._render_discord_emoji,
+        )
+
+    def getsize(
+        self,
+        text: Union[str, ParsedText],
+        font: FontT = None,
+        *,
+        spacing: int = 4,
+        node_spacing: int = 0,
+        emoji_scale_factor: float = None,
+        merge_text: bool = False,
+        fast_measure: Optional[bool] = None
+    ) -> Tuple[int, int]:
+        """Return the width and height of the text when rendered.
+        This method supports multiline text.
+
+        Parameters
+        ----------
+        text: Union[str, :class:`~.ParsedText`]
+            The text to use, or text which was already parsed with :func:`~.to_spans`.
+        font
+            The font of the text.
+        spacing: int
+            The spacing between lines, in pixels.
+            Defaults to `4`.
+        node_spacing: int
+            The spacing between nodes, in pixels.
+            Defaults to `0`.
+        emoji_scalee_factor: float
+            The rescaling factor for emojis.
+            Defaults to the factor given in the class constructor, or `1`.
+        merge_text: bool
+            Whether to join the text runs of each line, which does not change the size.
+            See :meth:`layout`.
+        fast_measure: Optional[bool]
+            Whether to measure text with a table of character advances.
+            See :meth:`layout`.
+        """
+        if emoji_scale_factor is None:
+            emoji_scale_factor = self._default_emoji_scale_factor
+
+        if fast_measure is None:
+            fast_measure = self._fast_measure
+
+        return getsize(
+            text,
+            self._default_font if font is None else font,
+            spacing=spacing,
+            node_spacing=node_spacing,
+            emoji_scale_factor=emoji_scale_factor,
+            cache=self._measure_cache,
+            merge_text=merge_text,
+            fast_measure=fast_measure,
+            render_discord_emoji=self._render_discord_emoji,
+        )
+
+    def wrap(
+        self,
+        text: str,
+        width: float,
+        font: FontT = None,
+        *,
+        emoji_scale_factor: float = None,
+        fast_measure: Optional[bool] = None,
+        break_long_words: bool = True
+    ) -> str:
+        """Wraps the text so that no line is wider than the given width, measuring each word once.
+        See :func:`~.wrap`.
+
+        Parameters
+        ----------
+        text: str
+            The text to wrap.
+        width: float
+            The maximum width of a line, in pixels.
+        font
+            The font of the text.
+            Defaults to the font given in the class constructor.
+        emoji_scale_factor: float
+            The rescaling factor for emojis.
+            Defaults to the factor given in the class constructor, or `1`.
+        fast_measure: Optional[bool]
+            Whether to measure text with a table of character advances.
+            See :meth:`layout`.
+        break_long_words: bool
+            Whether to break words which are wider than a whole line between characters.
+            Defaults to `True`.
+
+        Returns
+        -------
+        str
+            The wrapped text.
+        """
+        if emoji_scale_factor is None:
+            emoji_scale_factor = self._default_emoji_scale_factor
+
+        if fast_measure is None:
+            fast_measure = self._fast_measure
+
+        return wrap(
+            text,
+            self._default_font if font is None else font,
+            width=width,
+            emoji_scale_factor=emoji_scale_factor,
+            cache=self._measure_cache,
+            fast_measure=fast_measure,
+            break_long_words=break_long_words,
+            render_discord_emoji=self._render_discord_emoji,
+        )
+
+    def fit(
+        self,
+        text: str,
+        size: Tuple[int, int],
+        font: FontT = None,
+        *,
+        min_font_size: int = 1,
+        wrap: bool = True,
+        spacing: int = 4,
+        emoji_scale_factor: float = None,
+        merge_text: bool = False,
+        fast_measure: Optional[bool] = None,
+        break_long_words: bool = True
+    ) -> Layout:
+        """Lays out the text at the largest font size at which it fits into the given box,
+        wrapping it to the width of the box. See :func:`~.fit`.
+
+        The returned layout can be drawn with :meth:`text`.
+
+        Parameters
+        ----------
+        text: str
+            The text to fit.
+        size: Tuple[int, int]
+            The width and height of the box, in pixels.
+        font: :class:`PIL.ImageFont.FreeTypeFont`
+            The font of the text, at the largest size to try.
+            Defaults to the font given in the class constructor.
+        min_font_size: int
+            The smallest font size to try. Defaults to `1`.
+        wrap: bool
+            Whether to wrap the text to the width of the box. Defaults to `True`.
+        spacing: int
+            The spacing between lines, in pixels.
+            Defaults to `4`.
+        emoji_scale_factor: float
+            The rescaling factor for emojis.
+            Defaults to the factor given in the class constructor, or `1`.
+        merge_text: bool
+            Whether to join the text runs of each line.
+            See :meth:`layout`.
+        fast_measure: Optional[bool]
+            Whether to measure text with a table of character advances.
+            See :meth:`layout`.
+        break_long_words: bool
+            Whether to break words which are wider than a whole line between characters.
+            Defaults to `True`.
+
+        Returns
+        -------
+        :class:`~.Layout`
+        """
+        if emoji_scale_factor is None:
+            emoji_scale_factor = self._default_emoji_scale_factor
+
+        if fast_measure is None:
+            fast_measure = self._fast_measure
+
+        return fit(
+            text,
+            self._default_font if font is None else font,
+            size=size,
+            min_font_size=min_font_size,
+            wrap=wrap,
+            spacing=spacing,
+            emoji_scale_factor=emoji_scale_factor,
+            cache=self._measure_cache,
+            merge_text=merge_text,
+            fast_measure=fast_measure,
+            break_long_words=break_long_words,
+            render_discord_emoji=self._render_discord_emoji,
+        )
+
+    def render_strips(
+        self,
+        text: Union[str, ParsedText, Iterable[str]],
+        width: int,
+        font: FontT = None,
+        *,
+        fill: ColorT = None,
+        lines_per_strip: int = 64,
+        mode: str = 'RGBA',
+        color: ColorT = 0,
+        spacing: int = 4,
+        node_spacing: int = 0,
+        emoji_scale_factor: float = None,
+        merge_text: bool = False,
+        fast_measure: Optional[bool] = None,
+        **kwargs: Any
+    ) -> Iterator[Image.Image]:
+        """Lazily renders the text into strips of up to `lines_per_strip` lines each.
+
+        This is meant for very long texts, i.e. chat logs: the text is parsed, measured and
+        rendered one strip at a time, so the memory this uses is bounded by the size of a strip
+        no matter how long the text is. Stacking the strips vertically gives the same image as
+        rendering all of the text at once, except that glyphs reaching past the bottom of their
+        line into the next strip are cut off.
+
+        Parameters
+        ----------
+        text: Union[str, :class:`~.ParsedText`, Iterable[str]]
+            The text to render. This may also be an iterable of strings, i.e. a file,
+            which is consumed as strips are rendered. See :func:`~.iter_layouts`.
+        width: int
+            The width of each strip, in pixels. Text past it is cut off,
+            it can be wrapped beforehand with :meth:`wrap`.
+        font
+            The font to render the text with.
+            Defaults to the font given in the class constructor.
+        fill
+            The fill color of the text.
+        lines_per_strip: int
+            The amount of lines of each strip, except for the last one. Each strip is
+            ``lines_per_strip * (font.size + spacing)`` pixels tall. Defaults to `64`.
+        mode: str
+            The mode of the strips. Defaults to ``'RGBA'``.
+        color
+            The background color of the strips. Defaults to transparent.
+        spacing: int
+            The spacing between lines, in pixels.
+            Defaults to `4`.
+        node_spacing: int
+            The spacing between nodes, in pixels.
+            Defaults to `0`.
+        emoji_scale_factor: float
+            The rescaling factor for emojis.
+            Defaults to the factor given in the class constructor, or `1`.
+        merge_text: bool
+            Whether to draw the text of each line with as few draw calls as possible.
+            See :meth:`text`.
+        fast_measure: Optional[bool]
+            Whether to measure text with a table of character advances.
+            See :meth:`layout`.
+        **kwargs
+            Any other keyword arguments to pass to :meth:`text`, i.e. `stroke_width`.
+
+        Yields
+        ------
+        :class:`PIL.Image.Image`
+            Each strip, from top to bottom.
+        """
+        if emoji_scale_factor is None:
+            emoji_scale_factor = self._default_emoji_scale_factor
+
+        if fast_measure is None:
+            fast_measure = self._fast_measure
+
+        layouts = iter_layouts(
+            text,
+            self._default_font if font is None else font,
+            max_lines=lines_per_strip,
+            spacing=spacing,
+            node_spacing=node_spacing,
+            emoji_scale_factor=emoji_scale_factor,
+            cache=self._measure_cache,
+            merge_text=merge_text,
+            fast_measure=fast_measure,
+            render_discord_emoji=self._render_discord_emoji,
+        )
+
+        def render(strip: Layout, height: int) -> Image.Image:
+            image = Image.new(mode, (width, height), color)
+            self.text(image, (0, 0), strip, fill, **kwargs)
+            return image
+
+        # Look one strip ahead, so that only the last strip leaves out the spacing below it
+        previous = None
+
+        for current in layouts:
+            if previous is not None:
+                yield render(previous, previous.height + spacing)
+
+            previous = current
+
+        if previous is not None:
+            yield render(previous, previous.height)
+
+    def text(
+        self,
+        image: Image.Image,
+        xy: Tuple[int, int],
+        text: Union[str, ParsedText, Layout],
+        fill: ColorT = None,
+        font: FontT = None,
+        anchor: str = None,
+        spacing: int = 4,
+        node_spacing: int = 0,
+        align: str = "left",
+        direction: str = None,
+        features: str = None,
+        language: str = None,
+        stroke_width: int = 0,
+        stroke_fill: ColorT = None,
+        embedded_color: bool = False,
+        *args,
+        draw: Optional[ImageDraw.ImageDraw] = None,
+        emoji_scale_factor: float = None,
+        emoji_position_offset: Tuple[int, int] = None,
+        merge_text: bool = False,
+        fast_measure: Optional[bool] = None,
+        resample: Optional[int] = None,
+        batch_emojis: bool = False,
+        **kwargs
+    ) -> None:
+        """Draws the string onto the given image at the given position, with emoji rendering support.
+        This method supports multiline text.
+
+        .. note::
+            Some parameters have not been implemented yet.
+
+        .. note::
+            The signature of this function is a superset of the signature of Pillow's `ImageDraw.text`.
+
+        .. note::
+            Not all parameters are listed here.
+
+        Parameters
+        ----------
+        image: :class:`PIL.Image.Image`
+            The image to render the text onto.
+        xy: Tuple[int, int]
+            The position to render the text at.
+        text: Union[str, :class:`~.ParsedText`, :class:`~.Layout`]
+            The text to render, or text which was already parsed with :func:`~.to_spans`.
+
+            This may also be a layout from :meth:`layout`, in which case it is drawn
+            as it was measured: `font`, `spacing`, `node_spacing` and `emoji_scale_factor`
+            are taken from the layout instead.
+
+            Emojis which could not be retrieved from the source are drawn as text,
+            moving the rest of their line so that it does not overlap. The size of the
+            layout does not account for this, since it is measured before emojis are fetched.
+        fill
+            The fill color of the text.
+        font
+            The font to render the text with.
+            Defaults to the font given in the class constructor.
+        spacing: int
+            How many pixels there should be between lines. Defaults to `4`
+        node_spacing: int
+            How many pixels there should be between nodes (text/unicode_emojis/custom_emojis). Defaults to `0`
+        draw: Optional[:class:`PIL.ImageDraw.ImageDraw`]
+            The drawing instance of the image to draw text with.
+            If left unfilled, a new drawing instance is created.
+        emoji_scale_factor: float
+            The rescaling factor for emojis. This can be used for fine adjustments.
+            Defaults to the factor given in the class constructor, or `1`.
+        emoji_position_offset: Tuple[int, int]
+            The emoji position offset for emojis. This can be used for fine adjustments.
+            Defaults to the offset given in the class constructor, or `(0, 0)`.
+        merge_text: bool
+            Whether to draw the text of each line with as few draw calls as possible,
+            with the space of each emoji reserved by spaces. This draws the same pixels,
+            with fewer draw calls on lines with many emojis. See :meth:`layout`. Defaults to `False`
+        fast_measure: Optional[bool]
+            Whether to measure text with a table of character advances. See :meth:`layout`.
+            Defaults to the setting given in the class constructor, or `False`.
+        resample: int
+            The resampling filter to resize emojis with.
+            Defaults to the filter given in the class constructor, or :attr:`PIL.Image.Resampling.LANCZOS`.
+        batch_emojis: bool
+            Whether to paste all emojis after the text, in one batch with :func:`.composite.paste_many`.
+            This is faster for text with many emojis, but emojis are drawn over any text they overlap,
+            i.e. with a negative `node_spacing` or an `emoji_position_offset`, rather than stacking
+            as the text is written. Defaults to `False`
+        """
+
+        if emoji_position_offset is None:
+            emoji_position_offset = self._default_emoji_position_offset
+
+        if isinstance(text, Layout):
+            font = text.font
+            spacing = text.spacing
+        else:
+            text = self.layout(
+                text,
+                font,
+                spacing=spacing,
+                node_spacing=node_spacing,
+                emoji_scale_factor=emoji_scale_factor,
+                merge_text=merge_text,
+                fast_measure=fast_measure,
+            )
+            font = text.font
+
+        args = (
+            fill,
+            font,
+            anchor,
+            spacing,
+            align,
+            direction,
+            features,
+            language,
+            stroke_width,
+            stroke_fill,
+            embedded_color,
+            *args
+        )
+
+        self._prefetch_nodes(text.lines, int(text.emoji_scale_factor * font.size), resample=resample)
+
+        if (
+            key := self._layer_key(image, draw, text, args, kwargs, emoji_position_offset, resample, batch_emojis)
+        ) is not None:
+            if (layer := self._layer_cache.get(key)) is None:
+                layer, complete = self._render_layer(
+                    image.mode, text, args, kwargs, emoji_position_offset, resample, batch_emojis,
+                )
+
+                # If an emoji could not be retrieved its text is drawn in its place, which is not cached
+                if complete:
+                    self._layer_cache.set(key, layer)
+
+            rendered, left, top = layer
+
+            if rendered is not None:
+                _composite_layer(image, rendered, (xy[0] + left, xy[1] + top))
+
+            return
+
+        if draw is None:
+            draw = ImageDraw.Draw(image)
+
+        self._draw_layout(image, draw, xy, text, args, kwargs, emoji_position_offset, resample, batch=batch_emojis)
+
+    def _draw_layout(
+        self,
+        image: Image.Image,
+        draw: ImageDraw.ImageDraw,
+        xy: Tuple[int, int],
+        text: Layout,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        emoji_position_offset: Tuple[int, int],
+        resample: Optional[int],
+        /,
+        *,
+        composite: bool = False,
+        batch: bool = False
+    ) -> bool:
+        # Returns whether every emoji could be drawn as an image.
+        # Emojis are alpha composited instead of pasted if composite is set,
+        # and after all of the text rather than in order with it if batch is set
+        x, y = xy
+        ox, oy = emoji_position_offset
+        emoji_width = int(text.emoji_scale_factor * text.font.size)
+        complete = True
+        placements = []
+
+        for line in text.lines:
+            # Emojis drawn as text are measured as they are drawn, moving the rest of their line.
+            # Merged lines are drawn in one piece, so their emojis are drawn within their slots instead
+            shift = 0
+
+            for run in line:
+                position = x + run.x + shift, y + run.y
+
+                if run.type is NodeType.text:
+                    draw.text(position, run.content, *args, **kwargs)
+                    continue
+
+                asset = None
+                if run.type is NodeType.emoji or self._render_discord_emoji:
+                    asset = self._get_emoji_image(run.type, run.content, emoji_width, resample)
+
+                    if asset is None:
+                        complete = False
+
+                if asset is None:
+                    draw.text(position, run.content, *args, **kwargs)
+
+                    if not text.merge_text:
+                        shift += _measure(text.font, run.content, self._measure_cache, self._fast_measure) - run.width
+
+                    continue
+
+                # Emojis are drawn in order with the text, so that whatever overlaps stacks as it is written
+                destination = position[0] + ox, position[1] + oy
+
+                if batch:
+                    placements.append((asset, destination))
+                elif composite:
+                    image.alpha_composite(asset, destination)
+                else:
+                    image.paste(asset, destination, asset)
+
+        if composite:
+            for asset, destination in placements:
+                image.alpha_composite(asset, destination)
+        elif placements:
+            paste_many(image, placements)
+
+        return complete
+
+    def _layer_key(
+        self,
+        image: Image.Image,
+        draw: Optional[ImageDraw.ImageDraw],
+        text: Layout,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        emoji_position_offset: Tuple[int, int],
+        resample: Optional[int],
+        batch: bool,
+        /
+    ) -> Optional[Tuple[Any, ...]]:
+        # Other anchors move each run by its own size, which a layer cannot account for.
+        # Embedded color glyphs are pasted rather than blended, so they cannot be drawn onto a layer
+        if self._layer_cache is None or image.mode not in _LAYER_MODES or args[2] not in (None, 'la') or args[10]:
+            return None
+
+        # The layer is drawn with a drawing instance of its own, so text drawn with one whose state
+        # was changed, i.e. its fontmode, or which blends onto the image, is drawn directly
+        if draw is not None and not _is_plain_draw(draw, image):
+            return None
+
+        try:
+            fill, stroke_fill = _ink(args[0], image.mode), _ink(args[9], image.mode)
+        except (TypeError, ValueError):
+            # i.e. a color given as a list, or one which ImageDraw does not accept either
+            return None
+
+        # Translucent colors replace the alpha of RGBA images when drawn directly, unlike a composited layer
+        if image.mode == 'RGBA' and any(color is not None and color[3] != 255 for color in (fill, stroke_fill)):
+            return None
+
+        _, font, *options = args
+        options[8] = stroke_fill
+        key = (
+            'layer',
+            self.source.cache_key,
+            image.mode,
+            tuple(map(tuple, text.lines)),
+            _font_key(font),
+            text.emoji_scale_factor,
+            fill,
+            *options,
+            tuple(sorted(kwargs.items())),
+            emoji_position_offset,
+            self._default_resample if resample is None else resample,
+            self._render_discord_emoji,
+            self._discord_emoji_format,
+            self._atlases.get((self.source.cache_key, int(text.emoji_scale_factor * font.size))),
+            batch,
+        )
+
+        try:
+            hash(key)
+        except TypeError:
+            # i.e. features given as a list
+            return None
+
+        return key
+
+    def _render_layer(
+        self,
+        mode: str,
+        text: Layout,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        emoji_position_offset: Tuple[int, int],
+        resample: Optional[int],
+        batch: bool,
+        /
+    ) -> Tuple[Tuple[Optional[Image.Image], int, int], bool]:
+        # Renders the text onto a transparent layer, cropped to the pixels it covers.
+        # Also returns whether every emoji could be drawn as an image, since the layer is not cached otherwise
+        # The colors are drawn as they would be onto the image, i.e. opaque on images without alpha
+        fill, font, anchor, spacing, align, direction, features, language, stroke_width, stroke_fill, *rest = args
+        args = (_ink(fill, mode), font, anchor, spacing, align, direction, features, language,
+                stroke_width, _ink(stroke_fill, mode), *rest)
+
+        ox, oy = emoji_position_offset
+        overhang = text.font.size + args[8]
+        margin_x, margin_y = overhang + abs(ox), overhang + abs(oy)
+
+        # Emojis drawn as text may be wider than their slots and move the rest of their line
+        fallback = 0
+        if not text.merge_text:
+            fallback = max(
+                (
+                    sum(
+                        max(_measure(text.font, run.content, self._measure_cache, self._fast_measure) - run.width, 0)
+                        for run in line
+                        if run.type is not NodeType.text
+                    )
+                    for line in text.lines
+                ),
+                default=0,
+            )
+
+        layer = Image.new('RGBA', (text.width + fallback + margin_x * 2, text.height + margin_y * 2), 0)
+        draw = ImageDraw.Draw(layer)
+
+        complete = self._draw_layout(
+            layer, draw, (margin_x, margin_y), text, args, kwargs, emoji_position_offset, resample,
+            composite=True, batch=batch,
+        )
+
+        if (bbox := layer.getchannel('A').getbbox()) is None:
+            return (None, 0, 0), complete
+
+        return (layer.crop(bbox), bbox[0] - margin_x, bbox[1] - margin_y), complete
+
+    async def text_async(
+        self,
+        image: Image.Image,
+        xy: Tuple[int, int],
+        text: Union[str, ParsedText, Layout],
+        *args: Any,
+        executor: Optional[Executor] = None,
+        **kwargs: Any
+    ) -> None:
+        """|coro|
+
+        Draws the string onto the given image at the given position, with emoji rendering support,
+        without blocking the event loop.
+
+        All emojis which are not cached are fetched concurrently first, through
+        the :class:`~.AsyncBaseSource` if one is used, or otherwise by running the
+        synchronous source in an executor. The text is then drawn in an executor.
+
+        This takes the same parameters as :meth:`text`.
+
+        Parameters
+        ----------
+        executor: Optional[:class:`concurrent.futures.Executor`]
+            The executor to fetch emojis and draw the text in.
+            Defaults to the event loop's default executor.
+        """
+        bound = inspect.signature(self.text).bind(image, xy, text, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+
+        if not isinstance(text, Layout):
+            # The layout is needed up front to know the size emojis are rendered at
+            arguments['text'] = text = self.layout(
+                text,
+                arguments['font'],
+                spacing=arguments['spacing'],
+                node_spacing=arguments['node_spacing'],
+                emoji_scale_factor=arguments['emoji_scale_factor'],
+                merge_text=arguments['merge_text'],
+                fast_measure=arguments['fast_measure'],
+            )
+
+        emoji_width = int(text.emoji_scale_factor * text.font.size)
+        keys = list(self._missing_emojis(text.lines, emoji_width, arguments['resample']))
+        results = await asyncio.gather(*(self._fetch_async(key, executor) for key in keys))
+        fetched = dict(zip(keys, results))
+
+        def render() -> None:
+            token = _fetched_emojis.set(fetched)
+
+            try:
+                self.text(*bound.args, **bound.kwargs)
+            finally:
+                _fetched_emojis.reset(token)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, render)
+
+    def __enter__(self: E) -> E:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    async def __aenter__(self: E) -> E:
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close_async()
+
+    def __repr__(self) -> str:
+        return f'<Engine source={self.source} cache={self._cache}>'
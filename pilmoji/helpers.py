@@ -1,32 +1,110 @@
 from __future__ import annotations
 
+import math
+import os
 import re
 
+from array import array
 from enum import Enum
-
-from emoji import unicode_codes
+from functools import lru_cache
+from itertools import islice
 
 import PIL
 from PIL import ImageFont
 
-from typing import Dict, Final, List, NamedTuple, TYPE_CHECKING, Tuple
+from typing import Any, Dict, Final, Hashable, Iterable, Iterator, List, NamedTuple, Optional, TYPE_CHECKING, Tuple, Union
+
+from .cache import BaseCache, LRUCache
+from .metrics import advance_table
 
 if TYPE_CHECKING:
     from .core import FontT
 
-# This is actually way faster than it seems
-language_pack: Dict[str, str] = unicode_codes.get_emoji_unicode_dict('en')
-_UNICODE_EMOJI_REGEX = '|'.join(map(re.escape, sorted(language_pack.values(), key=len, reverse=True)))
+_HAS_GETLENGTH: Final[bool] = tuple(map(int, re.findall(r'\d+', PIL.__version__)[:2])) >= (9, 2)
+
 _DISCORD_EMOJI_REGEX = '<a?:[a-zA-Z0-9_]{1,32}:[0-9]{17,22}>'
+_DISCORD_EMOJI_PATTERN: Final[re.Pattern[str]] = re.compile('<a?:[a-zA-Z0-9_]{1,32}:([0-9]{17,22})>')
+
+
+def _build_trie(emojis: Iterable[str], /) -> Dict[str, Any]:
+    trie = {}
+
+    for emoji in emojis:
+        node = trie
+        for char in emoji:
+            node = node.setdefault(char, {})
+
+        # The empty string marks the end of an emoji, since it is never a character
+        node[''] = True
+
+    return trie
+
+
+def _char_ranges(chars: Iterable[str], /) -> str:
+    ranges = []
+
+    for code in sorted(map(ord, chars)):
+        if ranges and ranges[-1][1] == code - 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+
+    return ''.join(
+        re.escape(chr(first)) if first == last else f'{re.escape(chr(first))}-{re.escape(chr(last))}'
+        for first, last in ranges
+    )
+
+
+@lru_cache(maxsize=None)
+def _emoji_tables() -> Tuple[Dict[str, str], Dict[str, Any], re.Pattern[str]]:
+    # The emoji tables are only built once they are first needed, which keeps importing cheap
+    from emoji import unicode_codes
+
+    # This is actually way faster than it seems
+    language_pack = unicode_codes.get_emoji_unicode_dict('en')
+    trie = _build_trie(language_pack.values())
+
+    # Matches any character which could start an emoji, so that runs of plain text are skipped in C.
+    # The characters are collapsed into ranges, since the regex engine tests a class one item at a time
+    start_regex = re.compile('[' + _char_ranges({*trie, '<'}) + ']')
+
+    return language_pack, trie, start_regex
+
+
+# Served by __getattr__ below, which compiles it on first use
+EMOJI_REGEX: Final[re.Pattern[str]]
+
 
-EMOJI_REGEX: Final[re.Pattern[str]] = re.compile(f'({_UNICODE_EMOJI_REGEX}|{_DISCORD_EMOJI_REGEX})')
+def __getattr__(name: str) -> Any:
+    if name == 'language_pack':
+        return _emoji_tables()[0]
 
+    if name == 'EMOJI_REGEX':
+        # Compiling the alternation of every emoji is expensive, so it is only done once it is first used.
+        # The pattern is then stored on the module, so that later lookups do not reach this function
+        language_pack, *_ = _emoji_tables()
+        unicode_emoji_regex = '|'.join(map(re.escape, sorted(language_pack.values(), key=len, reverse=True)))
+
+        pattern = globals()['EMOJI_REGEX'] = re.compile(f'({unicode_emoji_regex}|{_DISCORD_EMOJI_REGEX})')
+        return pattern
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+# EMOJI_REGEX is left out, since star imports would compile it. pilmoji re-exports it lazily instead
 __all__ = (
-    'EMOJI_REGEX',
     'Node',
     'NodeType',
+    'Run',
+    'Layout',
     'to_nodes',
-    'getsize'
+    'ParsedText',
+    'to_spans',
+    'layout',
+    'getsize',
+    'iter_layouts',
+    'wrap',
+    'fit',
 )
 
 
@@ -68,25 +146,64 @@ class Node(NamedTuple):
         return f'<Node type={self.type.name!r} content={self.content!r}>'
 
 
-def _parse_line(line: str, /) -> List[Node]:
-    nodes = []
+def _match_emoji(line: str, start: int, end: int, /) -> Tuple[Optional[NodeType], int]:
+    if line[start] == '<':
+        if match := _DISCORD_EMOJI_PATTERN.match(line, start, end):
+            return NodeType.discord_emoji, match.end()
 
-    for i, chunk in enumerate(EMOJI_REGEX.split(line)):
-        if not chunk:
-            continue
+        return None, start
+
+    # Find the longest emoji starting here, like the alternation in EMOJI_REGEX would
+    _, node, _ = _emoji_tables()
+    emoji_end = start
+
+    for index in range(start, end):
+        node = node.get(line[index])
+        if node is None:
+            break
+
+        if '' in node:
+            emoji_end = index + 1
+
+    return (NodeType.emoji if emoji_end > start else None), emoji_end
 
-        if not i % 2:
-            nodes.append(Node(NodeType.text, chunk))
+
+def _iter_spans(line: str, /, pos: int = 0, endpos: Optional[int] = None) -> Iterator[Tuple[NodeType, int, int]]:
+    # Yields the type, start and end of each node in line[pos:endpos], without copying any text
+    if endpos is None:
+        endpos = len(line)
+
+    search = _emoji_tables()[2].search
+    position = text_start = pos
+
+    while match := search(line, position, endpos):
+        start = match.start()
+        node_type, end = _match_emoji(line, start, endpos)
+
+        if node_type is None:
+            position = start + 1
             continue
 
-        if len(chunk) > 18:  # This is guaranteed to be a Discord emoji
-            node = Node(NodeType.discord_emoji, chunk.split(':')[-1][:-1])
-        else:
-            node = Node(NodeType.emoji, chunk)
+        if text_start < start:
+            yield NodeType.text, text_start, start
+
+        yield node_type, start, end
+        position = text_start = end
+
+    if text_start < endpos:
+        yield NodeType.text, text_start, endpos
+
+
+def _node_content(text: str, node_type: NodeType, start: int, end: int, /) -> str:
+    # The content of a Discord emoji node is its ID
+    if node_type is NodeType.discord_emoji:
+        return text[text.rindex(':', start, end) + 1:end - 1]
+
+    return text[start:end]
 
-        nodes.append(node)
 
-    return nodes
+def _parse_line(line: str, /) -> List[Node]:
+    return [Node(node_type, _node_content(line, node_type, start, end)) for node_type, start, end in _iter_spans(line)]
 
 
 def to_nodes(text: str, /) -> List[List[Node]]:
@@ -107,55 +224,971 @@ def to_nodes(text: str, /) -> List[List[Node]]:
     -------
     List[List[:class:`~.Node`]]
     """
-    return [_parse_line(line) for line in text.splitlines()]
+    return list(_parse_lines(text))
+
+
+class ParsedText:
+    """Represents text which has been parsed into nodes, stored compactly as offsets into the text.
+
+    Rather than one :class:`~.Node` and one copied substring per node, this stores the type,
+    start and end of each node in arrays, taking 9 bytes per node. Nodes are only created
+    as they are accessed, so this can be used in place of the list :func:`to_nodes` returns:
+    indexing or iterating over it gives the :class:`~.Node`s of each line.
+
+    This can be passed to :func:`layout`, :func:`getsize` and :meth:`.Pilmoji.text`
+    in place of the text, without parsing it again. :func:`getsize` measures it
+    without creating any nodes.
+
+    Parameters
+    ----------
+    text: str
+        The text to parse.
+
+    Attributes
+    ----------
+    text: str
+        The text which was parsed.
+    """
+
+    __slots__ = ('text', '_types', '_starts', '_ends', '_lines')
+
+    def __init__(self, text: str, /) -> None:
+        self.text: str = text
+
+        # Offsets only need 4 bytes each, unless the text is larger than 4 GiB
+        typecode = 'I' if len(text) < 1 << 32 else 'Q'
+
+        self._types: array[int] = array('B')
+        self._starts: array[int] = array(typecode)
+        self._ends: array[int] = array(typecode)
+
+        # The index of the first node of each line, followed by the amount of nodes
+        self._lines: array[int] = array(typecode, [0])
+
+        codes = {node_type: node_type.value for node_type in NodeType}
+
+        for line_start, line_end in _iter_line_bounds(text):
+            for node_type, start, end in _iter_spans(text, line_start, line_end):
+                self._types.append(codes[node_type])
+                self._starts.append(start)
+                self._ends.append(end)
+
+            self._lines.append(len(self._types))
+
+    @property
+    def node_count(self) -> int:
+        """int: The amount of nodes in all lines of the text."""
+        return len(self._types)
+
+    @property
+    def nbytes(self) -> int:
+        """int: The amount of bytes the parsed nodes take up, not counting the text itself."""
+        return sum(buffer.itemsize * len(buffer) for buffer in (self._types, self._starts, self._ends, self._lines))
+
+    def spans(self, index: int, /) -> Iterator[Tuple[NodeType, int, int]]:
+        """Iterates over the nodes of a line as offsets into :attr:`text`, without creating any nodes.
+
+        Parameters
+        ----------
+        index: int
+            The index of the line.
+
+        Yields
+        ------
+        Tuple[:class:`~.NodeType`, int, int]
+            The type of each node, and the start and end of its source text in :attr:`text`.
+        """
+        index = range(len(self))[index]
+        types = _NODE_TYPES
+
+        for position in range(self._lines[index], self._lines[index + 1]):
+            yield types[self._types[position]], self._starts[position], self._ends[position]
+
+    def to_nodes(self) -> List[List[Node]]:
+        """Creates the nodes of every line, like :func:`to_nodes` does.
+
+        Returns
+        -------
+        List[List[:class:`~.Node`]]
+        """
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self._lines) - 1
+
+    def __getitem__(self, index: int, /) -> List[Node]:
+        text = self.text
+        return [
+            Node(node_type, _node_content(text, node_type, start, end))
+            for node_type, start, end in self.spans(index)
+        ]
+
+    def __iter__(self) -> Iterator[List[Node]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return f'<ParsedText lines={len(self)} nodes={self.node_count}>'
+
+
+# NodeType members, indexed by their value
+_NODE_TYPES: Final[Tuple[NodeType, ...]] = tuple(NodeType)
+
+
+def to_spans(text: str, /) -> ParsedText:
+    """Parses a string of text into a compact :class:`~.ParsedText`.
+
+    This is an alternative to :func:`to_nodes` for large texts, which stores
+    offsets into the text instead of a :class:`~.Node` for every fragment.
+
+    Parameters
+    ----------
+    text: str
+        The text to parse.
+
+    Returns
+    -------
+    :class:`~.ParsedText`
+    """
+    return ParsedText(text)
+
+
+class Run(NamedTuple):
+    """Represents a measured and positioned node inside of a :class:`~.Layout`.
+
+    Attributes
+    ----------
+    type: :class:`~.NodeType`
+        The type of the node.
+    content: str
+        The contents of the node.
+    x: int
+        The horizontal offset of this run from the origin of the layout, in pixels.
+    y: int
+        The vertical offset of this run from the origin of the layout, in pixels.
+    width: int
+        The width of this run, in pixels.
+    """
+
+    type: NodeType
+    content: str
+    x: int
+    y: int
+    width: int
+
+    def __repr__(self) -> str:
+        return f'<Run type={self.type.name!r} content={self.content!r} x={self.x} y={self.y} width={self.width}>'
+
+
+class Layout(NamedTuple):
+    """Represents text which has been parsed and measured, ready to be drawn.
+
+    A layout can be measured through :attr:`size` and then be drawn with
+    :meth:`.Pilmoji.text`, without parsing or measuring the text again.
+
+    Attributes
+    ----------
+    lines: List[List[:class:`~.Run`]]
+        The runs of each line of the text.
+    font
+        The font the text was measured with.
+    width: int
+        The width of the text, in pixels.
+    height: int
+        The height of the text, in pixels.
+    spacing: int
+        The spacing between lines, in pixels.
+    node_spacing: int
+        The spacing between nodes, in pixels.
+    emoji_scale_factor: float
+        The rescaling factor for emojis.
+    merge_text: bool
+        Whether the text runs of each line were joined where possible, with emojis placed over spaces.
+    """
+
+    lines: List[List[Run]]
+    font: FontT
+    width: int
+    height: int
+    spacing: int
+    node_spacing: int
+    emoji_scale_factor: float
+    merge_text: bool = False
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Tuple[int, int]: The width and height of the text, in pixels."""
+        return self.width, self.height
+
+    def __repr__(self) -> str:
+        return f'<Layout lines={len(self.lines)} size={self.size}>'
+
+
+@lru_cache(maxsize=None)
+def _default_font() -> FontT:
+    # Pillow loads its default font from memory anew on every call, and such fonts can only be told
+    # apart by identity, so it is loaded once for its measurements to be cached
+    return ImageFont.load_default()
+
+
+def _font_key(font: FontT, /) -> Hashable:
+    if isinstance(font, ImageFont.FreeTypeFont) and isinstance(font.path, (str, bytes, os.PathLike)):
+        return font.path, font.size, font.index, font.encoding, font.layout_engine
+
+    # Fonts which were not loaded from a path can only be told apart by identity
+    return font
+
+
+def _length(font: FontT, content: str, /, cache: Optional[BaseCache] = None, fast: bool = False) -> float:
+    if cache is not None:
+        # Widths measured with an advance table may differ from exact ones, i.e. with ligatures
+        key = 'width', _font_key(font), content, fast
+
+        if (width := cache.get(key)) is not None:
+            return width
+
+        width = _length(font, content, None, fast)
+        cache.set(key, width)
+        return width
+
+    if fast and (table := advance_table(font)) is not None and (width := table.length(content)) is not None:
+        return width
+
+    if _HAS_GETLENGTH:
+        return font.getlength(content)
+
+    width, _ = font.getsize(content)
+    return width
+
+
+def _measure(font: FontT, content: str, /, cache: Optional[BaseCache] = None, fast: bool = False) -> int:
+    return int(_length(font, content, cache, fast))
+
+
+# The line boundaries of str.splitlines
+_LINE_BREAK_PATTERN: Final[re.Pattern[str]] = re.compile('\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def _iter_line_bounds(text: str, /) -> Iterator[Tuple[int, int]]:
+    # The start and end of each line, split like str.splitlines
+    start = 0
+
+    for match in _LINE_BREAK_PATTERN.finditer(text):
+        yield start, match.start()
+        start = match.end()
+
+    if start < len(text):
+        yield start, len(text)
+
+
+def _iter_lines(text: str, /) -> Iterator[str]:
+    # Like str.splitlines, but lazy
+    for start, end in _iter_line_bounds(text):
+        yield text[start:end]
+
+
+def _parse_lines(text: Union[str, Iterable[str]], /, cache: Optional[BaseCache] = None) -> Iterator[List[Node]]:
+    if isinstance(text, str):
+        lines = _iter_lines(text)
+    else:
+        lines = (line for chunk in text for line in _iter_lines(chunk))
+
+    for line in lines:
+        if cache is None:
+            yield _parse_line(line)
+            continue
+
+        key = 'nodes', line
+
+        if (nodes := cache.get(key)) is None:
+            nodes = _parse_line(line)
+            cache.set(key, nodes)
+
+        yield nodes
+
+
+def _run_type(node_type: NodeType, discord_emoji: bool, /) -> NodeType:
+    # Discord emojis which are not rendered are drawn as text, i.e. their ID, so they are laid out as such
+    if node_type is NodeType.discord_emoji and not discord_emoji:
+        return NodeType.text
+
+    return node_type
+
+
+def _layout_line(
+    line: List[Node],
+    font: FontT,
+    y: int,
+    emoji_width: int,
+    node_spacing: int,
+    cache: Optional[BaseCache],
+    fast: bool,
+    discord_emoji: bool,
+    /
+) -> Tuple[List[Run], int]:
+    runs = []
+    x = 0
+
+    for node in line:
+        node_type = _run_type(node.type, discord_emoji)
+
+        if node_type is NodeType.text:
+            width = _measure(font, node.content, cache, fast)
+        else:
+            width = emoji_width
+
+        runs.append(Run(node_type, node.content, x, y, width))
+        x += width + node_spacing
+
+    if runs:
+        x -= node_spacing
+
+    return runs, x
+
+
+# The space characters emoji slots are reserved with, besides the space itself
+_SPACE_CHARACTERS: Final[str] = ' \u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a'
+
+
+def _spaces(font: FontT, cache: Optional[BaseCache], /) -> Tuple[Tuple[str, int], ...]:
+    # The space characters the font has blank glyphs of, with whole advances
+    if cache is not None:
+        key = 'spaces', _font_key(font)
+
+        if (spaces := cache.get(key)) is None:
+            spaces = _spaces(font, None)
+            cache.set(key, spaces)
+
+        return spaces
+
+    if not _HAS_GETLENGTH:
+        width, _ = font.getsize(' ')
+        return ((' ', width),)
+
+    spaces = []
+
+    for char in _SPACE_CHARACTERS:
+        # Characters the font has no glyph of are drawn as a box
+        left, top, right, bottom = font.getbbox(char)
+        length = font.getlength(char)
+
+        if (left == right or top == bottom) and length > 0 and length == int(length):
+            spaces.append((char, int(length)))
+
+    return tuple(spaces)
+
+
+@lru_cache(maxsize=1024)
+def _compose_spacer(spaces: Tuple[Tuple[str, int], ...], width: int, /) -> Optional[str]:
+    # The fewest space characters which are exactly as wide as given, if any
+    best: List[Optional[str]] = [''] + [None] * width
+
+    for total in range(1, width + 1):
+        for char, advance in spaces:
+            if advance <= total and (rest := best[total - advance]) is not None:
+                if best[total] is None or len(rest) + 1 < len(best[total]):
+                    best[total] = rest + char
+
+    return best[width]
+
+
+def _join_runs(font: FontT, first: Run, length: float, second: Run, cache: Optional[BaseCache], /) -> Optional[Run]:
+    # Joins two text runs of a line into one, with whatever is between them reserved by spaces.
+    # The first run ends after `length`, and the text of the second one has to be drawn exactly
+    # where it would be on its own, so that this does not change the pixels
+    gap = second.x - first.x - length
+
+    if gap < 0 or gap != int(gap):
+        return None
+
+    if (spacer := _compose_spacer(_spaces(font, cache), int(gap))) is None:
+        return None
+
+    # Kerning against or between the spaces would move the text after them.
+    # Only the characters around them are measured, which keeps joining linear
+    before, after = first.content[-1:], second.content[:1]
+    if _length(font, before + spacer + after, cache) != _length(font, before, cache) + gap + _length(font, after, cache):
+        return None
+
+    return Run(NodeType.text, first.content + spacer + second.content, first.x, first.y, second.x + second.width - first.x)
+
+
+def _layout_merged_line(
+    line: List[Node],
+    font: FontT,
+    y: int,
+    emoji_width: int,
+    cache: Optional[BaseCache],
+    fast: bool,
+    discord_emoji: bool,
+    /
+) -> Tuple[List[Run], int]:
+    runs, width = _layout_line(line, font, y, emoji_width, 0, cache, fast, discord_emoji)
+    merged = []
+    index = None
+    length = 0.0
+
+    # Text runs are joined where that draws the same pixels, so the line is laid out like it is otherwise
+    for run in runs:
+        if run.type is NodeType.text:
+            if index is not None and (joined := _join_runs(font, merged[index], length, run, cache)) is not None:
+                merged[index] = joined
+                length = run.x - joined.x + _length(font, run.content, cache)
+                continue
+
+            index = len(merged)
+            length = _length(font, run.content, cache)
+
+        merged.append(run)
+
+    return merged, width
+
+
+def _layout_nodes(
+    nodes: Iterable[List[Node]],
+    font: FontT,
+    spacing: int,
+    node_spacing: int,
+    emoji_scale_factor: float,
+    cache: Optional[BaseCache],
+    merge_text: bool,
+    fast: bool,
+    discord_emoji: bool,
+    /
+) -> Layout:
+    emoji_width = int(emoji_scale_factor * font.size)
+    merge_text = merge_text and not node_spacing
+    lines = []
+    width = y = 0
+
+    for line in nodes:
+        if merge_text:
+            runs, x = _layout_merged_line(line, font, y, emoji_width, cache, fast, discord_emoji)
+        else:
+            runs, x = _layout_line(line, font, y, emoji_width, node_spacing, cache, fast, discord_emoji)
+
+        lines.append(runs)
+        y += spacing + font.size
+
+        if x > width:
+            width = x
+
+    return Layout(lines, font, width, y - spacing, spacing, node_spacing, emoji_scale_factor, merge_text)
+
+
+def layout(
+    text: Union[str, ParsedText],
+    font: FontT = None,
+    *,
+    spacing: int = 4,
+    node_spacing: int = 0,
+    emoji_scale_factor: float = 1,
+    cache: Optional[BaseCache] = None,
+    merge_text: bool = False,
+    fast_measure: bool = False,
+    render_discord_emoji: bool = True
+) -> Layout:
+    """Parses and measures the text into a :class:`~.Layout`.
+    This method supports multiline text.
+
+    Parameters
+    ----------
+    text: Union[str, :class:`~.ParsedText`]
+        The text to lay out, or text which was already parsed with :func:`to_spans`.
+    font
+        The font of the text.
+    spacing: int
+        The spacing between lines, in pixels.
+        Defaults to `4`.
+    node_spacing: int
+        The spacing between nodes, in pixels.
+        Defaults to `0`.
+    emoji_scale_factor: float
+        The rescaling factor for emojis.
+        Defaults to `1`.
+    cache: Optional[:class:`~.BaseCache`]
+        A cache to memoize parsed lines and measured text widths in,
+        i.e. an :class:`~.LRUCache` bounded by `max_entries`.
+        This speeds up laying out the same strings repeatedly.
+    merge_text: bool
+        Whether to join the text runs of each line into as few runs as possible, with the
+        space of each emoji between them reserved by space characters. This cuts the
+        draw calls of lines with many emojis. Runs are only joined where spaces fill the
+        slot exactly and the text is drawn the same, so the pixels do not change; fonts
+        with fractional advances or kerning around emojis are joined less.
+        This is ignored if `node_spacing` is given.
+        Defaults to `False`.
+    fast_measure: bool
+        Whether to measure text by summing the advances of its characters from a table
+        cached per font, see :class:`~.AdvanceTable`. This is much faster than measuring
+        with the font, and exact unless the font has ligatures of more than two characters.
+        Text shaped in context, i.e. Arabic, is still measured with the font.
+        Defaults to `False`.
+    render_discord_emoji: bool
+        Whether Discord emojis are rendered as images. Otherwise, they are laid out
+        as text runs of their ID, which is how renderers draw them then.
+        Defaults to `True`.
+
+    Returns
+    -------
+    :class:`~.Layout`
+    """
+    if font is None:
+        font = _default_font()
+
+    nodes = text if isinstance(text, ParsedText) else _parse_lines(text, cache)
+    return _layout_nodes(
+        nodes, font, spacing, node_spacing, emoji_scale_factor, cache, merge_text, fast_measure, render_discord_emoji,
+    )
+
+
+def _spans_width(
+    parsed: ParsedText,
+    index: int,
+    font: FontT,
+    emoji_width: int,
+    node_spacing: int,
+    cache: Optional[BaseCache],
+    fast: bool,
+    discord_emoji: bool,
+    /
+) -> int:
+    # Measures a line like _layout_line does, without creating nodes or runs.
+    # Merged lines are exactly as wide, see _layout_merged_line
+    text = parsed.text
+    width = -node_spacing
+
+    for node_type, start, end in parsed.spans(index):
+        if _run_type(node_type, discord_emoji) is NodeType.text:
+            width += _measure(font, _node_content(text, node_type, start, end), cache, fast) + node_spacing
+        else:
+            width += emoji_width + node_spacing
+
+    return max(width, 0)
 
 
 def getsize(
-    text: str,
+    text: Union[str, ParsedText],
     font: FontT = None,
     *,
     spacing: int = 4,
-    emoji_scale_factor: float = 1
+    node_spacing: int = 0,
+    emoji_scale_factor: float = 1,
+    cache: Optional[BaseCache] = None,
+    merge_text: bool = False,
+    fast_measure: bool = False,
+    render_discord_emoji: bool = True
 ) -> Tuple[int, int]:
     """Return the width and height of the text when rendered.
     This method supports multiline text.
 
     Parameters
     ----------
-    text: str
-        The text to use.
+    text: Union[str, :class:`~.ParsedText`]
+        The text to use, or text which was already parsed with :func:`to_spans`.
+        Parsed text is measured without creating any nodes.
     font
         The font of the text.
     spacing: int
         The spacing between lines, in pixels.
         Defaults to `4`.
+    node_spacing: int
+        The spacing between nodes, in pixels.
+        Defaults to `0`.
     emoji_scale_factor: float
         The rescaling factor for emojis.
         Defaults to `1`.
+    cache: Optional[:class:`~.BaseCache`]
+        A cache to memoize parsed lines and measured text widths in.
+        See :func:`layout`.
+    merge_text: bool
+        Whether to join the text runs of each line, which does not change the size.
+        See :func:`layout`.
+    fast_measure: bool
+        Whether to measure text with a table of character advances.
+        See :func:`layout`.
+    render_discord_emoji: bool
+        Whether Discord emojis are rendered as images, or measured as text.
+        See :func:`layout`.
     """
+    if isinstance(text, ParsedText):
+        if font is None:
+            font = _default_font()
+
+        emoji_width = int(emoji_scale_factor * font.size)
+        width = max(
+            (
+                _spans_width(text, index, font, emoji_width, node_spacing, cache, fast_measure, render_discord_emoji)
+                for index in range(len(text))
+            ),
+            default=0,
+        )
+        return width, len(text) * (font.size + spacing) - spacing
+
+    return layout(
+        text,
+        font,
+        spacing=spacing,
+        node_spacing=node_spacing,
+        emoji_scale_factor=emoji_scale_factor,
+        cache=cache,
+        merge_text=merge_text,
+        fast_measure=fast_measure,
+        render_discord_emoji=render_discord_emoji,
+    ).size
+
+
+def iter_layouts(
+    text: Union[str, ParsedText, Iterable[str]],
+    font: FontT = None,
+    *,
+    max_lines: int = 64,
+    spacing: int = 4,
+    node_spacing: int = 0,
+    emoji_scale_factor: float = 1,
+    cache: Optional[BaseCache] = None,
+    merge_text: bool = False,
+    fast_measure: bool = False,
+    render_discord_emoji: bool = True
+) -> Iterator[Layout]:
+    """Lazily lays out the text in chunks of at most `max_lines` lines each.
+
+    Only one chunk is parsed and measured at a time, so the memory this uses
+    does not grow with the length of the text. Each layout starts at a vertical
+    offset of `0`, and the next layout continues `spacing` pixels below it.
+
+    Parameters
+    ----------
+    text: Union[str, :class:`~.ParsedText`, Iterable[str]]
+        The text to lay out. This may also be an iterable of strings, i.e. a file,
+        in which case each string is split into lines and consumed as it is needed.
+    font
+        The font of the text.
+    max_lines: int
+        The maximum amount of lines of each layout. Defaults to `64`.
+    spacing: int
+        The spacing between lines, in pixels.
+        Defaults to `4`.
+    node_spacing: int
+        The spacing between nodes, in pixels.
+        Defaults to `0`.
+    emoji_scale_factor: float
+        The rescaling factor for emojis.
+        Defaults to `1`.
+    cache: Optional[:class:`~.BaseCache`]
+        A cache to memoize parsed lines and measured text widths in.
+        See :func:`layout`.
+    merge_text: bool
+        Whether to join the text runs of each line.
+        See :func:`layout`.
+    fast_measure: bool
+        Whether to measure text with a table of character advances.
+        See :func:`layout`.
+    render_discord_emoji: bool
+        Whether Discord emojis are rendered as images, or laid out as text.
+        See :func:`layout`.
+
+    Yields
+    ------
+    :class:`~.Layout`
+        The layout of each chunk of lines.
+    """
+    if max_lines < 1:
+        raise ValueError('max_lines must be at least 1.')
+
     if font is None:
-        font = ImageFont.load_default()
+        font = _default_font()
 
-    x, y = 0, 0
-    nodes = to_nodes(text)
+    nodes = iter(text) if isinstance(text, ParsedText) else _parse_lines(text, cache)
 
-    for line in nodes:
-        this_x = 0
-        for node in line:
-            content = node.content
-
-            if node.type is not NodeType.text:
-                width = int(emoji_scale_factor * font.size)
-            elif tuple(int(part) for part in PIL.__version__.split(".")) >= (9, 2, 0):
-                width = int(font.getlength(content))
+    while chunk := list(islice(nodes, max_lines)):
+        yield _layout_nodes(
+            chunk, font, spacing, node_spacing, emoji_scale_factor, cache, merge_text, fast_measure, render_discord_emoji,
+        )
+
+
+# A word of a line: the whitespace before it, and its pieces, i.e. text and the source text of emojis
+_WordT = Tuple[str, List[Tuple[NodeType, str]]]
+
+_WHITESPACE_PATTERN: Final[re.Pattern[str]] = re.compile(r'(\s+)')
+
+
+def _split_words(line: str, /) -> List[_WordT]:
+    # Words are split at whitespace only, so emojis next to text stay with it
+    words = []
+    gap = ''
+    pieces = []
+
+    for node_type, start, end in _iter_spans(line):
+        if node_type is not NodeType.text:
+            pieces.append((node_type, line[start:end]))
+            continue
+
+        for chunk in _WHITESPACE_PATTERN.split(line[start:end]):
+            if not chunk:
+                continue
+
+            if not chunk.isspace():
+                pieces.append((NodeType.text, chunk))
+            elif pieces:
+                words.append((gap, pieces))
+                gap, pieces = chunk, []
             else:
-                width, _ = font.getsize(content)
+                gap += chunk
 
-            this_x += width
+    if pieces:
+        words.append((gap, pieces))
 
-        y += spacing + font.size
+    return words
+
+
+def _wrap_words(
+    words: List[_WordT],
+    font: FontT,
+    max_width: Optional[float],
+    emoji_width: int,
+    cache: Optional[BaseCache],
+    fast: bool,
+    break_long_words: bool,
+    discord_emoji: bool,
+    /
+) -> List[Tuple[str, float]]:
+    # Greedily breaks the words into lines no wider than max_width, measuring each piece once
+    lines = []
+    current = []
+    x = 0.0
+
+    for index, (gap, pieces) in enumerate(words):
+        widths = [
+            _length(font, _node_content(content, node_type, 0, len(content)), cache, fast)
+            if _run_type(node_type, discord_emoji) is NodeType.text else emoji_width
+            for node_type, content in pieces
+        ]
+        word_width = sum(widths)
+
+        # Whitespace at the start of a line is only kept as the indentation of the first line
+        if current or index == 0:
+            gap_width = _length(font, gap, cache, fast) if gap else 0.0
+        else:
+            gap, gap_width = '', 0.0
+
+        if max_width is not None and current and x + gap_width + word_width > max_width:
+            lines.append((''.join(current), x))
+            current, x = [], 0.0
+            gap, gap_width = '', 0.0
+
+        if gap:
+            current.append(gap)
+            x += gap_width
+
+        if max_width is None or not break_long_words or x + word_width <= max_width:
+            current.extend(content for _, content in pieces)
+            x += word_width
+            continue
+
+        # The word is wider than a whole line, so break it between characters
+        for (node_type, content), width in zip(pieces, widths):
+            if node_type is NodeType.text:
+                chars = [(char, _length(font, char, cache, fast)) for char in content]
+            else:
+                chars = [(content, width)]
+
+            for char, char_width in chars:
+                if current and x + char_width > max_width:
+                    lines.append((''.join(current), x))
+                    current, x = [], 0.0
+
+                current.append(char)
+                x += char_width
+
+    lines.append((''.join(current), x))
+    return lines
+
+
+def wrap(
+    text: str,
+    font: FontT,
+    *,
+    width: float,
+    emoji_scale_factor: float = 1,
+    cache: Optional[BaseCache] = None,
+    fast_measure: bool = False,
+    break_long_words: bool = True,
+    render_discord_emoji: bool = True
+) -> str:
+    """Wraps the text so that no line is wider than the given width, breaking lines at whitespace.
+    Emojis, including Discord emojis, are never split and count as wide as they are rendered.
+
+    Each word is measured once, rather than the text being measured again for each
+    candidate break point, so this takes linear time in the length of the text.
+    Existing line breaks are kept.
+
+    Parameters
+    ----------
+    text: str
+        The text to wrap.
+    font
+        The font of the text. If ``None``, the default font is used.
+    width: float
+        The maximum width of a line, in pixels.
+    emoji_scale_factor: float
+        The rescaling factor for emojis.
+        Defaults to `1`.
+    cache: Optional[:class:`~.BaseCache`]
+        A cache to memoize measured text widths in.
+        See :func:`layout`.
+    fast_measure: bool
+        Whether to measure text with a table of character advances.
+        See :func:`layout`.
+    break_long_words: bool
+        Whether to break words which are wider than a whole line between characters.
+        Otherwise, such words are put on their own line and overflow it.
+        Defaults to `True`.
+    render_discord_emoji: bool
+        Whether Discord emojis are rendered as images, or measured as text.
+        See :func:`layout`.
+
+    Returns
+    -------
+    str
+        The wrapped text, with lines separated by ``'\\n'``.
+    """
+    if font is None:
+        font = _default_font()
+
+    emoji_width = int(emoji_scale_factor * font.size)
+    lines = []
+
+    for line in text.splitlines():
+        wrapped = _wrap_words(
+            _split_words(line), font, width, emoji_width, cache, fast_measure, break_long_words, render_discord_emoji,
+        )
+        lines.extend(content for content, _ in wrapped)
+
+    return '\n'.join(lines)
+
+
+def fit(
+    text: str,
+    font: FontT,
+    *,
+    size: Tuple[int, int],
+    min_font_size: int = 1,
+    wrap: bool = True,
+    spacing: int = 4,
+    emoji_scale_factor: float = 1,
+    cache: Optional[BaseCache] = None,
+    merge_text: bool = False,
+    fast_measure: bool = False,
+    break_long_words: bool = True,
+    render_discord_emoji: bool = True
+) -> Layout:
+    """Lays out the text at the largest font size at which it fits into the given box,
+    wrapping it to the width of the box.
+
+    The font size is binary searched between `min_font_size` and the size of the given font.
+    The text is parsed once, and at each size tried every word is measured once.
+
+    Parameters
+    ----------
+    text: str
+        The text to fit.
+    font: :class:`PIL.ImageFont.FreeTypeFont`
+        The font of the text, at the largest size to try. If ``None``, the default font is used.
+    size: Tuple[int, int]
+        The width and height of the box, in pixels.
+    min_font_size: int
+        The smallest font size to try. If the text does not fit at this size,
+        it is laid out at this size anyways. Defaults to `1`.
+    wrap: bool
+        Whether to wrap the text to the width of the box.
+        Otherwise, only existing line breaks are kept. Defaults to `True`.
+    spacing: int
+        The spacing between lines, in pixels.
+        Defaults to `4`.
+    emoji_scale_factor: float
+        The rescaling factor for emojis.
+        Defaults to `1`.
+    cache: Optional[:class:`~.BaseCache`]
+        A cache to memoize parsed lines and measured text widths in.
+        See :func:`layout`. If not given, widths are only memoized during this call.
+    merge_text: bool
+        Whether to join the text runs of each line.
+        See :func:`layout`.
+    fast_measure: bool
+        Whether to measure text with a table of character advances.
+        See :func:`layout`.
+    break_long_words: bool
+        Whether to break words which are wider than a whole line between characters.
+        See :func:`wrap`.
+    render_discord_emoji: bool
+        Whether Discord emojis are rendered as images, or laid out as text.
+        See :func:`layout`.
+
+    Returns
+    -------
+    :class:`~.Layout`
+        The layout of the wrapped text at the chosen font size, which can be drawn with :meth:`.Pilmoji.text`.
+
+    Raises
+    ------
+    TypeError
+        The font is not a TrueType or OpenType font, so it cannot be resized.
+    """
+    if font is None:
+        font = _default_font()
+
+    if not isinstance(font, ImageFont.FreeTypeFont):
+        raise TypeError(f'Only TrueType or OpenType fonts can be resized to fit, got {type(font).__name__}.')
+
+    if cache is None:
+        cache = LRUCache(max_entries=4096)
+
+    box_width, box_height = size
+    paragraphs = [_split_words(line) for line in text.splitlines()]
+
+    def attempt(font_size: int) -> Tuple[ImageFont.FreeTypeFont, List[Tuple[str, float]]]:
+        variant = font.font_variant(size=font_size)
+        emoji_width = int(emoji_scale_factor * font_size)
+        lines = []
+
+        for words in paragraphs:
+            lines += _wrap_words(
+                words,
+                variant,
+                box_width if wrap else None,
+                emoji_width,
+                cache,
+                fast_measure,
+                break_long_words,
+                render_discord_emoji,
+            )
+
+        return variant, lines
+
+    low, high = min(min_font_size, int(font.size)), int(font.size)
+    best = None
+
+    while low <= high:
+        middle = (low + high) // 2
+        variant, lines = attempt(middle)
+        height = len(lines) * (middle + spacing) - spacing
+
+        if height <= box_height and all(width <= box_width for _, width in lines):
+            best = variant, lines
+            low = middle + 1
+        else:
+            high = middle - 1
 
-        if this_x > x:
-            x = this_x
+    variant, lines = best or attempt(min_font_size)
 
-    return x, y - spacing
+    return layout(
+        '\n'.join(content for content, _ in lines),
+        variant,
+        spacing=spacing,
+        emoji_scale_factor=emoji_scale_factor,
+        cache=cache,
+        merge_text=merge_text,
+        fast_measure=fast_measure,
+        render_discord_emoji=render_discord_emoji,
+    )
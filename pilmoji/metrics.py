@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import importlib.util
+import math
+
+from PIL import ImageFont
+
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from .cache import LRUCache
+
+# NumPy is slow to import, so it is only imported once a table is created
+_has_numpy = importlib.util.find_spec('numpy') is not None
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from .core import FontT
+
+__all__ = (
+    'AdvanceTable',
+    'advance_table',
+)
+
+# Characters from here on (Hebrew, Arabic, Indic scripts and so on) are shaped in context,
+# so their widths are not the sum of their advances
+_SIMPLE_LIMIT: int = 0x0590
+
+# Combining diacritical marks attach to the previous character
+_COMBINING_START: int = 0x0300
+_COMBINING_END: int = 0x0370
+
+# Strings at least this long are summed with NumPy, if it is installed
+_VECTORIZE_MIN_LENGTH: int = 64
+
+# Tables are cached per font, i.e. per size tried while fitting text
+_tables: LRUCache = LRUCache(max_entries=64)
+
+
+class AdvanceTable:
+    """A table of the advance of each character of a font, and the kerning of each pair of characters,
+    for measuring text much faster than :meth:`PIL.ImageFont.FreeTypeFont.getlength`.
+
+    Advances are computed for the first 256 codepoints up front, and for other characters
+    and pairs the first time they are measured. Text which is shaped in context, i.e. Arabic
+    or text with combining marks, is not supported and must be measured exactly.
+
+    Since the table only stores widths the font reports, the total width of supported text
+    equals the width :meth:`~PIL.ImageFont.FreeTypeFont.getlength` reports, except for ligatures
+    of more than two characters. This is safe to use from multiple threads.
+
+    Parameters
+    ----------
+    font: :class:`PIL.ImageFont.FreeTypeFont`
+        The font to measure text of.
+    """
+
+    __slots__ = ('font', '_advances', '_kerning', '_array')
+
+    def __init__(self, font: ImageFont.FreeTypeFont) -> None:
+        self.font: ImageFont.FreeTypeFont = font
+
+        self._advances: List[float] = [math.nan] * _SIMPLE_LIMIT
+        self._kerning: Dict[int, float] = {}
+
+        for code in range(256):
+            self._advances[code] = font.getlength(chr(code))
+
+        self._array: Optional[np.ndarray] = None
+
+        if _has_numpy:
+            import numpy as np
+
+            self._array = np.array(self._advances)
+
+    def _advance(self, code: int, /) -> float:
+        advance = self._advances[code] = self.font.getlength(chr(code))
+
+        if self._array is not None:
+            self._array[code] = advance
+
+        return advance
+
+    def _kern(self, first: int, second: int, /) -> float:
+        # The difference the pair makes to the sum of its advances, i.e. kerning or a ligature
+        pair = chr(first) + chr(second)
+        kerning = self._kerning[first * _SIMPLE_LIMIT + second] = (
+            self.font.getlength(pair) - self._advances[first] - self._advances[second]
+        )
+        return kerning
+
+    def _length_vectorized(self, text: str, /) -> Optional[float]:
+        import numpy as np
+
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+        if codes.max() >= _SIMPLE_LIMIT or ((codes >= _COMBINING_START) & (codes < _COMBINING_END)).any():
+            return None
+
+        advances = self._array[codes]
+
+        if (unknown := np.isnan(advances)).any():
+            for code in np.unique(codes[unknown]).tolist():
+                self._advance(code)
+
+            advances = self._array[codes]
+
+        pairs, counts = np.unique(codes[:-1].astype(np.int64) * _SIMPLE_LIMIT + codes[1:], return_counts=True)
+        kerning = self._kerning
+        total = float(advances.sum())
+
+        for pair, count in zip(pairs.tolist(), counts.tolist()):
+            if (value := kerning.get(pair)) is None:
+                value = self._kern(*divmod(pair, _SIMPLE_LIMIT))
+
+            total += value * count
+
+        return total
+
+    def length(self, text: str, /) -> Optional[float]:
+        """Measures the width of the given text, in pixels.
+
+        Parameters
+        ----------
+        text: str
+            The text to measure.
+
+        Returns
+        -------
+        Optional[float]
+            The width of the text, or ``None`` if the text must be measured exactly instead.
+        """
+        if self._array is not None and len(text) >= _VECTORIZE_MIN_LENGTH:
+            return self._length_vectorized(text)
+
+        advances = self._advances
+        kerning = self._kerning
+        total = 0.0
+        previous = -1
+
+        for char in text:
+            code = ord(char)
+
+            if code >= _SIMPLE_LIMIT or _COMBINING_START <= code < _COMBINING_END:
+                return None
+
+            if (advance := advances[code]) != advance:
+                # NaN marks an advance which has not been computed yet
+                advance = self._advance(code)
+
+            total += advance
+
+            if previous >= 0:
+                if (value := kerning.get(previous * _SIMPLE_LIMIT + code)) is None:
+                    value = self._kern(previous, code)
+
+                total += value
+
+            previous = code
+
+        return total
+
+    def __repr__(self) -> str:
+        return f'<AdvanceTable font={self.font!r} pairs={len(self._kerning)}>'
+
+
+def advance_table(font: FontT, /) -> Optional[AdvanceTable]:
+    """Returns the :class:`~.AdvanceTable` of the given font, creating it if needed.
+
+    Tables of the most recently used fonts are kept, fonts loaded from the
+    same path at the same size share a table.
+
+    Parameters
+    ----------
+    font
+        The font to return the table of.
+
+    Returns
+    -------
+    Optional[:class:`~.AdvanceTable`]
+        The table, or ``None`` if the font is not a TrueType or OpenType font.
+    """
+    if type(font) is not ImageFont.FreeTypeFont:
+        return None
+
+    from .helpers import _font_key
+
+    key = _font_key(font)
+
+    if (table := _tables.get(key)) is None:
+        table = AdvanceTable(font)
+        _tables.set(key, table)
+
+    return table
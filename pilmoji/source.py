@@ -1,23 +1,44 @@
+import asyncio
+import contextlib
+import hashlib
+import importlib.util
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+import time
+import warnings
+import zipfile
+
 from abc import ABC, abstractmethod
+from collections import Counter
 from io import BytesIO
+from threading import Lock
+
+from urllib.parse import quote_plus, urlsplit
+
+from typing import Any, Callable, ClassVar, Dict, Hashable, Iterator, List, NamedTuple, Optional, TYPE_CHECKING, Tuple, Type, Union
 
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
-from urllib.parse import quote_plus
+from .transport import BaseTransport, default_transport
 
-from typing import Any, ClassVar, Dict, Optional
+# aiohttp is slow to import, so it is only imported once it is used
+_has_aiohttp = importlib.util.find_spec('aiohttp') is not None
 
-try:
-    import requests
-    _has_requests = True
-except ImportError:
-    requests = None
-    _has_requests = False
+if TYPE_CHECKING:
+    import aiohttp
 
 __all__ = (
+    'SourceUnavailable',
+    'CircuitBreakerStats',
+    'CircuitBreaker',
     'BaseSource',
     'HTTPBasedSource',
     'DiscordEmojiSourceMixin',
+    'AsyncBaseSource',
+    'AsyncHTTPSource',
     'EmojiCDNSource',
     'TwitterEmojiSource',
     'AppleEmojiSource',
@@ -33,10 +54,172 @@ __all__ = (
     'OpenmojiEmojiSource',
     'TwemojiEmojiSource',
     'FacebookMessengerEmojiSource',
+    'DiskCachedSource',
+    'ArchiveSource',
     'Twemoji',
     'Openmoji',
+    'discord_emoji_size',
 )
 
+# The size variants Discord's CDN serves, as powers of two
+DISCORD_EMOJI_MIN_SIZE: int = 16
+DISCORD_EMOJI_MAX_SIZE: int = 4096
+
+
+def discord_emoji_size(size: int, /) -> int:
+    """Returns the smallest size variant of Discord's CDN which is at least as large as the given size.
+
+    Parameters
+    ----------
+    size: int
+        The size an emoji is rendered at, in pixels.
+
+    Returns
+    -------
+    int
+    """
+    size = max(size, DISCORD_EMOJI_MIN_SIZE)
+    return min(1 << (size - 1).bit_length(), DISCORD_EMOJI_MAX_SIZE)
+
+
+class SourceUnavailable(Exception):
+    """Raised when a source cannot be reached, as opposed to an emoji not being found.
+
+    Renderers draw the emoji as text, like a missing emoji,
+    but do not remember the emoji as missing.
+    """
+
+
+class CircuitBreakerStats(NamedTuple):
+    """Represents a snapshot of the statistics of a :class:`~.CircuitBreaker`.
+
+    Attributes
+    ----------
+    successes: int
+        The amount of requests which reached their host.
+    failures: int
+        The amount of requests which failed because their host could not be reached or errored.
+    rejections: int
+        The amount of requests which were not made because the circuit of their host was open.
+    trips: int
+        The amount of times a circuit was opened.
+    open_hosts: int
+        The amount of hosts whose circuits are currently open.
+    """
+
+    successes: int
+    failures: int
+    rejections: int
+    trips: int
+    open_hosts: int
+
+
+class CircuitBreaker:
+    """Stops requests to a host for a while after it failed repeatedly.
+
+    After `threshold` consecutive failures, the circuit of a host opens and requests
+    to it fail immediately with :class:`~.SourceUnavailable` for `backoff` seconds.
+    Once that has passed, one request is let through as a probe while the others keep failing.
+    If the probe fails too, the backoff is doubled, up to `max_backoff`. If it succeeds, the circuit
+    closes again. A probe which never reports back is replaced by another one after the backoff.
+
+    This is thread-safe and may be shared between sources.
+
+    Parameters
+    ----------
+    threshold: int
+        The amount of consecutive failures after which a circuit opens. Defaults to `5`.
+    backoff: float
+        The amount of seconds a circuit stays open after opening. Defaults to `1.0`.
+    max_backoff: float
+        The maximum amount of seconds a circuit stays open. Defaults to `300.0`.
+    """
+
+    def __init__(self, threshold: int = 5, backoff: float = 1.0, max_backoff: float = 300.0) -> None:
+        self.threshold: int = threshold
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+
+        self._lock: Lock = Lock()
+        # host -> (consecutive failures, monotonic time the circuit is open until, whether a probe is in flight)
+        self._hosts: Dict[str, Tuple[int, float, bool]] = {}
+
+        self._successes: int = 0
+        self._failures: int = 0
+        self._rejections: int = 0
+        self._trips: int = 0
+
+    def check(self, host: str, /) -> None:
+        """Ensures that a request to the given host may be made.
+
+        Raises
+        ------
+        SourceUnavailable
+            The circuit of the host is open.
+        """
+        with self._lock:
+            failures, until, probing = self._hosts.get(host, (0, 0.0, False))
+
+            if failures < self.threshold:
+                return
+
+            now = time.monotonic()
+
+            if until > now:
+                self._rejections += 1
+
+                if probing:
+                    raise SourceUnavailable(f'{host} is unavailable, a request is checking whether it recovered.')
+
+                raise SourceUnavailable(f'{host} is unavailable, retrying in {until - now:.1f}s.')
+
+            # The caller is the probe. The circuit stays open for the others until it reports back
+            self._hosts[host] = failures, now + self._backoff(failures), True
+
+    def _backoff(self, failures: int, /) -> float:
+        return min(self.backoff * 2 ** (failures - self.threshold), self.max_backoff)
+
+    def record_success(self, host: str, /) -> None:
+        """Records that a request to the given host reached it, closing its circuit."""
+        with self._lock:
+            self._successes += 1
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host: str, /) -> None:
+        """Records that a request to the given host failed, possibly opening its circuit."""
+        with self._lock:
+            self._failures += 1
+            failures, until, _ = self._hosts.get(host, (0, 0.0, False))
+            failures += 1
+
+            if failures >= self.threshold:
+                until = time.monotonic() + self._backoff(failures)
+                self._trips += 1
+
+            self._hosts[host] = failures, until, False
+
+    def reset(self) -> None:
+        """Closes the circuits of all hosts."""
+        with self._lock:
+            self._hosts.clear()
+
+    @property
+    def stats(self) -> CircuitBreakerStats:
+        """:class:`~.CircuitBreakerStats`: The current statistics of this circuit breaker."""
+        with self._lock:
+            now = time.monotonic()
+
+            return CircuitBreakerStats(
+                successes=self._successes,
+                failures=self._failures,
+                rejections=self._rejections,
+                trips=self._trips,
+                open_hosts=sum(until > now for _, until, _ in self._hosts.values()),
+            )
+
+    def __repr__(self) -> str:
+        return f'<CircuitBreaker stats={self.stats}>'
+
 
 class BaseSource(ABC):
     """The base class for an emoji image source."""
@@ -77,26 +260,106 @@ class BaseSource(ABC):
         """
         raise NotImplementedError
 
+    def get_discord_emoji_variant(
+        self,
+        id: int,
+        /,
+        *,
+        size: Optional[int] = None,
+        format: Optional[str] = None
+    ) -> Optional[BytesIO]:
+        """Retrieves a :class:`io.BytesIO` stream for the image of the given Discord emoji,
+        preferably at the given size and in the given format.
+
+        Sources which can only provide one variant of each Discord emoji
+        ignore the preferences. By default, this calls :meth:`get_discord_emoji`.
+
+        Parameters
+        ----------
+        id: int
+            The snowflake ID of the Discord emoji.
+        size: Optional[int]
+            The size variant to retrieve, in pixels. See :func:`~.discord_emoji_size`.
+        format: Optional[str]
+            The image format to retrieve, i.e. ``'webp'``.
+
+        Returns
+        -------
+        :class:`io.BytesIO`
+            A bytes stream of the emoji.
+        None
+            An image for the emoji could not be found.
+        """
+        return self.get_discord_emoji(id)
+
+    def iter_emojis(self) -> Iterator[str]:
+        """Iterates over every emoji this source can provide an image for.
+
+        This is used to build an :class:`~.EmojiAtlas` of a source.
+
+        Raises
+        ------
+        NotImplementedError
+            This source cannot enumerate its emojis.
+        """
+        raise NotImplementedError(f'{self.__class__.__name__} cannot enumerate its emojis.')
+
+    @property
+    def cache_key(self) -> Hashable:
+        """Hashable: A key which identifies the emoji images this source provides.
+
+        Renderers sharing a :class:`~.BaseCache` use this to keep
+        emojis from different sources apart. This defaults to the class of this source.
+        """
+        return self.__class__
+
     def __repr__(self) -> str:
         return f'<{self.__class__.__name__}>'
 
 
 class HTTPBasedSource(BaseSource):
-    """Represents an HTTP-based source."""
+    """Represents an HTTP-based source.
 
+    Parameters
+    ----------
+    breaker: Optional[:class:`~.CircuitBreaker`]
+        The circuit breaker which stops requests to hosts that are failing.
+        If left unfilled, a new circuit breaker with the default settings is used.
+    transport: Optional[:class:`~.BaseTransport`]
+        The transport to make requests with, which may be shared between sources.
+        If left unfilled, a new transport is created, see :func:`~.default_transport`.
+    """
+
+    # Only the headers are sent. Timeouts, retries and such are configured on the transport instead
     REQUEST_KWARGS: ClassVar[Dict[str, Any]] = {
         'headers': {'User-Agent': 'Mozilla/5.0'}
     }
 
-    def __init__(self) -> None:
-        if _has_requests:
-            self._requests_session = requests.Session()
+    def __init__(
+        self,
+        *,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[BaseTransport] = None
+    ) -> None:
+        self.breaker: CircuitBreaker = breaker or CircuitBreaker()
+        self.transport: BaseTransport = transport or default_transport()
 
-    def request(self, url: str) -> bytes:
-        """Makes a GET request to the given URL.
+        if unsupported := sorted(set(self.REQUEST_KWARGS) - {'headers'}):
+            warnings.warn(
+                f'{self.__class__.__name__}.REQUEST_KWARGS only supports headers, ignoring {", ".join(unsupported)}. '
+                'Configure the transport of the source instead.',
+                stacklevel=2,
+            )
 
-        If the `requests` library is installed, it will be used.
-        If it is not installed, :meth:`urllib.request.urlopen` will be used instead.
+    def close(self) -> None:
+        """Closes the idle connections of this source's transport.
+
+        This source can still be used afterwards, new connections are made as needed.
+        """
+        self.transport.close()
+
+    def request(self, url: str) -> Optional[bytes]:
+        """Makes a GET request to the given URL through this source's transport.
 
         Parameters
         ----------
@@ -105,21 +368,77 @@ class HTTPBasedSource(BaseSource):
 
         Returns
         -------
-        bytes
+        Optional[bytes]
+            The response body, or ``None`` if the response was a client error, i.e. a 404.
 
         Raises
         ------
-        Union[:class:`requests.HTTPError`, :class:`urllib.error.HTTPError`]
-            There was an error requesting from the URL.
-        """
-        if _has_requests:
-            with self._requests_session.get(url, **self.REQUEST_KWARGS) as response:
-                if response.ok:
-                    return response.content
-        else:
-            req = Request(url, **self.REQUEST_KWARGS)
-            with urlopen(req) as response:
-                return response.read()
+        SourceUnavailable
+            The host could not be reached, responded with a server error,
+            or is being backed off from. See :class:`~.CircuitBreaker`.
+        """
+        host = urlsplit(url).netloc
+        self.breaker.check(host)
+
+        try:
+            status, data = self.transport.request(url, headers=self.REQUEST_KWARGS.get('headers'))
+        except OSError as exc:
+            self.breaker.record_failure(host)
+            raise SourceUnavailable(f'{host} could not be reached: {exc}') from exc
+
+        if status >= 500 or status == 429:
+            self.breaker.record_failure(host)
+            raise SourceUnavailable(f'{host} responded with status {status}.')
+
+        self.breaker.record_success(host)
+
+        if status < 400:
+            return data
+
+    def get_emoji_url(self, emoji: str, /) -> Optional[str]:
+        """Returns the URL of the image of the given emoji.
+
+        This is used by :class:`~.AsyncHTTPSource` to request emojis asynchronously.
+        Sources which cannot build a URL without making a request should return ``None``.
+
+        Parameters
+        ----------
+        emoji: str
+            The emoji to build the URL of.
+
+        Returns
+        -------
+        Optional[str]
+        """
+        return None
+
+    def get_discord_emoji_url(
+        self,
+        id: int,
+        /,
+        *,
+        size: Optional[int] = None,
+        format: Optional[str] = None
+    ) -> Optional[str]:
+        """Returns the URL of the image of the given Discord emoji.
+
+        This is used by :class:`~.AsyncHTTPSource` to request emojis asynchronously.
+        Sources which cannot build a URL without making a request should return ``None``.
+
+        Parameters
+        ----------
+        id: int
+            The snowflake ID of the Discord emoji.
+        size: Optional[int]
+            The size variant to build the URL of, in pixels, if the source supports it.
+        format: Optional[str]
+            The image format to build the URL of, if the source supports it.
+
+        Returns
+        -------
+        Optional[str]
+        """
+        return None
 
     @abstractmethod
     def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
@@ -139,14 +458,39 @@ class DiscordEmojiSourceMixin(HTTPBasedSource):
     def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
         raise NotImplementedError
 
+    def get_discord_emoji_url(
+        self,
+        id: int,
+        /,
+        *,
+        size: Optional[int] = None,
+        format: Optional[str] = None
+    ) -> Optional[str]:
+        url = f'{self.BASE_DISCORD_EMOJI_URL}{id}.{format or "png"}'
+        params = []
+
+        if size is not None:
+            params.append(f'size={discord_emoji_size(size)}')
+
+        if format == 'webp':
+            # WebP variants are lossy unless requested otherwise
+            params.append('quality=lossless')
+
+        return url + '?' + '&'.join(params) if params else url
+
     def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
-        url = self.BASE_DISCORD_EMOJI_URL + str(id) + '.png'
-        _to_catch = HTTPError if not _has_requests else requests.HTTPError
+        return self.get_discord_emoji_variant(id)
 
-        try:
-            return BytesIO(self.request(url))
-        except _to_catch:
-            pass
+    def get_discord_emoji_variant(
+        self,
+        id: int,
+        /,
+        *,
+        size: Optional[int] = None,
+        format: Optional[str] = None
+    ) -> Optional[BytesIO]:
+        if data := self.request(self.get_discord_emoji_url(id, size=size, format=format)):
+            return BytesIO(data)
 
 
 class EmojiCDNSource(DiscordEmojiSourceMixin):
@@ -155,17 +499,22 @@ class EmojiCDNSource(DiscordEmojiSourceMixin):
     BASE_EMOJI_CDN_URL: ClassVar[str] = 'https://emojicdn.elk.sh/'
     STYLE: ClassVar[str] = None
 
-    def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+    def get_emoji_url(self, emoji: str, /) -> Optional[str]:
         if self.STYLE is None:
             raise TypeError('STYLE class variable unfilled.')
 
-        url = self.BASE_EMOJI_CDN_URL + quote_plus(emoji) + '?style=' + quote_plus(self.STYLE)
-        _to_catch = HTTPError if not _has_requests else requests.HTTPError
+        return self.BASE_EMOJI_CDN_URL + quote_plus(emoji) + '?style=' + quote_plus(self.STYLE)
 
-        try:
-            return BytesIO(self.request(url))
-        except _to_catch:
-            pass
+    def iter_emojis(self) -> Iterator[str]:
+        # The CDN provides every emoji known to the emoji library
+        from .helpers import _emoji_tables
+
+        language_pack, *_ = _emoji_tables()
+        return iter(dict.fromkeys(language_pack.values()))
+
+    def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+        if data := self.request(self.get_emoji_url(emoji)):
+            return BytesIO(data)
 
 
 class TwitterEmojiSource(EmojiCDNSource):
@@ -228,6 +577,585 @@ class MozillaEmojiSource(EmojiCDNSource):
     STYLE = 'mozilla'
 
 
+class AsyncBaseSource(ABC):
+    """The base class for an asynchronous emoji image source.
+
+    These can only be used with :meth:`.Pilmoji.text_async`.
+    """
+
+    @abstractmethod
+    async def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+        """|coro|
+
+        Retrieves a :class:`io.BytesIO` stream for the image of the given emoji.
+
+        Parameters
+        ----------
+        emoji: str
+            The emoji to retrieve.
+
+        Returns
+        -------
+        :class:`io.BytesIO`
+            A bytes stream of the emoji.
+        None
+            An image for the emoji could not be found.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
+        """|coro|
+
+        Retrieves a :class:`io.BytesIO` stream for the image of the given Discord emoji.
+
+        Parameters
+        ----------
+        id: int
+            The snowflake ID of the Discord emoji.
+
+        Returns
+        -------
+        :class:`io.BytesIO`
+            A bytes stream of the emoji.
+        None
+            An image for the emoji could not be found.
+        """
+        raise NotImplementedError
+
+    async def get_discord_emoji_variant(
+        self,
+        id: int,
+        /,
+        *,
+        size: Optional[int] = None,
+        format: Optional[str] = None
+    ) -> Optional[BytesIO]:
+        """|coro|
+
+        Retrieves the image of the given Discord emoji, preferably at the given size and in the given format.
+
+        See :meth:`.BaseSource.get_discord_emoji_variant`.
+        By default, this calls :meth:`get_discord_emoji`.
+        """
+        return await self.get_discord_emoji(id)
+
+    async def close(self) -> None:
+        """|coro|
+
+        Releases any resources held by this source.
+        """
+
+    @property
+    def cache_key(self) -> Hashable:
+        """Hashable: A key which identifies the emoji images this source provides.
+
+        See :attr:`.BaseSource.cache_key`.
+        """
+        return self.__class__
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__}>'
+
+
+class AsyncHTTPSource(AsyncBaseSource):
+    """An asynchronous source which fetches the emojis of an HTTP-based source.
+
+    If `aiohttp` is installed, it will be used to make requests.
+    If it is not installed, the requests of the given source are run in an executor instead.
+
+    Parameters
+    ----------
+    source: Union[:class:`~.HTTPBasedSource`, Type[:class:`~.HTTPBasedSource`]]
+        The source to fetch the emojis of.
+        This defaults to :class:`~.TwitterEmojiSource`.
+    session: Optional[:class:`aiohttp.ClientSession`]
+        The session to make requests with. If left unfilled, a new session
+        is created when it is first needed and closed along with this source.
+    """
+
+    def __init__(
+        self,
+        source: Union[HTTPBasedSource, Type[HTTPBasedSource], None] = None,
+        *,
+        session: Optional['aiohttp.ClientSession'] = None
+    ) -> None:
+        if source is None:
+            source = TwitterEmojiSource
+
+        if isinstance(source, type):
+            source = source()
+
+        self.source: HTTPBasedSource = source
+        self.session: Optional['aiohttp.ClientSession'] = session
+        self._owns_session: bool = session is None
+
+    @property
+    def cache_key(self) -> Hashable:
+        # The same images are provided, so caches can be shared with the synchronous source
+        return self.source.cache_key
+
+    async def request(self, url: str) -> Optional[bytes]:
+        """|coro|
+
+        Makes a GET request to the given URL using `aiohttp`.
+
+        Parameters
+        ----------
+        url: str
+            The URL to request from.
+
+        Requests share the :class:`~.CircuitBreaker` of the synchronous source.
+
+        Returns
+        -------
+        Optional[bytes]
+            The response body, or ``None`` if the response was a client error, i.e. a 404.
+
+        Raises
+        ------
+        SourceUnavailable
+            The host could not be reached, responded with a server error,
+            or is being backed off from.
+        """
+        import aiohttp
+
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+
+        breaker = self.source.breaker
+        host = urlsplit(url).netloc
+        breaker.check(host)
+
+        try:
+            async with self.session.get(url, headers=self.source.REQUEST_KWARGS.get('headers')) as response:
+                status, data = response.status, await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            breaker.record_failure(host)
+            raise SourceUnavailable(f'{host} could not be reached: {exc!r}') from exc
+
+        if status >= 500 or status == 429:
+            breaker.record_failure(host)
+            raise SourceUnavailable(f'{host} responded with status {status}.')
+
+        breaker.record_success(host)
+
+        if status < 400:
+            return data
+
+    async def _get(self, url: Optional[str], fallback: Callable[[], Optional[BytesIO]], /) -> Optional[BytesIO]:
+        if url is None or not _has_aiohttp:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, fallback)
+
+        if data := await self.request(url):
+            return BytesIO(data)
+
+    async def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+        return await self._get(self.source.get_emoji_url(emoji), lambda: self.source.get_emoji(emoji))
+
+    async def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
+        return await self._get(self.source.get_discord_emoji_url(id), lambda: self.source.get_discord_emoji(id))
+
+    async def get_discord_emoji_variant(
+        self,
+        id: int,
+        /,
+        *,
+        size: Optional[int] = None,
+        format: Optional[str] = None
+    ) -> Optional[BytesIO]:
+        return await self._get(
+            self.source.get_discord_emoji_url(id, size=size, format=format),
+            lambda: self.source.get_discord_emoji_variant(id, size=size, format=format),
+        )
+
+    async def close(self) -> None:
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} source={self.source!r}>'
+
+
+def _listdir(path: str, /) -> List[str]:
+    # The files of a directory of a DiskCachedSource, without files which are still being written.
+    # Other processes may remove the directory at any time, i.e. while clearing the cache
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return []
+
+    return [name for name in names if not name.startswith('.tmp-')]
+
+
+class DiskCachedSource(BaseSource):
+    """A source which persistently caches the emojis of another source on disk.
+
+    Emoji images are stored in a content-addressed directory, alongside
+    an index which maps emojis to their images. Writes are atomic, so
+    multiple processes may safely share the same directory.
+
+    Parameters
+    ----------
+    source: :class:`~.BaseSource`
+        The source to fetch emojis from when they are not cached.
+    path: Union[str, :class:`os.PathLike`]
+        The directory to store the cache in. It is created if it does not exist.
+    max_size: Optional[int]
+        The maximum amount of bytes of emoji images to store.
+        The least recently used emojis are evicted first.
+        Defaults to ``None``, which means unbounded.
+    discord_emoji_ttl: Optional[float]
+        How many seconds a Discord emoji is cached for before it is fetched again,
+        since custom emojis can be edited or deleted.
+        Defaults to ``None``, which means forever.
+    trim_interval: float
+        The minimum amount of seconds between two trims of the cache down to `max_size`.
+        Each trim scans the whole directory, since other processes may write to it as well,
+        so the cache may exceed `max_size` for up to this long. Defaults to `10`.
+    """
+
+    def __init__(
+        self,
+        source: BaseSource,
+        path: Union[str, os.PathLike],
+        *,
+        max_size: Optional[int] = None,
+        discord_emoji_ttl: Optional[float] = None,
+        trim_interval: float = 10.0
+    ) -> None:
+        self.source: BaseSource = source
+        self.path: str = os.fspath(path)
+        self.max_size: Optional[int] = max_size
+        self.discord_emoji_ttl: Optional[float] = discord_emoji_ttl
+        self.trim_interval: float = trim_interval
+
+        self._objects_path: str = os.path.join(self.path, 'objects')
+        self._index_path: str = os.path.join(self.path, 'index')
+        self._lock: Lock = Lock()
+        self._last_trim: float = float('-inf')
+
+        os.makedirs(self._objects_path, exist_ok=True)
+        os.makedirs(self._index_path, exist_ok=True)
+
+    @property
+    def cache_key(self) -> Hashable:
+        return self.__class__, self.source.cache_key
+
+    def _write_atomic(self, path: str, data: bytes, /) -> None:
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+
+            os.replace(temp, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp)
+            raise
+
+    def _entry_path(self, key: str, /) -> str:
+        # Namespace entries by source, so different sources can share a directory
+        key = f'{self.source.cache_key!r}:{key}'
+        return os.path.join(self._index_path, hashlib.sha256(key.encode()).hexdigest())
+
+    def _object_path(self, digest: str, /) -> str:
+        return os.path.join(self._objects_path, digest[:2], digest)
+
+    def _read(self, key: str, ttl: Optional[float] = None, /) -> Optional[BytesIO]:
+        entry_path = self._entry_path(key)
+
+        try:
+            with open(entry_path, encoding='utf-8') as fp:
+                entry = json.load(fp)
+
+            if ttl is not None and time.time() - entry['created'] > ttl:
+                return None
+
+            with open(self._object_path(entry['digest']), 'rb') as fp:
+                stream = BytesIO(fp.read())
+
+            # Record the access for LRU eviction
+            os.utime(entry_path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return stream
+
+    def _write(self, key: str, data: bytes, /) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            self._write_atomic(object_path, data)
+
+        entry = {'key': key, 'digest': digest, 'size': len(data), 'created': time.time()}
+        self._write_atomic(self._entry_path(key), json.dumps(entry).encode())
+
+        if self.max_size is not None:
+            self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            # Sizes are scanned from the directory, since other processes write to it too
+            if time.monotonic() - self._last_trim < self.trim_interval:
+                return
+
+            self._last_trim = time.monotonic()
+            entries = []
+            for name in _listdir(self._index_path):
+                path = os.path.join(self._index_path, name)
+
+                try:
+                    with open(path, encoding='utf-8') as fp:
+                        entry = json.load(fp)
+
+                    entries.append((os.stat(path).st_mtime, path, entry['digest']))
+                except (OSError, ValueError, KeyError):
+                    continue
+
+            refs = Counter(digest for *_, digest in entries)
+            sizes = {}
+            now = time.time()
+
+            for directory in _listdir(self._objects_path):
+                directory = os.path.join(self._objects_path, directory)
+
+                for digest in _listdir(directory):
+                    try:
+                        stat = os.stat(os.path.join(directory, digest))
+                    except OSError:
+                        continue
+
+                    # Unreferenced objects are only swept once they are old enough to
+                    # not be in the middle of being written by another process.
+                    if digest not in refs and now - stat.st_mtime > 60:
+                        with contextlib.suppress(OSError):
+                            os.remove(os.path.join(directory, digest))
+                    else:
+                        sizes[digest] = stat.st_size
+
+            size = sum(sizes.values())
+
+            for _, path, digest in sorted(entries):
+                if size <= self.max_size:
+                    break
+
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+                refs[digest] -= 1
+                if not refs[digest] and digest in sizes:
+                    with contextlib.suppress(OSError):
+                        os.remove(self._object_path(digest))
+
+                    size -= sizes.pop(digest)
+
+    def _get(
+        self,
+        key: str,
+        fetch: Callable[[], Optional[BytesIO]],
+        ttl: Optional[float] = None,
+        /
+    ) -> Optional[BytesIO]:
+        if stream := self._read(key, ttl):
+            return stream
+
+        if stream := fetch():
+            if data := stream.getvalue():
+                self._write(key, data)
+
+            stream.seek(0)
+
+        return stream
+
+    def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+        return self._get('emoji:' + emoji, lambda: self.source.get_emoji(emoji))
+
+    def iter_emojis(self) -> Iterator[str]:
+        return self.source.iter_emojis()
+
+    def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
+        return self._get(
+            f'discord_emoji:{int(id)}',
+            lambda: self.source.get_discord_emoji(id),
+            self.discord_emoji_ttl,
+        )
+
+    def get_discord_emoji_variant(
+        self,
+        id: int,
+        /,
+        *,
+        size: Optional[int] = None,
+        format: Optional[str] = None
+    ) -> Optional[BytesIO]:
+        if size is None and format is None:
+            return self.get_discord_emoji(id)
+
+        return self._get(
+            f'discord_emoji:{int(id)}:{size}:{format}',
+            lambda: self.source.get_discord_emoji_variant(id, size=size, format=format),
+            self.discord_emoji_ttl,
+        )
+
+    def close(self) -> None:
+        """Closes the source emojis are fetched from, if it can be closed."""
+        if callable(close := getattr(self.source, 'close', None)):
+            close()
+
+    def clear(self) -> None:
+        """Removes all emojis stored in this cache."""
+        with self._lock:
+            shutil.rmtree(self._objects_path, ignore_errors=True)
+            shutil.rmtree(self._index_path, ignore_errors=True)
+
+            os.makedirs(self._objects_path, exist_ok=True)
+            os.makedirs(self._index_path, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} source={self.source!r} path={self.path!r}>'
+
+
+class ArchiveSource(BaseSource):
+    """A source which serves emojis from a single local zip archive, without any HTTP requests.
+
+    Emoji images are looked up by their codepoints in lowercase hexadecimal,
+    joined by dashes, i.e. ``1f44b-1f3fd.png`` for 👋🏽. Variation selectors may be
+    omitted from file names. Discord emojis are looked up as ``discord/<id>.png``.
+
+    Uncompressed entries, such as the ones written by :meth:`build`, are
+    served straight from a memory map of the archive, without seeking or decompressing.
+    Each lookup still copies the image once, into the :class:`io.BytesIO` it returns.
+
+    Parameters
+    ----------
+    path: Union[str, :class:`os.PathLike`]
+        The path of the zip archive.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        self.path: str = os.fspath(path)
+
+        self._file = open(self.path, 'rb')
+        self._zip: zipfile.ZipFile = zipfile.ZipFile(self._file)
+        self._mmap: mmap.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._lock: Lock = Lock()
+
+        self._index: Dict[str, Union[Tuple[int, int], zipfile.ZipInfo]] = {}
+
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+
+            name, _ = os.path.splitext(info.filename.lower())
+
+            if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                # Skip the local file header to find where the data itself starts
+                name_length, extra_length = struct.unpack_from('<HH', self._mmap, info.header_offset + 26)
+                start = info.header_offset + 30 + name_length + extra_length
+                self._index[name] = start, start + info.file_size
+            else:
+                self._index[name] = info
+
+    @staticmethod
+    def _name(emoji: str, /) -> str:
+        return '-'.join(f'{ord(char):x}' for char in emoji)
+
+    @property
+    def cache_key(self) -> Hashable:
+        return self.__class__, os.path.abspath(self.path)
+
+    def _read(self, name: str, /) -> Optional[BytesIO]:
+        try:
+            entry = self._index[name]
+        except KeyError:
+            return None
+
+        if isinstance(entry, zipfile.ZipInfo):
+            with self._lock:
+                return BytesIO(self._zip.read(entry))
+
+        # Slicing the map copies the entry once, and BytesIO keeps the resulting bytes without copying again
+        start, end = entry
+        return BytesIO(self._mmap[start:end])
+
+    def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+        name = self._name(emoji)
+
+        if (stream := self._read(name)) is None and '-fe0f' in name:
+            stream = self._read(name.replace('-fe0f', ''))
+
+        return stream
+
+    def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
+        return self._read(f'discord/{int(id)}')
+
+    def iter_emojis(self) -> Iterator[str]:
+        for name in self._index:
+            if re.fullmatch(r'[0-9a-f]+(-[0-9a-f]+)*', name):
+                yield ''.join(chr(int(codepoint, 16)) for codepoint in name.split('-'))
+
+    def close(self) -> None:
+        """Closes the underlying archive."""
+        self._mmap.close()
+        self._zip.close()
+        self._file.close()
+
+    @classmethod
+    def build(cls, directory: Union[str, os.PathLike], path: Union[str, os.PathLike]) -> None:
+        """Packs a directory of emoji images into an archive usable by this source.
+
+        Files may either be named by their codepoints (i.e. ``1f44b.png``) or by
+        the emoji itself (i.e. ``👋.png``). Discord emojis should be placed in a
+        ``discord`` subdirectory and named by their ID.
+
+        Parameters
+        ----------
+        directory: Union[str, :class:`os.PathLike`]
+            The directory of emoji images to pack.
+        path: Union[str, :class:`os.PathLike`]
+            The path to write the archive to. It is written atomically.
+        """
+        directory = os.fspath(directory)
+        path = os.fspath(path)
+        output = os.path.abspath(path)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.tmp-')
+
+        try:
+            # Images are already compressed, so they are stored as-is to allow memory mapping
+            with os.fdopen(fd, 'wb') as fp, zipfile.ZipFile(fp, 'w', zipfile.ZIP_STORED) as archive:
+                for root, _, files in os.walk(directory):
+                    for file in sorted(files):
+                        if file.startswith('.') or os.path.abspath(os.path.join(root, file)) == output:
+                            continue
+
+                        name, extension = os.path.splitext(file)
+                        relative = os.path.relpath(root, directory)
+
+                        if relative == 'discord':
+                            name = 'discord/' + name
+                        elif relative != '.':
+                            continue
+                        elif not re.fullmatch(r'[0-9a-fA-F]+(-[0-9a-fA-F]+)*', name):
+                            name = cls._name(name)
+
+                        archive.write(os.path.join(root, file), name.lower() + extension.lower())
+
+            os.replace(temp, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp)
+            raise
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} path={self.path!r}>'
+
+
 # Aliases
 Openmoji = OpenmojiEmojiSource
 FacebookMessengerEmojiSource = MessengerEmojiSource
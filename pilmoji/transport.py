@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import contextlib
+import http.client
+import ssl
+
+from abc import ABC, abstractmethod
+from threading import BoundedSemaphore, Lock
+from urllib.parse import urljoin, urlsplit
+
+from typing import Dict, Iterator, List, Optional, TYPE_CHECKING, Tuple, Type
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    _has_requests = True
+except ImportError:
+    requests = None
+    _has_requests = False
+
+if TYPE_CHECKING:
+    HostT = Tuple[str, str, Optional[int]]
+
+__all__ = (
+    'BaseTransport',
+    'PooledTransport',
+    'RequestsTransport',
+    'default_transport',
+)
+
+# The errors a request fails with when it is sent on a kept alive connection which the host closed
+_STALE_CONNECTION_ERRORS: Tuple[Type[OSError], ...] = (
+    BrokenPipeError, ConnectionResetError, http.client.RemoteDisconnected,
+)
+
+
+class BaseTransport(ABC):
+    """The base class for a transport, which makes the HTTP requests of an :class:`~.HTTPBasedSource`.
+
+    Implementations must be thread-safe.
+    """
+
+    @abstractmethod
+    def request(self, url: str, /, *, headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """Makes a GET request to the given URL, following redirects.
+
+        Parameters
+        ----------
+        url: str
+            The URL to request from.
+        headers: Optional[Dict[str, str]]
+            The headers to send.
+
+        Returns
+        -------
+        Tuple[int, bytes]
+            The status code and body of the response.
+
+        Raises
+        ------
+        OSError
+            The host could not be reached, or did not respond in time.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Closes the idle connections of this transport.
+
+        The transport can still be used afterwards, new connections are made as needed.
+        """
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__}>'
+
+
+class PooledTransport(BaseTransport):
+    """A transport built on :mod:`http.client`, which keeps connections to each host alive
+    and reuses them, instead of connecting anew for every request.
+
+    This is the default transport if `requests` is not installed.
+
+    Parameters
+    ----------
+    connect_timeout: Optional[float]
+        The amount of seconds to wait for a connection to be established. Defaults to `5.0`.
+    read_timeout: Optional[float]
+        The amount of seconds to wait for the host to send data. Defaults to `10.0`.
+    retries: int
+        How many times to retry a request on another connection, when the kept alive connection
+        it was sent on turns out to have been closed by the host. Requests which time out or fail
+        on a new connection are not retried. Defaults to `2`.
+    max_connections: int
+        The maximum amount of connections to each host. Further requests wait for a free connection.
+        Defaults to `8`.
+    max_redirects: int
+        The maximum amount of redirects to follow. Defaults to `5`.
+    """
+
+    def __init__(
+        self,
+        *,
+        connect_timeout: Optional[float] = 5.0,
+        read_timeout: Optional[float] = 10.0,
+        retries: int = 2,
+        max_connections: int = 8,
+        max_redirects: int = 5
+    ) -> None:
+        self.connect_timeout: Optional[float] = connect_timeout
+        self.read_timeout: Optional[float] = read_timeout
+        self.retries: int = retries
+        self.max_connections: int = max_connections
+        self.max_redirects: int = max_redirects
+
+        self._lock: Lock = Lock()
+        self._idle: Dict[HostT, List[http.client.HTTPConnection]] = {}
+        self._slots: Dict[HostT, BoundedSemaphore] = {}
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    def _connect(self, host: HostT, /) -> http.client.HTTPConnection:
+        scheme, hostname, port = host
+
+        if scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+
+            connection = http.client.HTTPSConnection(
+                hostname, port, timeout=self.connect_timeout, context=self._ssl_context,
+            )
+        elif scheme == 'http':
+            connection = http.client.HTTPConnection(hostname, port, timeout=self.connect_timeout)
+        else:
+            raise ValueError(f'Unsupported URL scheme {scheme!r}.')
+
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+
+        return connection
+
+    @contextlib.contextmanager
+    def _connection(self, host: HostT, /) -> Iterator[Tuple[http.client.HTTPConnection, bool]]:
+        # Yields a connection to the host, and whether it was kept alive from an earlier request
+        with self._lock:
+            slots = self._slots.get(host)
+
+            if slots is None:
+                slots = self._slots[host] = BoundedSemaphore(self.max_connections)
+
+        with slots:
+            with self._lock:
+                idle = self._idle.setdefault(host, [])
+                connection = idle.pop() if idle else None
+
+            reused = connection is not None
+
+            if connection is None:
+                connection = self._connect(host)
+
+            try:
+                yield connection, reused
+            except BaseException:
+                connection.close()
+                raise
+
+            if connection.sock is not None:
+                with self._lock:
+                    self._idle.setdefault(host, []).append(connection)
+
+    def _request_once(self, url: str, headers: Dict[str, str], /) -> Tuple[int, Optional[str], bytes]:
+        parts = urlsplit(url)
+        host = parts.scheme, parts.hostname, parts.port
+        path = parts.path or '/'
+
+        if parts.query:
+            path += '?' + parts.query
+
+        for attempt in range(self.retries + 1):
+            reused = False
+
+            try:
+                with self._connection(host) as (connection, reused):
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    data = response.read()
+
+                    if response.will_close:
+                        connection.close()
+
+                    return response.status, response.getheader('Location'), data
+
+            except _STALE_CONNECTION_ERRORS:
+                # Hosts close idle connections whenever they like, which is only noticed once one is used again.
+                # The request is retried on the next idle connection, or a new one. Anything else is a real failure
+                if not reused or attempt >= self.retries:
+                    raise
+
+            except http.client.HTTPException as exc:
+                raise ConnectionError(f'Invalid response from {parts.netloc}: {exc!r}') from exc
+
+    def request(self, url: str, /, *, headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        headers = dict(headers or {})
+        headers.setdefault('Connection', 'keep-alive')
+
+        for _ in range(self.max_redirects + 1):
+            status, location, data = self._request_once(url, headers)
+
+            if status not in (301, 302, 303, 307, 308) or not location:
+                return status, data
+
+            url = urljoin(url, location)
+
+        raise ConnectionError(f'Exceeded {self.max_redirects} redirects requesting {url}.')
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def __repr__(self) -> str:
+        return f'<PooledTransport hosts={len(self._slots)}>'
+
+
+class RequestsTransport(BaseTransport):
+    """A transport built on `requests`, which is the default transport if it is installed.
+
+    This takes the same parameters as :class:`~.PooledTransport`. Sessions are not thread-safe,
+    so each concurrent request uses a session of its own. At most `max_connections` requests
+    are made at once, further requests wait for a free session.
+    """
+
+    def __init__(
+        self,
+        *,
+        connect_timeout: Optional[float] = 5.0,
+        read_timeout: Optional[float] = 10.0,
+        retries: int = 2,
+        max_connections: int = 8,
+        max_redirects: int = 5
+    ) -> None:
+        if not _has_requests:
+            raise RuntimeError('requests must be installed to use RequestsTransport.')
+
+        self.connect_timeout: Optional[float] = connect_timeout
+        self.read_timeout: Optional[float] = read_timeout
+        self.retries: int = retries
+        self.max_connections: int = max_connections
+        self.max_redirects: int = max_redirects
+
+        # Sessions are not thread-safe, so each request checks one out of this pool.
+        # The slots bound the amount of sessions to the amount of requests made at once
+        self._lock: Lock = Lock()
+        self._slots: BoundedSemaphore = BoundedSemaphore(max_connections)
+        self._sessions: List[requests.Session] = []
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.max_redirects = self.max_redirects
+
+        adapter = HTTPAdapter(pool_maxsize=self.max_connections, max_retries=self.retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    @contextlib.contextmanager
+    def _session(self) -> Iterator[requests.Session]:
+        with self._slots:
+            with self._lock:
+                session = self._sessions.pop() if self._sessions else self._new_session()
+
+            try:
+                yield session
+            finally:
+                with self._lock:
+                    self._sessions.append(session)
+
+    def request(self, url: str, /, *, headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        timeout = self.connect_timeout, self.read_timeout
+
+        with self._session() as session, session.get(url, headers=headers, timeout=timeout) as response:
+            return response.status_code, response.content
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+
+        for session in sessions:
+            session.close()
+
+
+def default_transport() -> BaseTransport:
+    """Creates the default transport, which is a :class:`~.RequestsTransport` if `requests`
+    is installed, or a :class:`~.PooledTransport` otherwise.
+
+    Returns
+    -------
+    :class:`~.BaseTransport`
+    """
+    return RequestsTransport() if _has_requests else PooledTransport()
@@ -43,7 +43,8 @@ setup(
     include_package_data=True,
     install_requires=requirements,
     extras_require={
-        'requests': ['requests']
+        'requests': ['requests'],
+        'aiohttp': ['aiohttp'],
     },
     python_requires='>=3.8.0',
     classifiers=[
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import hashlib
+import time
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from threading import Lock, Thread
+from typing import Iterator
+from urllib.parse import unquote_plus
+
+import pytest
+from PIL import Image, ImageFont
+
+from pilmoji.source import BaseSource, EmojiCDNSource
+
+
+def emoji_png(key: object, size: int = 72) -> bytes:
+    """A solid square whose color is derived from the key, encoded as PNG."""
+    digest = hashlib.md5(str(key).encode()).digest()
+    buffer = BytesIO()
+    Image.new('RGBA', (size, size), (digest[0], digest[1], digest[2], 255)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class CountingSource(BaseSource):
+    """An in-memory source which counts how many times each emoji was requested."""
+
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self._lock = Lock()
+
+    def _get(self, key: object) -> BytesIO:
+        with self._lock:
+            self.calls[key] += 1
+
+        return BytesIO(emoji_png(key))
+
+    def get_emoji(self, emoji: str, /) -> BytesIO:
+        return self._get(emoji)
+
+    def get_discord_emoji(self, id: int, /) -> BytesIO:
+        return self._get(id)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request: object, client_address: object) -> None:
+        # Clients which gave up on a request, i.e. because it timed out, are expected
+        pass
+
+
+class LocalCDN:
+    """A local stand-in for the emoji CDNs, serving generated images over HTTP.
+
+    Paths in `missing` respond with a 404. Every request is counted by its path and query.
+    With `drop_connections` set, connections are closed after every response without telling the client,
+    like hosts closing idle keep-alive connections.
+    """
+
+    def __init__(self) -> None:
+        self.requests: Counter = Counter()
+        self.delay: float = 0.0
+        self.missing: set = set()
+        self.drop_connections: bool = False
+        self._lock = Lock()
+
+        cdn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and bodies are written separately, which Nagle's algorithm would delay on kept alive connections
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                path = unquote_plus(self.path)
+
+                with cdn._lock:
+                    cdn.requests[path] += 1
+
+                time.sleep(cdn.delay)
+
+                if path.partition('?')[0] in cdn.missing:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                body = emoji_png(path.partition('?')[0])
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                self.close_connection = cdn.drop_connections
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        self.server = _QuietHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def source(self, **kwargs: object) -> EmojiCDNSource:
+        """Creates a source which requests emojis and Discord emojis from this server."""
+        source = LocalCDNSource(**kwargs)
+        source.BASE_EMOJI_CDN_URL = self.url
+        source.BASE_DISCORD_EMOJI_URL = self.url + 'emojis/'
+        return source
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LocalCDNSource(EmojiCDNSource):
+    STYLE = 'twitter'
+
+
+@pytest.fixture
+def cdn() -> Iterator[LocalCDN]:
+    cdn = LocalCDN()
+    yield cdn
+    cdn.close()
+
+
+@pytest.fixture
+def source() -> CountingSource:
+    return CountingSource()
+
+
+@pytest.fixture
+def font() -> ImageFont.FreeTypeFont:
+    return ImageFont.load_default(28)
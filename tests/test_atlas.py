@@ -0,0 +1,53 @@
+import pytest
+
+from PIL import Image
+
+from pilmoji import EmojiAtlas, Engine
+from pilmoji.source import SourceUnavailable
+
+from conftest import CountingSource
+
+
+def test_atlas_is_used_for_its_source_and_size(source, font, tmp_path):
+    atlas = EmojiAtlas.build(source, 28, emojis=['👋', '🎉'])
+    assert atlas.source_key == source.cache_key
+    source.calls.clear()
+
+    with Engine(source=source, atlases=[atlas]) as engine:
+        engine.text(Image.new('RGB', (200, 40)), (0, 0), '👋 🎉', font=font)
+        assert not source.calls
+
+        # Emojis rendered at other sizes are fetched as usual
+        engine.text(Image.new('RGB', (200, 40)), (0, 0), '👋', font=font.font_variant(size=20))
+        assert source.calls == {'👋': 1}
+
+    atlas.save(tmp_path / 'atlas.png')
+    loaded = EmojiAtlas.load(tmp_path / 'atlas.png', source)
+
+    assert loaded.source_key == source.cache_key
+    assert loaded.get('👋').tobytes() == atlas.get('👋').tobytes()
+
+
+def test_atlas_of_another_source_is_rejected(source):
+    class OtherSource(CountingSource):
+        pass
+
+    atlas = EmojiAtlas.build(OtherSource(), 28, emojis=['👋'])
+
+    with pytest.raises(ValueError):
+        Engine(source=source, atlases=[atlas])
+
+
+def test_unavailable_emojis_are_left_out_of_the_atlas():
+    class FlakySource(CountingSource):
+        def get_emoji(self, emoji, /):
+            if emoji == '🎉':
+                raise SourceUnavailable('emoji.example')
+
+            return None if emoji == '❌' else super().get_emoji(emoji)
+
+    atlas = EmojiAtlas.build(FlakySource(), 28, emojis=['👋', '🎉', '❌', '😀'])
+
+    assert len(atlas) == 2
+    assert '👋' in atlas and '😀' in atlas
+    assert '🎉' not in atlas and '❌' not in atlas
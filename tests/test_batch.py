@@ -0,0 +1,60 @@
+import subprocess
+import sys
+
+import pytest
+
+from PIL import Image
+
+from pilmoji import Engine, RenderJob, TextDraw, render_batch
+
+from conftest import CountingSource
+
+
+def _jobs():
+    return [
+        RenderJob((160, 40), [TextDraw((0, 0), f'job {i} 👋', 'white', options={'emoji_scale_factor': 1 + i / 10})])
+        for i in range(6)
+    ]
+
+
+def _render_serially(job):
+    image = Image.new(job.mode, job.image, job.color)
+
+    with Engine(source=CountingSource()) as engine:
+        for draw in job.draws:
+            engine.text(image, draw.xy, draw.text, draw.fill, draw.font, **(draw.options or {}))
+
+    return image
+
+
+def test_render_batch_matches_serial_rendering():
+    jobs = _jobs()
+    images = list(render_batch(jobs, source=CountingSource, max_workers=2, max_pending=3))
+
+    assert len(images) == len(jobs)
+
+    for job, image in zip(jobs, images):
+        assert image.tobytes() == _render_serially(job).tobytes()
+
+
+def test_render_batch_raises_the_error_of_a_failing_job():
+    jobs = _jobs()
+    jobs.insert(3, RenderJob((160, 40), [TextDraw((0, 0), 'nope', font=('/nonexistent/font.ttf', 20))]))
+    images = render_batch(jobs, source=CountingSource, max_workers=2)
+
+    # The jobs before the failing one are still yielded, in order
+    for job in jobs[:3]:
+        assert next(images).tobytes() == _render_serially(job).tobytes()
+
+    with pytest.raises(OSError):
+        next(images)
+
+
+def test_import_does_not_import_batch_or_atlas():
+    code = (
+        'import sys, pilmoji; '
+        'assert not {"pilmoji.atlas", "pilmoji.batch", "multiprocessing"} & set(sys.modules); '
+        'assert pilmoji.render_batch is pilmoji.batch.render_batch; '
+        'assert pilmoji.EmojiAtlas is pilmoji.atlas.EmojiAtlas'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
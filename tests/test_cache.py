@@ -0,0 +1,109 @@
+import pytest
+
+from pilmoji import CacheStats, LFUCache, LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used_first():
+    cache = LRUCache(max_entries=3)
+
+    for key in 'abc':
+        cache.set(key, key)
+
+    cache.get('a')
+    cache.set('d', 'd')
+
+    assert list(cache._entries) == ['c', 'a', 'd']
+
+    # Replacing an entry also counts as using it
+    cache.set('c', 'C')
+    cache.set('e', 'e')
+
+    assert list(cache._entries) == ['d', 'c', 'e']
+    assert cache.get('c') == 'C'
+    assert cache.stats.evictions == 2
+
+
+def test_lfu_cache_evicts_least_frequently_used_first():
+    cache = LFUCache(max_entries=3)
+
+    for key in 'abc':
+        cache.set(key, key)
+
+    for _ in range(3):
+        cache.get('a')
+
+    cache.get('c')
+    cache.set('d', 'd')
+
+    # b was used the least
+    assert set(cache._entries) == {'a', 'c', 'd'}
+
+    # Entries used equally often are evicted least recently used first
+    cache.set('e', 'e')
+    assert set(cache._entries) == {'a', 'c', 'e'}
+
+    # So new entries are evicted first if every other entry was used more often
+    cache.get('e')
+    cache.set('f', 'f')
+    assert set(cache._entries) == {'a', 'c', 'e'}
+    assert cache.stats.evictions == 3
+
+
+@pytest.mark.parametrize('cls', [LRUCache, LFUCache])
+def test_max_size_is_measured_in_bytes(cls):
+    cache = cls(100, sizeof=len)
+
+    cache.set('a', b'x' * 40)
+    cache.set('b', b'x' * 40)
+    assert cache.stats.size == 80
+
+    cache.set('c', b'x' * 40)
+    assert len(cache) == 2 and 'a' not in cache
+    assert cache.stats.size == 80
+
+    # Entries larger than the whole cache are not stored, and do not evict others
+    cache.set('d', b'x' * 101)
+    assert 'd' not in cache and len(cache) == 2
+
+
+@pytest.mark.parametrize('cls', [LRUCache, LFUCache])
+def test_max_size_and_max_entries_both_apply(cls):
+    cache = cls(100, max_entries=3, sizeof=len)
+
+    for key in 'abcd':
+        cache.set(key, b'x')
+
+    assert len(cache) == 3 and cache.stats.size == 3
+
+    cache.set('e', b'x' * 97)
+    assert len(cache) == 3 and cache.stats.size == 99
+
+    cache.set('f', b'x' * 98)
+    assert list(cache._entries) == ['f'] and cache.stats.size == 98
+    assert cache.stats.evictions == 5
+
+
+@pytest.mark.parametrize('cls', [LRUCache, LFUCache])
+def test_stats_count_hits_and_misses(cls):
+    cache = cls(sizeof=len)
+    assert cache.stats == CacheStats(hits=0, misses=0, evictions=0, entries=0, size=0, max_size=None)
+    assert cache.stats.hit_rate == 0
+
+    cache.set('a', b'abc')
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+
+    # Membership tests are not lookups
+    assert 'b' not in cache
+
+    assert cache.stats == CacheStats(hits=2, misses=1, evictions=0, entries=1, size=3, max_size=None)
+    assert cache.stats.hit_rate == pytest.approx(2 / 3)
+
+    cache.delete('a')
+    cache.delete('a')
+    assert cache.stats.entries == 0 and cache.stats.size == 0
+
+    cache.set('a', b'abc')
+    cache.clear()
+    assert len(cache) == 0 and cache.get('a', 'default') == 'default'
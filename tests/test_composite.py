@@ -0,0 +1,129 @@
+import random
+
+from io import BytesIO
+
+import pytest
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+from pilmoji import Engine, NodeType
+from pilmoji import engine as engine_module
+from pilmoji.composite import _open_mipmaps, _resize_emoji, _resize_mipmaps, paste_many
+
+from conftest import emoji_png
+
+
+def _placements(rng, count):
+    placements = []
+
+    for _ in range(count):
+        size = rng.randint(4, 40)
+        alpha = Image.radial_gradient('L').resize((size, size))
+        color = [Image.new('L', alpha.size, rng.randrange(256)) for _ in range(3)]
+        # Overlapping and partly or wholly outside of the image
+        placements.append((Image.merge('RGBA', (*color, alpha)), (rng.randint(-50, 110), rng.randint(-50, 110))))
+
+    placements.append((Image.new('LA', (10, 10), (200, 128)), (5, 5)))
+    return placements
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'LA', 'L', 'P'])
+def test_paste_many_matches_serial_pastes(mode):
+    placements = _placements(random.Random(mode), 300)
+    serial = Image.effect_noise((100, 100), 60).convert('RGB').convert(mode)
+    batched = serial.copy()
+
+    for asset, xy in placements:
+        serial.paste(asset, xy, asset)
+
+    paste_many(batched, placements)
+
+    assert batched.tobytes() == serial.tobytes()
+
+
+@pytest.mark.parametrize('layer_cache', [False, True])
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA'])
+def test_batched_emojis_match_serial_emojis(source, font, mode, layer_cache):
+    text = 'Hello 👋 <:x:123456789012345678>\n🎉🎉🎉 world 😀'
+    images = []
+
+    for batch_emojis in (False, True):
+        image = Image.new(mode, (300, 80), (20, 40, 60, 255))
+
+        with Engine(source=source, layer_cache=layer_cache) as engine:
+            engine.text(image, (0, 0), text, 'white', font, batch_emojis=batch_emojis)
+
+        images.append(image)
+
+    assert ImageChops.difference(*images).getbbox() is None
+
+
+def test_batched_emojis_are_drawn_over_text(source, font):
+    image = Image.new('RGB', (100, 40))
+
+    with Engine(source=source) as engine:
+        engine.text(image, (0, 0), '👋ab', font=font, fill='white', emoji_position_offset=(12, 0), batch_emojis=True)
+
+    expected = Image.new('RGB', (100, 40))
+    ImageDraw.Draw(expected).text((28, 0), 'ab', font=font, fill='white')
+    expected.paste(Image.open(BytesIO(emoji_png('👋'))).resize((28, 28)), (12, 0))
+
+    assert ImageChops.difference(image, expected).getbbox() is None
+
+
+def _smiley():
+    image = Image.new('RGBA', (288, 288), 0)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((8, 8, 280, 280), fill=(250, 200, 40, 255))
+    draw.ellipse((80, 80, 120, 140), fill=(60, 30, 10, 255))
+    draw.ellipse((170, 80, 210, 140), fill=(60, 30, 10, 255))
+    draw.arc((70, 120, 220, 240), 20, 160, fill=(60, 30, 10, 255), width=12)
+
+    buffer = BytesIO()
+    image.save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def _flatten(image):
+    # The colors of transparent pixels do not matter, so emojis are compared as drawn onto white
+    background = Image.new('RGBA', image.size, 'white')
+    background.alpha_composite(image)
+    return background.convert('RGB')
+
+
+@pytest.mark.parametrize('resample', [Image.Resampling.LANCZOS, Image.Resampling.BICUBIC, Image.Resampling.BILINEAR])
+@pytest.mark.parametrize('width', [16, 20, 28, 40, 72, 100, 288])
+def test_mipmaps_resize_close_to_the_full_image(resample, width):
+    levels = _open_mipmaps(_smiley())
+    mipmapped = _resize_mipmaps(levels, width, resample)
+    direct = _resize_emoji(levels[0], width, resample)
+
+    assert mipmapped.size == direct.size
+    difference = ImageChops.difference(_flatten(mipmapped), _flatten(direct))
+
+    # On average within 4 of 255 per channel, with no pixel off by more than an eighth
+    assert max(ImageStat.Stat(difference).mean) < 4
+    assert max(high for _, high in difference.getextrema()) < 40
+
+
+def test_resample_reaches_the_resize(source, font, monkeypatch):
+    filters = []
+    resize_mipmaps = engine_module._resize_mipmaps
+
+    def recording_resize_mipmaps(levels, width, resample=Image.Resampling.LANCZOS):
+        filters.append(resample)
+        return resize_mipmaps(levels, width, resample)
+
+    monkeypatch.setattr(engine_module, '_resize_mipmaps', recording_resize_mipmaps)
+    image = Image.new('RGBA', (100, 40))
+
+    with Engine(source=source, resample=Image.Resampling.NEAREST) as engine:
+        engine.text(image, (0, 0), '👋', font=font)
+        engine.text(image, (0, 0), '👋', font=font, resample=Image.Resampling.BOX)
+        engine.text(image, (0, 0), '👋', font=font, resample=Image.Resampling.BOX)
+
+        assert filters == [Image.Resampling.NEAREST, Image.Resampling.BOX]
+        assert engine._get_emoji_image(NodeType.emoji, '👋', 28).tobytes() == resize_mipmaps(
+            _open_mipmaps(BytesIO(emoji_png('👋'))), 28, Image.Resampling.NEAREST,
+        ).tobytes()
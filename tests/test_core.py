@@ -0,0 +1,47 @@
+import inspect
+
+import pytest
+
+from PIL import Image
+
+from pilmoji import Engine, Pilmoji
+
+
+def test_engine_options_are_explicit_parameters():
+    parameters = inspect.signature(Pilmoji).parameters
+
+    for name in inspect.signature(Engine).parameters:
+        assert parameters[name].kind is inspect.Parameter.KEYWORD_ONLY
+
+    assert not any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+
+
+def test_engine_options_are_forwarded(source):
+    image = Image.new('RGB', (32, 32))
+
+    with Pilmoji(image, source=source, emoji_scale_factor=2, emoji_position_offset=(1, 2)) as pilmoji:
+        assert pilmoji.source is source
+        assert pilmoji.engine._default_emoji_scale_factor == 2
+        assert pilmoji.engine._default_emoji_position_offset == (1, 2)
+
+
+def test_engine_options_conflict_with_an_engine(source):
+    image = Image.new('RGB', (32, 32))
+
+    with Engine(source=source) as engine:
+        with Pilmoji(image, engine=engine, draw=None) as pilmoji:
+            assert pilmoji.engine is engine
+
+        # Options are given if they are passed at all, no matter whether they equal the default
+        for options in ({'emoji_scale_factor': 2}, {'cache': True}, {'atlases': ()}, {'atlases': []}):
+            with pytest.raises(TypeError, match=next(iter(options))):
+                Pilmoji(image, engine=engine, **options)
+
+
+def test_unset_engine_options_take_the_engine_defaults():
+    with Pilmoji(Image.new('RGB', (32, 32))) as pilmoji:
+        defaults = inspect.signature(Engine).parameters
+
+        assert pilmoji.engine._default_emoji_scale_factor == defaults['emoji_scale_factor'].default
+        assert pilmoji.engine._default_resample == defaults['resample'].default
+        assert isinstance(pilmoji.source, defaults['source'].default)
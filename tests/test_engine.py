@@ -0,0 +1,416 @@
+import asyncio
+import os
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Barrier
+
+import pytest
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+from pilmoji import Engine, LRUCache, NodeType, to_spans
+from pilmoji.source import AsyncBaseSource
+
+from conftest import CountingSource, emoji_png
+
+DEJAVU_SANS = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+
+def test_image_cache_hits_and_misses(source, font):
+    with Engine(source=source) as engine:
+        image = Image.new('RGBA', (300, 60))
+
+        engine.text(image, (0, 0), 'a 👋 b 🎉', font=font)
+        assert engine.image_stats.hits == 0
+        assert engine.image_stats.misses == 2
+
+        engine.text(image, (0, 0), '👋 🎉 👋', font=font)
+        assert engine.image_stats.hits == 3
+        assert engine.image_stats.misses == 2
+
+    assert source.calls == {'👋': 1, '🎉': 1}
+
+
+def test_image_cache_is_keyed_by_size(source, font):
+    with Engine(source=source) as engine:
+        image = Image.new('RGBA', (300, 60))
+
+        engine.text(image, (0, 0), '👋', font=font)
+        engine.text(image, (0, 0), '👋', font=font, emoji_scale_factor=0.5)
+
+        assert engine.image_stats.misses == 2
+        assert source.calls == {'👋': 1}
+
+
+def test_image_stats_without_cache(source, font):
+    with Engine(source=source, cache=False) as engine:
+        engine.text(Image.new('RGBA', (100, 60)), (0, 0), '👋 👋', font=font)
+
+        assert engine.image_stats.hits == 0
+        assert engine.image_stats.misses == 2
+
+
+def test_prefetch_fills_cache_concurrently(cdn, font):
+    text = ['hello 👋 🎉', '👍 <:x:123456789012345678>', '🔥 <:gone:223456789012345678> 👋']
+    cdn.delay = 0.2
+    cdn.missing.add('/emojis/223456789012345678.png')
+
+    with Engine(source=cdn.source()) as engine:
+        started = time.perf_counter()
+        engine.prefetch(text, font)
+        elapsed = time.perf_counter() - started
+
+        # Six requests taking 0.2s each would take 1.2s one after another
+        assert elapsed < 0.6
+        assert sum(cdn.requests.values()) == 6
+        assert set(cdn.requests.values()) == {1}
+
+        for emoji in '👋🎉👍🔥':
+            assert engine._get_cached(('emoji', emoji)) is not None
+
+        assert engine._get_cached(('discord_emoji', 123456789012345678, 32, None)) is not None
+        assert engine._is_missing(('discord_emoji', 223456789012345678, 32, None))
+
+        for line in text:
+            engine.text(Image.new('RGB', (400, 60)), (0, 0), line, font=font)
+
+    assert sum(cdn.requests.values()) == 6
+
+
+class AsyncCountingSource(AsyncBaseSource):
+    def __init__(self) -> None:
+        self.calls = Counter()
+
+    async def get_emoji(self, emoji: str, /) -> BytesIO:
+        self.calls[emoji] += 1
+        return BytesIO(emoji_png(emoji))
+
+    async def get_discord_emoji(self, id: int, /) -> BytesIO:
+        self.calls[id] += 1
+        return BytesIO(emoji_png(id))
+
+
+def test_cached_images_are_not_fetched_again(source, font):
+    # The raw bytes of hot emojis are evicted by cold ones, while their resized images stay cached
+    cold = iter(map(chr, range(0x1F600, 0x1F63C)))
+    image = Image.new('RGBA', (300, 60))
+
+    with Engine(source=source, cache=LRUCache(max_entries=12)) as engine:
+        for _ in range(30):
+            engine.text(image, (0, 0), '👋 🎉', font=font)
+            engine.text(image, (0, 0), f'{next(cold)} {next(cold)}', font=font)
+
+    assert source.calls['👋'] == source.calls['🎉'] == 1
+
+
+def test_text_async_survives_eviction(font):
+    source = AsyncCountingSource()
+    cache = LRUCache()
+
+    class EvictingExecutor(ThreadPoolExecutor):
+        # Clears the cache after text_async looked for emojis to fetch, but before the text is drawn
+        def submit(self, *args, **kwargs):
+            cache.clear()
+            return super().submit(*args, **kwargs)
+
+    async def main() -> None:
+        async with Engine(source=source, cache=cache) as engine:
+            image = Image.new('RGB', (300, 60))
+            await engine.text_async(image, (0, 0), 'a 👋 b', font=font)
+
+            with EvictingExecutor(1) as executor:
+                await engine.text_async(image, (0, 0), 'a 👋 b', font=font, executor=executor)
+
+    asyncio.run(main())
+    assert source.calls == {'👋': 1}
+
+
+def _draw_pieces(size, pieces, font):
+    # Draws each piece of text right after the previous one, as measured by the font
+    image = Image.new('RGB', size)
+    draw = ImageDraw.Draw(image)
+    x = 0
+
+    for piece in pieces:
+        draw.text((x, 0), piece, font=font)
+        x += int(font.getlength(piece))
+
+    return image
+
+
+def test_discord_emojis_are_laid_out_as_text_when_not_rendered(source, font):
+    text = 'a <:x:123456789012345678> b'
+    pieces = ['a ', '123456789012345678', ' b']
+    width = sum(int(font.getlength(piece)) for piece in pieces)
+
+    with Engine(source=source, render_discord_emoji=False) as engine:
+        assert engine.getsize(text, font)[0] == width
+        assert engine.getsize(to_spans(text), font)[0] == width
+        assert [run.type for run in engine.layout(text, font).lines[0]] == [NodeType.text] * 3
+
+        image = Image.new('RGB', (400, 40))
+        engine.text(image, (0, 0), text, font=font)
+
+    assert ImageChops.difference(image, _draw_pieces((400, 40), pieces, font)).getbbox() is None
+    assert not source.calls
+
+
+class MissingSource(CountingSource):
+    def get_emoji(self, emoji, /):
+        return None if emoji == '❌' else super().get_emoji(emoji)
+
+
+def test_missing_emojis_move_the_rest_of_their_line(font):
+    image = Image.new('RGB', (400, 40))
+
+    with Engine(source=MissingSource()) as engine:
+        engine.text(image, (0, 0), 'a ❌ b', font=font)
+
+    assert ImageChops.difference(image, _draw_pieces((400, 40), ['a ', '❌', ' b'], font)).getbbox() is None
+
+
+class MissingDiscordSource(MissingSource):
+    def get_discord_emoji(self, id, /):
+        return None
+
+
+def test_layers_with_missing_emojis_are_drawn_once_and_not_cached(font, monkeypatch):
+    text = 'a ❌ <:x:123456789012345678> b'
+    direct = Image.new('RGB', (600, 40))
+
+    with Engine(source=MissingDiscordSource()) as engine:
+        engine.text(direct, (0, 0), text, font=font)
+
+    draw_text = ImageDraw.ImageDraw.text
+    calls = []
+
+    def counting_text(self, *args, **kwargs):
+        calls.append(args[1])
+        return draw_text(self, *args, **kwargs)
+
+    monkeypatch.setattr(ImageDraw.ImageDraw, 'text', counting_text)
+    image = Image.new('RGB', (600, 40))
+
+    with Engine(source=MissingDiscordSource(), layer_cache=True) as engine:
+        engine.text(image, (0, 0), text, font=font)
+
+        assert calls == ['a ', '❌', ' ', '123456789012345678', ' b']
+        assert engine._layer_cache.stats.entries == 0
+
+    # The layer is wide enough for the emojis drawn as text
+    assert ImageChops.difference(image, direct).getbbox() is None
+
+
+def test_emojis_and_text_stack_in_order(source, font):
+    # The emoji is moved over the text after it, which is drawn on top of it
+    image = Image.new('RGB', (100, 40))
+
+    with Engine(source=source) as engine:
+        engine.text(image, (0, 0), '👋ab', font=font, fill='white', emoji_position_offset=(12, 0))
+
+    expected = Image.new('RGB', (100, 40))
+    expected.paste(Image.open(BytesIO(emoji_png('👋'))).resize((28, 28)), (12, 0))
+    ImageDraw.Draw(expected).text((28, 0), 'ab', font=font, fill='white')
+
+    assert ImageChops.difference(image, expected).getbbox() is None
+
+
+def _merge_fonts():
+    yield ImageFont.load_default(28)
+
+    if os.path.exists(DEJAVU_SANS):
+        for size in (16, 28, 40):
+            yield ImageFont.truetype(DEJAVU_SANS, size)
+
+
+def _slots(layout):
+    return [(run.x, run.y) for line in layout.lines for run in line if run.type is not NodeType.text]
+
+
+@pytest.mark.parametrize('font', list(_merge_fonts()), ids=repr)
+@pytest.mark.parametrize('render_discord_emoji', [True, False])
+def test_merged_text_matches_separate_runs(source, font, render_discord_emoji):
+    text = (
+        'Hello 👋 world <:x:123456789012345678> ok 🎉\n'
+        'second 😀line AV 👍🏽 To 😀😀 end\n'
+        '\n'
+        '👋 a👋b <:y:223456789012345678><:x:123456789012345678> Wolf 🇬🇧'
+    )
+    images = []
+
+    with Engine(source=source, render_discord_emoji=render_discord_emoji) as engine:
+        separate, merged = (engine.layout(text, font, merge_text=merge_text) for merge_text in (False, True))
+        assert merged.size == separate.size
+        assert engine.getsize(to_spans(text), font, merge_text=True) == separate.size
+
+        for merge_text in (False, True):
+            image = Image.new('RGB', (separate.width + 20, separate.height + 20), 'white')
+            engine.text(image, (10, 10), text, 'black', font, merge_text=merge_text)
+            images.append(image)
+
+    assert ImageChops.difference(*images).getbbox() is None
+
+    # Emojis keep their slots, and text is only joined where it fits around them exactly
+    assert _slots(merged) == _slots(separate)
+    assert sum(map(len, merged.lines)) <= sum(map(len, separate.lines))
+
+    if font.path == DEJAVU_SANS:
+        # DejaVu Sans has blank spaces of many widths, so most of its runs are joined
+        assert sum(map(len, merged.lines)) < sum(map(len, separate.lines))
+
+
+def test_concurrent_renders_fetch_each_emoji_once(cdn, font):
+    text = 'hi 👋 🎉 👍 🔥 <:x:123456789012345678>'
+    cdn.delay = 0.1
+    source = cdn.source()
+    cache = LRUCache()
+    barrier = Barrier(16)
+
+    # Engines sharing a cache also share their in-flight fetches
+    engines = [Engine(source=source, cache=cache), Engine(source=source, cache=cache)]
+
+    def render(index):
+        image = Image.new('RGB', (400, 40))
+        barrier.wait()
+        engines[index % 2].text(image, (0, 0), text, font=font)
+        return image.tobytes()
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        images = list(executor.map(render, range(16)))
+
+    assert len(set(images)) == 1
+    assert len(cdn.requests) == 5
+    assert set(cdn.requests.values()) == {1}
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA'])
+@pytest.mark.parametrize('fill', [255, 0xFFFFFF, 0xFF00FF00, 'white', '#f00', (255, 0, 0), (0, 0, 255, 255), None])
+def test_layers_match_direct_drawing_for_any_fill(source, font, mode, fill):
+    text = 'ab 😀 c\nde'
+    direct = Image.new(mode, (200, 80), (20, 40, 60, 255))
+    layered = direct.copy()
+
+    with Engine(source=source) as engine:
+        engine.text(direct, (0, 0), text, fill, font)
+
+    with Engine(source=source, layer_cache=True) as engine:
+        engine.text(layered, (0, 0), text, fill, font)
+
+    assert ImageChops.difference(direct, layered).getbbox() is None
+
+
+def test_layer_cache_hits_match_fresh_renders(source, font):
+    text = 'Hello 👋 <:x:123456789012345678>\nworld 🎉'
+    fresh = Image.new('RGB', (300, 80), (20, 40, 60))
+    ImageDraw.Draw(fresh).rectangle((0, 0, 150, 40), fill='white')
+    hit = fresh.copy()
+
+    with Engine(source=source) as engine:
+        engine.text(fresh, (5, 5), text, 'black', font, resample=Image.Resampling.NEAREST)
+
+    with Engine(source=source, layer_cache=True) as engine:
+        engine.text(Image.new('RGB', (10, 10)), (0, 0), text, 'black', font, resample=Image.Resampling.NEAREST)
+        engine.text(hit, (5, 5), text, 'black', font, resample=Image.Resampling.NEAREST)
+
+        assert engine._layer_cache.stats.hits == 1
+
+    assert ImageChops.difference(fresh, hit).getbbox() is None
+
+
+class NoisySource(CountingSource):
+    # Solid squares look the same with every resampling filter
+    def _get(self, key):
+        buffer = BytesIO()
+        Image.frombytes('L', (72, 72), bytes(i * 97 % 256 for i in range(72 * 72))).convert('RGBA').save(buffer, 'PNG')
+        buffer.seek(0)
+        return buffer
+
+
+def test_shared_layer_caches_keep_engine_options_apart(font):
+    cache = LRUCache()
+    images = []
+
+    for options in ({'resample': Image.Resampling.LANCZOS}, {'resample': Image.Resampling.NEAREST},
+                    {'discord_emoji_format': 'webp'}):
+        direct = Image.new('RGB', (200, 40))
+        layered = direct.copy()
+
+        with Engine(source=NoisySource(), **options) as engine:
+            engine.text(direct, (0, 0), '👋 <:x:123456789012345678>', font=font)
+
+        with Engine(source=NoisySource(), layer_cache=cache, **options) as engine:
+            engine.text(layered, (0, 0), '👋 <:x:123456789012345678>', font=font)
+
+        assert ImageChops.difference(direct, layered).getbbox() is None
+        images.append(layered)
+
+    assert ImageChops.difference(images[0], images[1]).getbbox() is not None
+    assert cache.stats.entries == 3
+
+
+def test_changed_draws_bypass_the_layer_cache(source, font):
+    images = []
+
+    for layer_cache in (False, True):
+        image = Image.new('RGB', (200, 40))
+        draw = ImageDraw.Draw(image)
+        draw.fontmode = '1'
+
+        with Engine(source=source, layer_cache=layer_cache) as engine:
+            engine.text(image, (0, 0), 'ab 😀 c', font=font, draw=draw)
+
+            if layer_cache:
+                assert engine._layer_cache.stats.entries == 0
+
+                engine.text(Image.new('RGB', (200, 40)), (0, 0), 'ab 😀 c', font=font, draw=None)
+                assert engine._layer_cache.stats.entries == 1
+
+        images.append(image)
+
+    assert ImageChops.difference(*images).getbbox() is None
+
+
+def _stack(strips):
+    strips = list(strips)
+    image = Image.new(strips[0].mode, (strips[0].width, sum(strip.height for strip in strips)))
+    y = 0
+
+    for strip in strips:
+        image.paste(strip, (0, y))
+        y += strip.height
+
+    return image, [strip.height for strip in strips]
+
+
+@pytest.mark.parametrize('lines', [9, 10, 1])
+def test_strips_stack_into_a_full_render(source, font, lines):
+    # Without descenders, which would reach into the next strip
+    text = '\n'.join(f'Line {i} 👋 <:x:123456789012345678> HELLO 🎉' for i in range(lines))
+
+    with Engine(source=source) as engine:
+        width, height = engine.getsize(text, font)
+        full = Image.new('RGB', (width, height), 'white')
+        engine.text(full, (0, 0), text, 'black', font)
+
+        strips, heights = _stack(engine.render_strips(
+            text, width, font, fill='black', lines_per_strip=3, mode='RGB', color='white',
+        ))
+
+        # Also when the lines are consumed from an iterable, like a file
+        from_lines, _ = _stack(engine.render_strips(
+            (line + '\n' for line in text.split('\n')), width, font,
+            fill='black', lines_per_strip=3, mode='RGB', color='white',
+        ))
+
+    # Every strip but the last includes the spacing below its last line
+    counts = [3] * (lines // 3) + ([lines % 3] if lines % 3 else [])
+    expected = [count * (font.size + 4) for count in counts]
+    expected[-1] -= 4
+
+    assert heights == expected
+    assert strips.size == full.size
+    assert ImageChops.difference(strips, full).getbbox() is None
+    assert ImageChops.difference(from_lines, full).getbbox() is None
@@ -0,0 +1,171 @@
+import random
+import re
+import subprocess
+import sys
+
+import pytest
+
+from pilmoji import Engine, LRUCache
+from pilmoji.helpers import EMOJI_REGEX, Node, NodeType, _default_font, _emoji_tables, _parse_line, fit, layout, wrap
+
+
+def _regex_parse_line(line):
+    # The tokenizer pilmoji used before the trie, which split lines with EMOJI_REGEX
+    nodes = []
+
+    for i, chunk in enumerate(EMOJI_REGEX.split(line)):
+        if not chunk:
+            continue
+
+        if not i % 2:
+            nodes.append(Node(NodeType.text, chunk))
+        elif len(chunk) > 18:
+            nodes.append(Node(NodeType.discord_emoji, chunk.split(':')[-1][:-1]))
+        else:
+            nodes.append(Node(NodeType.emoji, chunk))
+
+    return nodes
+
+
+def _random_lines(count, seed=0):
+    rng = random.Random(seed)
+    emojis = sorted(set(_emoji_tables()[0].values()))
+    long_emojis = [emoji for emoji in emojis if len(emoji) > 1]
+
+    pieces = [
+        lambda: rng.choice(emojis),
+        # Prefixes of multi-codepoint emojis, which must not be matched as a longer emoji
+        lambda: (lambda emoji: emoji[:rng.randrange(1, len(emoji))])(rng.choice(long_emojis)),
+        lambda: rng.choice(['‍', '️', '\U0001f3fb', '⃣', '#', '*', '1', '🇺', '🇸']),
+        lambda: f'<{rng.choice(["", "a"])}:{rng.choice(["x", "wave_2", "a" * 33, ""])}:{rng.randrange(10 ** 16, 10 ** 23)}>',
+        lambda: rng.choice(['<', '>', ':', '<:', '<a:b:', ' ', '  ']),
+        lambda: ''.join(rng.choices('abcdefghij ,.!?', k=rng.randrange(1, 12))),
+        lambda: ''.join(rng.choices('日本語の文字列한국어', k=rng.randrange(1, 6))),
+    ]
+
+    return [''.join(rng.choice(pieces)() for _ in range(rng.randrange(1, 16))) for _ in range(count)]
+
+
+def test_tokenizer_matches_regex():
+    for line in _random_lines(20_000):
+        assert _parse_line(line) == _regex_parse_line(line), line
+
+
+def test_emoji_regex_is_a_pattern():
+    assert isinstance(EMOJI_REGEX, re.Pattern)
+    assert re.split(EMOJI_REGEX, 'a 👋 <:x:123456789012345678>') == ['a ', '👋', ' ', '<:x:123456789012345678>', '']
+
+
+def test_import_does_not_build_emoji_tables():
+    code = 'import sys, pilmoji; assert "emoji" not in sys.modules; assert "EMOJI_REGEX" not in vars(pilmoji.helpers)'
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_default_font_measurements_are_cached():
+    cache = LRUCache()
+
+    layout('hello world', cache=cache)
+    misses = cache.stats.misses
+
+    assert layout('hello world', cache=cache).width == layout('hello world', _default_font()).width
+    assert cache.stats.misses == misses
+
+
+def test_wrap_and_fit_take_the_box_by_keyword(source, font):
+    text = 'Hello 😀 world, this is a long line of text to wrap'
+
+    with pytest.raises(TypeError):
+        wrap(text, font, 120)
+
+    with pytest.raises(TypeError):
+        fit(text, font, (120, 80))
+
+    with Engine(source=source) as engine:
+        assert engine.wrap(text, 120, font) == wrap(text, font, width=120)
+        assert engine.fit(text, (120, 80), font).size == fit(text, font, size=(120, 80)).size
+
+
+WRAP_TEXT = 'Hello 😀 world, this is a long line of text 👍🏽 to wrap <:x:123456789012345678> 🇬🇧🇬🇧'
+
+
+def _emojis(text):
+    return [node for line in text.split('\n') for node in _parse_line(line) if node.type is not NodeType.text]
+
+
+@pytest.mark.parametrize('width', [60, 120, 200, 400])
+def test_wrap_keeps_lines_within_the_width(font, width):
+    wrapped = wrap(WRAP_TEXT, font, width=width)
+
+    assert all(layout(line, font).width <= width for line in wrapped.split('\n'))
+    assert ''.join(wrapped.split()) == ''.join(WRAP_TEXT.split())
+    assert _emojis(wrapped) == _emojis(WRAP_TEXT)
+
+    # Wider boxes need fewer lines
+    if width < 400:
+        assert wrapped.count('\n') > wrap(WRAP_TEXT, font, width=width * 2).count('\n')
+
+
+def test_wrap_never_splits_emojis(font):
+    text = '👋👋👋👋 👋👋👋👋 👋 👍🏽🇬🇧<:x:123456789012345678>👨‍👩‍👧'
+
+    # Four emojis fit exactly, so whole words are kept
+    assert wrap('👋👋👋👋 👋👋👋👋 👋', font, width=4 * font.size) == '👋👋👋👋\n👋👋👋👋\n👋'
+
+    for width in (font.size, 2 * font.size, 3 * font.size - 1, 100):
+        wrapped = wrap(text, font, width=width)
+
+        assert _emojis(wrapped) == _emojis(text)
+        assert all(layout(line, font).width <= width for line in wrapped.split('\n'))
+
+
+def test_wrap_breaks_long_words_only_if_asked(font):
+    text = 'a supercalifragilistic word'
+    width = 100
+    assert font.getlength('supercalifragilistic') > width
+
+    broken = wrap(text, font, width=width).split('\n')
+    assert all(layout(line, font).width <= width for line in broken)
+    assert ''.join(broken) == text.replace(' ', '')
+
+    kept = wrap(text, font, width=width, break_long_words=False).split('\n')
+    assert kept == ['a', 'supercalifragilistic', 'word']
+
+
+def _fits(layout, size):
+    width, height = size
+    return layout.width <= width and layout.height <= height
+
+
+def test_fit_chooses_the_largest_font_size_that_fits(font):
+    size = (250, 80)
+    fitted = fit(WRAP_TEXT, font, size=size, min_font_size=6)
+
+    assert 6 < fitted.font.size < font.size
+    assert _fits(fitted, size)
+    assert fitted.lines == layout(wrap(WRAP_TEXT, fitted.font, width=size[0]), fitted.font).lines
+
+    larger = font.font_variant(size=fitted.font.size + 1)
+    assert not _fits(layout(wrap(WRAP_TEXT, larger, width=size[0]), larger), size)
+
+
+def test_fit_uses_the_font_size_if_the_text_fits(font):
+    fitted = fit('Hello 😀', font, size=(400, 100))
+
+    assert fitted.font.size == font.size
+    assert fitted.lines == layout('Hello 😀', fitted.font).lines
+
+
+def test_fit_falls_back_to_the_minimum_font_size(font):
+    size = (100, 50)
+    fitted = fit(WRAP_TEXT * 20, font, size=size, min_font_size=6)
+
+    assert fitted.font.size == 6
+    assert not _fits(fitted, size)
+
+
+def test_fit_without_wrapping_keeps_line_breaks(font):
+    text = 'Hello 😀 world\nsecond line'
+    fitted = fit(text, font, size=(120, 200), wrap=False)
+
+    assert len(fitted.lines) == 2
+    assert _fits(fitted, (120, 200))
@@ -0,0 +1,80 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from PIL import ImageFont
+
+from pilmoji import LRUCache, NodeType, layout, to_nodes
+from pilmoji.metrics import AdvanceTable, advance_table
+
+DEJAVU_SANS = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+PIECES = (
+    'Hello', 'world', 'AVATAR', 'Wolf', 'office', 'Tj', 'naïve', 'über', '1,234.56', '(x)', ' ', ' ',
+    '漢字', 'テスト', '한국어', '中文', '😀', '👍🏽', '🇬🇧', '👨‍👩‍👧', '❤️', '<:rooThink:596576798351949847>',
+)
+
+
+def _fonts():
+    yield ImageFont.load_default(28)
+
+    if os.path.exists(DEJAVU_SANS):
+        for size in (11, 28, 64):
+            yield ImageFont.truetype(DEJAVU_SANS, size)
+
+
+def _lines(count):
+    rng = random.Random(2)
+    lines = [''.join(rng.choice(PIECES) for _ in range(rng.randint(1, 40))) for _ in range(count)]
+
+    # Long runs of text are summed with NumPy, if it is installed
+    lines.append(' '.join(PIECES[:12] * 10) + '😀' + ''.join(PIECES[:12] * 10))
+    return lines
+
+
+@pytest.mark.parametrize('font', list(_fonts()), ids=repr)
+def test_advance_table_matches_getlength(font):
+    table = advance_table(font)
+    assert table is not None
+
+    for line in _lines(300):
+        for node in to_nodes(line)[0]:
+            if node.type is not NodeType.text:
+                continue
+
+            length = table.length(node.content)
+
+            if any(ord(char) >= 0x0590 for char in node.content):
+                assert length is None
+            else:
+                # The table is exact for fonts without ligatures of more than two characters
+                assert length == pytest.approx(font.getlength(node.content), abs=1e-6)
+
+
+@pytest.mark.parametrize('font', list(_fonts()), ids=repr)
+def test_fast_measure_matches_exact_layout(font):
+    for line in _lines(300):
+        exact = layout(line, font)
+        fast = layout(line, font, fast_measure=True)
+
+        assert fast.size == exact.size
+        assert [run.width for run in fast.lines[0]] == [run.width for run in exact.lines[0]]
+
+
+def test_import_does_not_import_numpy():
+    code = 'import sys, pilmoji; assert "numpy" not in sys.modules'
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_measure_cache_keeps_fast_and_exact_widths_apart(monkeypatch):
+    font = ImageFont.load_default(28)
+    cache = LRUCache()
+
+    exact = layout('Hello world', font, cache=cache).width
+    monkeypatch.setattr(AdvanceTable, 'length', lambda self, text, /: 1000.0)
+
+    assert layout('Hello world', font, cache=cache, fast_measure=True).width == 1000
+    assert layout('Hello world', font, cache=cache).width == exact
@@ -0,0 +1,207 @@
+import os
+import shutil
+import time
+
+import pytest
+from PIL import Image, ImageFont
+
+from pilmoji import Engine
+from pilmoji.source import ArchiveSource, CircuitBreaker, DiskCachedSource, SourceUnavailable
+
+from conftest import emoji_png
+
+
+def _objects_size(path):
+    total = 0
+    for root, _, files in os.walk(os.path.join(path, 'objects')):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def test_disk_cache_is_shared_between_instances(source, tmp_path):
+    first = DiskCachedSource(source, tmp_path)
+    second = DiskCachedSource(source, tmp_path)
+
+    assert first.get_emoji('👋').getvalue() == emoji_png('👋')
+    assert second.get_emoji('👋').getvalue() == emoji_png('👋')
+    assert source.calls == {'👋': 1}
+
+
+def test_disk_cache_trims_writes_of_other_instances(source, tmp_path):
+    size = max(len(emoji_png(emoji)) for emoji in 'abcdefghi')
+    other = DiskCachedSource(source, tmp_path)
+
+    for emoji in 'abcdefgh':
+        other.get_emoji(emoji)
+
+    assert _objects_size(tmp_path) == sum(len(emoji_png(emoji)) for emoji in 'abcdefgh')
+
+    # This instance has not written anything yet, but still trims to the size of the whole directory
+    cache = DiskCachedSource(source, tmp_path, max_size=3 * size, trim_interval=0)
+    cache.get_emoji('i')
+
+    assert _objects_size(tmp_path) <= 3 * size
+    assert cache.get_emoji('i').getvalue() == emoji_png('i')
+
+
+def test_disk_cache_trims_at_most_once_per_interval(source, tmp_path):
+    size = max(len(emoji_png(emoji)) for emoji in 'abcde')
+    cache = DiskCachedSource(source, tmp_path, max_size=2 * size, trim_interval=3600)
+
+    for emoji in 'abcd':
+        cache.get_emoji(emoji)
+
+    # Only the first write trimmed, the others are left until the interval has passed
+    assert _objects_size(tmp_path) == sum(len(emoji_png(emoji)) for emoji in 'abcd')
+
+    cache.trim_interval = 0
+    cache.get_emoji('e')
+    assert _objects_size(tmp_path) <= 2 * size
+
+
+def test_disk_cache_trims_while_other_processes_clear_it(source, tmp_path, monkeypatch):
+    cache = DiskCachedSource(source, tmp_path, max_size=1, trim_interval=0)
+    cache.get_emoji('a')
+
+    listdir = os.listdir
+    objects = os.path.join(tmp_path, 'objects')
+
+    def clearing_listdir(path):
+        # Another process removes the directory right before it is listed
+        if os.path.dirname(path) == objects:
+            shutil.rmtree(path)
+
+        return listdir(path)
+
+    monkeypatch.setattr(os, 'listdir', clearing_listdir)
+    assert cache.get_emoji('b').getvalue() == emoji_png('b')
+
+
+def test_disk_cache_trimming_skips_files_being_written(source, tmp_path):
+    cache = DiskCachedSource(source, tmp_path, max_size=10 ** 6, trim_interval=0)
+    cache.get_emoji('a')
+
+    directory = next(os.scandir(os.path.join(tmp_path, 'objects'))).path
+    temp = os.path.join(directory, '.tmp-written-by-another-process')
+
+    with open(temp, 'wb') as fp:
+        fp.write(b'x' * 10 ** 6)
+
+    os.utime(temp, (time.time() - 3600,) * 2)
+    cache.get_emoji('b')
+
+    # Neither swept as an unreferenced object, nor counted towards the size of the cache
+    assert os.path.exists(temp)
+    assert cache.get_emoji('a').getvalue() == emoji_png('a')
+    assert source.calls == {'a': 1, 'b': 1}
+
+
+def test_engine_closes_archive_sources(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    (images / '1f44b.png').write_bytes(emoji_png('👋'))
+    ArchiveSource.build(images, tmp_path / 'emojis.zip')
+
+    archive = ArchiveSource(tmp_path / 'emojis.zip')
+
+    with Engine(source=archive):
+        pass
+
+    assert archive._mmap.closed
+    assert archive._file.closed
+
+
+def test_archive_source(tmp_path):
+    images = tmp_path / 'images'
+    (images / 'discord').mkdir(parents=True)
+    (images / '1f44b.png').write_bytes(emoji_png('👋'))
+    (images / '👍.png').write_bytes(emoji_png('👍'))
+    (images / 'discord' / '123456789012345678.png').write_bytes(emoji_png(123456789012345678))
+
+    ArchiveSource.build(images, tmp_path / 'emojis.zip')
+
+    archive = ArchiveSource(tmp_path / 'emojis.zip')
+    try:
+        assert archive.get_emoji('👋').getvalue() == emoji_png('👋')
+        assert archive.get_emoji('👍').getvalue() == emoji_png('👍')
+        assert archive.get_discord_emoji(123456789012345678).getvalue() == emoji_png(123456789012345678)
+        assert archive.get_emoji('🎉') is None
+        assert sorted(archive.iter_emojis()) == sorted(['👋', '👍'])
+    finally:
+        archive.close()
+
+
+def test_discord_emoji_variants(cdn):
+    text = '<:x:123456789012345678>'
+    image = Image.new('RGB', (100, 100))
+
+    with Engine(source=cdn.source(), discord_emoji_format='webp') as engine:
+        engine.text(image, (0, 0), text, font=ImageFont.load_default(28))
+        # 20px is served by the same 32px variant
+        engine.text(image, (0, 0), text, font=ImageFont.load_default(20))
+        engine.text(image, (0, 0), text, font=ImageFont.load_default(40))
+
+        assert cdn.requests == {
+            '/emojis/123456789012345678.webp?size=32&quality=lossless': 1,
+            '/emojis/123456789012345678.webp?size=64&quality=lossless': 1,
+        }
+
+        for size in (32, 64):
+            assert engine._get_cached(('discord_emoji', 123456789012345678, size, 'webp')) is not None
+
+    with Engine(source=cdn.source()) as engine:
+        engine.text(image, (0, 0), text, font=ImageFont.load_default(28))
+
+        assert cdn.requests['/emojis/123456789012345678.png?size=32'] == 1
+        assert engine._get_cached(('discord_emoji', 123456789012345678, 32, None)) is not None
+
+
+def test_circuit_breaker_lets_one_probe_through(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker(threshold=2, backoff=1.0)
+
+    breaker.record_failure('host')
+    breaker.check('host')
+    breaker.record_failure('host')
+
+    with pytest.raises(SourceUnavailable):
+        breaker.check('host')
+
+    now[0] = 1.5
+    breaker.check('host')
+
+    # Only the probe gets through while it is in flight
+    with pytest.raises(SourceUnavailable):
+        breaker.check('host')
+
+    # The probe failed, so the backoff is doubled
+    breaker.record_failure('host')
+    now[0] = 3.0
+
+    with pytest.raises(SourceUnavailable):
+        breaker.check('host')
+
+    now[0] = 3.6
+    breaker.check('host')
+    breaker.record_success('host')
+
+    breaker.check('host')
+    breaker.check('host')
+    assert breaker.stats.open_hosts == 0
+
+
+def test_circuit_breaker_replaces_lost_probes(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, backoff=1.0)
+
+    breaker.record_failure('host')
+    now[0] = 1.0
+    breaker.check('host')
+
+    with pytest.raises(SourceUnavailable):
+        breaker.check('host')
+
+    now[0] = 2.0
+    breaker.check('host')
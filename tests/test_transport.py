@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pilmoji.transport import PooledTransport, RequestsTransport, _has_requests
+
+from conftest import LocalCDNSource
+
+
+@pytest.mark.skipif(not _has_requests, reason='requests is not installed')
+def test_requests_transport_bounds_its_sessions(cdn):
+    cdn.delay = 0.05
+    transport = RequestsTransport(max_connections=2)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda i: transport.request(f'{cdn.url}{i}'), range(16)))
+
+    assert all(status == 200 for status, _ in responses)
+    assert len(transport._sessions) <= 2
+    transport.close()
+
+
+def test_pooled_transport_retries_stale_connections(cdn):
+    cdn.drop_connections = True
+    transport = PooledTransport()
+
+    assert transport.request(cdn.url + 'a')[0] == 200
+    # The kept alive connection was closed by the host, so this is retried on a new one
+    assert transport.request(cdn.url + 'b')[0] == 200
+    assert cdn.requests == {'/a': 1, '/b': 1}
+
+
+def test_pooled_transport_does_not_retry_timeouts(cdn):
+    cdn.delay = 0.5
+    transport = PooledTransport(read_timeout=0.1, retries=2)
+
+    with pytest.raises(TimeoutError):
+        transport.request(cdn.url + 'a')
+
+    assert cdn.requests == {'/a': 1}
+
+
+def test_unsupported_request_kwargs_warn():
+    class Source(LocalCDNSource):
+        REQUEST_KWARGS = {'headers': {}, 'timeout': 5}
+
+    with pytest.warns(UserWarning, match='timeout'):
+        Source(transport=PooledTransport())